@@ -0,0 +1,804 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import multiprocessing
+from array import array
+
+import coder
+import parse
+import records
+import matchers
+import dict_cache
+import dict_watch
+from compact_tree import CompactTree
+
+#Vocabulary for the synthetic corpus, by part of speech
+_WORDS = {'DT': ['the', 'a', 'an', 'this', 'that'],
+          'JJ': ['senior', 'Russian', 'new', 'military', 'local', 'former'],
+          'NN': ['official', 'leader', 'government', 'embassy', 'attack',
+                 'agreement', 'city', 'minister', 'army', 'police'],
+          'NNS': ['rockets', 'talks', 'troops', 'protesters', 'ties'],
+          'NNP': ['Obama', 'Putin', 'Moscow', 'Israel', 'Hamas', 'Gondor',
+                  'Arnor', 'Mordor', 'Kerry', 'Abbas'],
+          'VBD': ['said', 'met', 'fired', 'accused', 'signed', 'attacked',
+                  'rejected', 'visited', 'warned', 'claimed'],
+          'IN': ['in', 'at', 'with', 'after', 'on', 'that'],
+          'PRP': ['he', 'she', 'it', 'they', 'him', 'them']}
+
+
+def _deep_size(obj, seen=None):
+    """Private function to get the memory used by an object and everything
+    it refers to, counting shared objects once."""
+    if seen is None:
+        seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, (basestring, int, long, float, array)) or \
+                item is None:
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        if hasattr(item, '__dict__'):
+            stack.append(item.__dict__)
+        for cls in type(item).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if hasattr(item, name):
+                    stack.append(getattr(item, name))
+    return total
+
+
+class _CorpusGenerator():
+    """Class to build synthetic CoreNLP output with realistic tree shapes,
+    word attributes and coreference chains."""
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+
+    def word(self, pos):
+        return self.random.choice(_WORDS[pos])
+
+    def noun_phrase(self, depth):
+        roll = self.random.random()
+        if roll < 0.15:
+            return '(NP (PRP {}))'.format(self.word('PRP'))
+        elif roll < 0.45:
+            names = ' '.join(['(NNP {})'.format(self.word('NNP')) for i in
+                              xrange(self.random.randint(1, 3))])
+            return '(NP {})'.format(names)
+        elif roll < 0.6 and depth < 3:
+            return '(NP {} {})'.format(self.noun_phrase(depth + 1),
+                                       self.prep_phrase(depth + 1))
+        parts = ['(DT {})'.format(self.word('DT'))]
+        if self.random.random() < 0.5:
+            parts.append('(JJ {})'.format(self.word('JJ')))
+        noun = self.random.choice(['NN', 'NNS'])
+        parts.append('({} {})'.format(noun, self.word(noun)))
+        return '(NP {})'.format(' '.join(parts))
+
+    def prep_phrase(self, depth):
+        return '(PP (IN {}) {})'.format(self.word('IN'),
+                                        self.noun_phrase(depth + 1))
+
+    def verb_phrase(self, depth):
+        parts = ['(VBD {})'.format(self.word('VBD'))]
+        roll = self.random.random()
+        if roll < 0.25 and depth < 2:
+            parts.append('(SBAR (IN that) {})'.format(self.clause(depth + 1)))
+        else:
+            parts.append(self.noun_phrase(depth + 1))
+            if roll < 0.6:
+                parts.append(self.prep_phrase(depth + 1))
+        return '(VP {})'.format(' '.join(parts))
+
+    def clause(self, depth):
+        return '(S {} {})'.format(self.noun_phrase(depth + 1),
+                                  self.verb_phrase(depth + 1))
+
+    def sentence(self):
+        tree = '(ROOT (S {} {} (. .)))'.format(self.noun_phrase(1),
+                                                 self.verb_phrase(1))
+        tokens = [token for token in tree.replace(')', ' ').split()
+                  if not token.startswith('(')]
+        tags = [token[1:] for token in tree.split()
+                if token.startswith('(')]
+        tags = [tag for tag in tags if tag not in ('ROOT', 'S', 'NP', 'VP',
+                                                   'PP', 'SBAR')]
+        words = list()
+        dependencies = list()
+        offset = 0
+        for i, (token, tag) in enumerate(zip(tokens, tags)):
+            words.append([token, {'CharacterOffsetBegin': str(offset),
+                                  'CharacterOffsetEnd': str(offset +
+                                                            len(token)),
+                                  'PartOfSpeech': tag,
+                                  'Lemma': token.lower(),
+                                  'NamedEntityTag': 'O'}])
+            offset += len(token) + 1
+            if i:
+                dependencies.append(['dep', tokens[i - 1], token])
+        return {'parsetree': tree, 'text': ' '.join(tokens),
+                'words': words, 'dependencies': dependencies}
+
+    def story(self):
+        sentences = [self.sentence() for i in
+                     xrange(self.random.randint(1, 6))]
+        result = {'sentences': sentences}
+        if len(sentences) > 1 and self.random.random() < 0.5:
+            chain = list()
+            for i in xrange(1, len(sentences)):
+                words = sentences[i]['words']
+                head = words[0][0]
+                chain.append(((head, i, 0, 0, 1),
+                              (sentences[0]['words'][0][0], 0, 0, 0, 1)))
+            result['coref'] = [chain]
+        return result
+
+
+def synthetic_corpus(stories, seed=0):
+    """
+    Function to build a synthetic corpus of CoreNLP results.
+
+    Parameters
+    ----------
+
+    stories : Integer
+                Number of stories to build.
+
+    seed : Integer
+            Seed for the random number generator, so runs are repeatable.
+
+    Returns
+    -------
+
+    corpus : List
+                `(story_id, result)` pairs.
+    """
+    generator = _CorpusGenerator(seed)
+    return [('STORY-{}'.format(i), generator.story()) for i in
+            xrange(stories)]
+
+
+def records_memory(stories=2000, seed=0):
+    """
+    Function to compare the memory used by the legacy nested dictionaries
+    and by `records` for the same parsed corpus.
+
+    Parameters
+    ----------
+
+    stories : Integer
+                Number of stories in the corpus.
+
+    seed : Integer
+            Seed for the synthetic corpus.
+
+    Returns
+    -------
+
+    sizes : Dictionary
+            Bytes used by the legacy dictionaries, by records before
+            anything has been computed, and by records once every value has
+            been computed, plus the seconds taken to build the records. The
+            legacy dictionaries are converted from the records, so how long
+            they took to build isn't measured.
+    """
+    corpus = synthetic_corpus(stories, seed)
+    #The CoreNLP output is shared by every representation, so it's
+    #counted once up front and left out of the comparison
+    seen = set()
+    _deep_size(corpus, seen)
+
+    start = time.time()
+    stories = [parse.parse_sents(key, result)[key] for key, result
+               in corpus]
+    lazy_time = time.time() - start
+    lazy = _deep_size(stories, set(seen))
+
+    legacy = [records.story_to_dict(story) for story in stories]
+    full = _deep_size(stories, set(seen))
+    legacy_size = _deep_size(legacy, set(seen))
+    return {'legacy': legacy_size, 'records': lazy, 'records_full': full,
+            'records_time': lazy_time}
+
+
+def _synthetic_words(generator, count):
+    """Private function to make a vocabulary of uppercased made-up words."""
+    syllables = ['AL', 'BA', 'KA', 'DOR', 'EN', 'IS', 'MO', 'NA', 'OR', 'RA',
+                 'SH', 'TA', 'UL', 'VI', 'ZE', 'GON', 'HAR', 'MIR']
+    words = set()
+    while len(words) < count:
+        words.add(''.join([generator.choice(syllables) for i in
+                           xrange(generator.randint(2, 4))]))
+    return sorted(words)
+
+
+def actor_dictionary_lines(entries, seed=0, vocabulary=None):
+    """
+    Function to build the lines of a synthetic actor dictionary.
+
+    Parameters
+    ----------
+
+    entries : Integer
+                Number of actor entries.
+
+    seed : Integer
+            Seed for the random number generator.
+
+    vocabulary : List
+                    Words to build the actor phrases from. Defaults to a
+                    made-up vocabulary a fifth the size of the dictionary.
+
+    Returns
+    -------
+
+    lines : List
+            Lines of the dictionary, e.g. `ALDOR_KAEN [ABC]`. Most phrases
+            join their words with `_`, and some with a space.
+    """
+    generator = random.Random(seed)
+    if vocabulary is None:
+        vocabulary = _synthetic_words(generator, max(entries // 5, 10))
+    lines = list()
+    for i in xrange(entries):
+        #As in the CAMEO dictionaries, a few words, e.g. `PRESIDENT`, start
+        #far more phrases than the rest
+        phrase = vocabulary[int(len(vocabulary) * generator.random() ** 3)]
+        for k in xrange(generator.choice([0, 0, 1, 1, 1, 2, 2, 3])):
+            connector = '_' if generator.random() < 0.8 else ' '
+            phrase += connector + generator.choice(vocabulary)
+        code = ''.join([generator.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for
+                        k in xrange(6)])
+        lines.append('{} [{}]\n'.format(phrase, code))
+    return lines
+
+
+def verb_dictionary_lines(count, seed=0, vocabulary=None):
+    """
+    Function to build the lines of a synthetic verb dictionary in the
+    CAMEO format.
+
+    Parameters
+    ----------
+
+    count : Integer
+            Number of lines, roughly.
+
+    seed : Integer
+            Seed for the random number generator.
+
+    vocabulary : List
+                    Words to build the verbs and patterns from. Defaults to
+                    a made-up vocabulary.
+
+    Returns
+    -------
+
+    lines : List
+            Lines of the dictionary. Each verb, e.g. `ALDOR [190]`, is
+            followed by an occasional `{...}` block of irregular forms and
+            by `- pattern [code]` lines, with TABARI comments scattered
+            through them.
+    """
+    generator = random.Random(seed)
+    if vocabulary is None:
+        vocabulary = _synthetic_words(generator, max(count // 10, 10))
+    connectors = '__ '
+
+    def phrase(words):
+        text = generator.choice(vocabulary)
+        for k in xrange(words - 1):
+            word = generator.choice(vocabulary)
+            if generator.random() < 0.1:
+                word = generator.choice('$+%^')
+            text += generator.choice(connectors) + word
+        return text
+
+    def code():
+        return '{:03d}'.format(generator.randint(10, 205))
+
+    lines = list()
+    verbs = iter(generator.sample(vocabulary, len(vocabulary)))
+    while len(lines) < count:
+        verb = next(verbs, None) or phrase(2)
+        comment = ' ;pas 5/12/98' if generator.random() < 0.3 else ''
+        lines.append('{}  [{}]{}\n'.format(verb, code(), comment))
+        if generator.random() < 0.2:
+            lines.append('{{ {} }}\n'.format(' '.join(
+                [generator.choice(vocabulary) for k in xrange(3)])))
+        for k in xrange(generator.randint(0, 15)):
+            high = phrase(generator.randint(1, 3)) + ' ' if \
+                generator.random() < 0.6 else ''
+            low = generator.choice(connectors) + phrase(
+                generator.randint(1, 3)) if generator.random() < 0.7 else ''
+            comment = ' ;tony 3/9/91' if generator.random() < 0.3 else ''
+            lines.append('- {}*{}  [{}]{}\n'.format(high, low, code(),
+                                                    comment))
+        if generator.random() < 0.05:
+            lines.append('; ------ {} ------\n'.format(verb))
+    return lines
+
+
+def _read_actors(lines):
+    """Private function to parse actor dictionary lines with
+    `coder.ReadDictionaries`."""
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'actors.txt')
+        with open(path, 'w') as f:
+            f.writelines(lines)
+        return coder.ReadDictionaries(path, None).read_actor_dictionary()
+    finally:
+        shutil.rmtree(directory)
+
+
+def _scan_patterns(actor_dict, words):
+    """Private function to find the actors in a sentence by trying each of
+    the patterns stored under a word in turn, at every word. Gives the same
+    matches as `matchers.ActorMatcher.match`, for comparison."""
+    def finish(pattern, k, last, connector):
+        #Earliest end of the rest of the pattern, or None
+        if k == len(pattern):
+            return last + 1
+        word, next_connector = pattern[k]
+        if connector == '_':
+            positions = [last + 1]
+        else:
+            positions = xrange(last + 1, len(words))
+        ends = [finish(pattern, k + 1, j, next_connector) for j in positions
+                if j < len(words) and words[j] == word]
+        ends = [end for end in ends if end is not None]
+        return min(ends) if ends else None
+
+    matches = list()
+    start = 0
+    while start < len(words):
+        found = None
+        for pattern in actor_dict.get(words[start], ()):
+            if found and len(pattern) < found[0]:
+                break
+            end = finish(pattern, 2, start, pattern[1])
+            if end is not None and (found is None or end < found[1]):
+                found = (len(pattern), end, pattern[0])
+        if found:
+            matches.append((start, found[1], found[2]))
+            start = found[1]
+        else:
+            start += 1
+    return matches
+
+
+def actor_matching(entries=100000, sentences=2000, seed=0):
+    """
+    Function to compare finding actors with `matchers.ActorMatcher` and by
+    trying the patterns stored in the actor dictionary one at a time.
+
+    Parameters
+    ----------
+
+    entries : Integer
+                Number of entries in the synthetic actor dictionary.
+
+    sentences : Integer
+                Number of synthetic sentences to search.
+
+    seed : Integer
+            Seed for the synthetic data.
+
+    Returns
+    -------
+
+    results : Dictionary
+                Seconds taken to read the dictionary, to compile the
+                matcher and to search the sentences each way, and the
+                number of actors found.
+    """
+    generator = random.Random(seed)
+    vocabulary = _synthetic_words(generator, max(entries // 5, 10))
+    lines = actor_dictionary_lines(entries, seed, vocabulary)
+    start = time.time()
+    actor_dict = _read_actors(lines)
+    read_time = time.time() - start
+
+    start = time.time()
+    matcher = matchers.ActorMatcher(actor_dict)
+    compile_time = time.time() - start
+
+    #Sentences of common words with a few actor phrases mixed in
+    filler = [word.upper() for pos in _WORDS for word in _WORDS[pos]]
+    corpus = list()
+    for i in xrange(sentences):
+        #Some of the words start phrases without completing them
+        words = [generator.choice(filler) if generator.random() < 0.8 else
+                 vocabulary[int(len(vocabulary) * generator.random() ** 3)]
+                 for k in xrange(25)]
+        for k in xrange(3):
+            phrase = generator.choice(lines).partition('[')[0].strip()
+            phrase = phrase.replace('_', ' ').split()
+            at = generator.randint(0, len(words))
+            words[at:at] = phrase
+        corpus.append(words)
+
+    start = time.time()
+    trie_matches = [matcher.match(words) for words in corpus]
+    trie_time = time.time() - start
+
+    start = time.time()
+    scan_matches = [_scan_patterns(actor_dict, words) for words in corpus]
+    scan_time = time.time() - start
+
+    if trie_matches != scan_matches:
+        print 'The matcher and the pattern scan found different actors.'
+    return {'read': read_time, 'compile': compile_time, 'trie': trie_time,
+            'scan': scan_time,
+            'found': sum([len(found) for found in trie_matches])}
+
+
+def vocabulary_memory(entries=100000, sentences=2000, seed=0):
+    """
+    Function to measure the memory used by an actor matcher's integer
+    tables, by the vocabulary numbering its words and codes, and by a corpus
+    of sentences held as lists of words and as arrays of word ids.
+
+    Parameters
+    ----------
+
+    entries : Integer
+                Number of entries in the synthetic actor dictionary.
+
+    sentences : Integer
+                Number of synthetic sentences.
+
+    seed : Integer
+            Seed for the synthetic data.
+
+    Returns
+    -------
+
+    sizes : Dictionary
+            Bytes used by the matcher's `tables` and `vocabulary`, and by
+            the corpus as `words` and as `ids`.
+    """
+    generator = random.Random(seed)
+    vocabulary = _synthetic_words(generator, max(entries // 5, 10))
+    lines = actor_dictionary_lines(entries, seed, vocabulary)
+    matcher = matchers.ActorMatcher(_read_actors(lines))
+    tables = dict([(name, getattr(matcher, '_' + name)) for name in
+                   matcher._TABLES])
+    corpus = [[generator.choice(vocabulary) for k in xrange(25)] for i in
+              xrange(sentences)]
+    encoded = [matcher.vocabulary.encode(words) for words in corpus]
+    return {'tables': _deep_size(tables),
+            'vocabulary': _deep_size(matcher.vocabulary),
+            'words': _deep_size(corpus), 'ids': _deep_size(encoded)}
+
+
+def dictionary_loading(verb_lines=50000, actor_lines=200000, seed=0):
+    """
+    Function to time parsing synthetic verb and actor dictionaries from
+    text with `coder.ReadDictionaries`, i.e. a load with no compiled file
+    to use.
+
+    Parameters
+    ----------
+
+    verb_lines : Integer
+                    Number of lines in the synthetic verb dictionary.
+
+    actor_lines : Integer
+                    Number of lines in the synthetic actor dictionary.
+
+    seed : Integer
+            Seed for the synthetic data.
+
+    Returns
+    -------
+
+    results : Dictionary
+                Seconds taken to read the `verbs` and the `actors`, and the
+                number of entries each gave.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        verbs = os.path.join(directory, 'verbs.txt')
+        with open(verbs, 'w') as f:
+            f.writelines(verb_dictionary_lines(verb_lines, seed))
+        actors = os.path.join(directory, 'actors.txt')
+        with open(actors, 'w') as f:
+            f.writelines(actor_dictionary_lines(actor_lines, seed))
+
+        reader = coder.ReadDictionaries(actors, verbs)
+        start = time.time()
+        verb_dict = reader.read_verb_dictionary()
+        verb_time = time.time() - start
+        start = time.time()
+        actor_dict = reader.read_actor_dictionary()
+        actor_time = time.time() - start
+        return {'verbs': verb_time, 'verb_entries': len(verb_dict),
+                'actors': actor_time, 'actor_entries': len(actor_dict)}
+    finally:
+        shutil.rmtree(directory)
+
+
+def coding_throughput(sentences=20000, seed=0):
+    """
+    Function to time coding synthetic parsed sentences with
+    `coder.code_batch`, in one batch and a sentence at a time.
+
+    Parameters
+    ----------
+
+    sentences : Integer
+                Number of synthetic sentences.
+
+    seed : Integer
+            Seed for the synthetic data.
+
+    Returns
+    -------
+
+    results : Dictionary
+                Seconds taken to code the sentences as one `batch` and as
+                `single` sentences, and the number of `events` coded.
+    """
+    generator = _CorpusGenerator(seed)
+    codes = random.Random(seed)
+    actor_lines = ['{} [{}]\n'.format(word.upper(), word[:3].upper()) for
+                   word in _WORDS['NNP']]
+    actor_lines += ['POLICE [COP]\n', 'ARMY [MIL]\n', 'GOVERNMENT [GOV]\n',
+                    'PROTESTERS [OPP]\n', 'SENIOR_OFFICIAL [GOV]\n']
+    verb_lines = list()
+    for word in _WORDS['VBD']:
+        verb_lines.append('{} [{:03d}]\n'.format(word.upper(),
+                                                codes.randint(10, 200)))
+        for noun in _WORDS['NN']:
+            verb_lines.append('- * {} [{:03d}]\n'.format(
+                noun.upper(), codes.randint(10, 200)))
+    reader = coder.ReadDictionaries(None, None)
+    dictionaries = dict_watch.Dictionaries(
+        reader.read_actor_dictionary(actor_lines),
+        reader.read_verb_dictionary(verb_lines), 'benchmark')
+    #Parsing isn't part of coding, so the trees are built up front
+    trees = [CompactTree(generator.sentence()['parsetree']) for i in
+             xrange(sentences)]
+    dictionaries.actor_matcher()
+    dictionaries.verb_matcher()
+
+    start = time.time()
+    events = list(coder.code_batch(trees, dictionaries))
+    batch_time = time.time() - start
+
+    start = time.time()
+    for tree in trees:
+        list(coder.code_batch([tree], dictionaries))
+    single_time = time.time() - start
+    return {'batch': batch_time, 'single': single_time,
+            'events': len(events)}
+
+
+def _private_memory():
+    """Private function to get the bytes of memory used by this process
+    alone, i.e. not shared with any other process. Needs Linux."""
+    total = 0
+    with open('/proc/self/smaps') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1]) * 1024
+    return total
+
+
+_matcher_state = dict()
+
+
+def _load_private(path):
+    """Private function run by each worker to load its own copy of the
+    actor dictionary from the compiled file and compile a matcher."""
+    actor_dict = dict_cache.load(path, None)
+    _matcher_state['matcher'] = matchers.ActorMatcher(actor_dict)
+
+
+def _load_shared(path):
+    """Private function run by each worker to open the shared matcher."""
+    _matcher_state['matcher'] = matchers.SharedActorMatcher(path)
+
+
+def _match_corpus(corpus):
+    """Private function run by each worker to find the actors in a corpus
+    and report its private memory."""
+    matcher = _matcher_state['matcher']
+    found = sum([len(matcher.match(words)) for words in corpus])
+    return found, _private_memory()
+
+
+def shared_memory(entries=100000, processes=4, sentences=500, seed=0):
+    """
+    Function to compare the memory used by worker processes that each load
+    their own actor matcher with that used by workers sharing one
+    memory-mapped `matchers.SharedActorMatcher`. Needs Linux.
+
+    Parameters
+    ----------
+
+    entries : Integer
+                Number of entries in the synthetic actor dictionary.
+
+    processes : Integer
+                Number of worker processes.
+
+    sentences : Integer
+                Number of synthetic sentences each worker searches.
+
+    seed : Integer
+            Seed for the synthetic data.
+
+    Returns
+    -------
+
+    results : Dictionary
+                Mean private bytes per worker, the seconds the workers took
+                to start and search, and the actors found, for the `private`
+                and `shared` workers.
+    """
+    generator = random.Random(seed)
+    vocabulary = _synthetic_words(generator, max(entries // 5, 10))
+    lines = actor_dictionary_lines(entries, seed, vocabulary)
+    corpus = [[generator.choice(vocabulary) if generator.random() < 0.3 else
+               'THE' for k in xrange(25)] for i in xrange(sentences)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'actors.txt')
+        with open(path, 'w') as f:
+            f.writelines(lines)
+        actor_dict = dict_cache.load(path, lambda path: _read_actors(lines))
+        shared_path = os.path.join(directory, 'actors.shared')
+        matchers.ActorMatcher(actor_dict).write_shared(shared_path)
+        del actor_dict
+
+        results = dict()
+        for name, initializer, source in (('private', _load_private, path),
+                                          ('shared', _load_shared,
+                                           shared_path)):
+            start = time.time()
+            workers = multiprocessing.Pool(processes, initializer, (source,))
+            try:
+                outputs = workers.map(_match_corpus, [corpus] * processes,
+                                      chunksize=1)
+            finally:
+                workers.terminate()
+                workers.join()
+            results[name] = {'memory': sum([output[1] for output in outputs]) /
+                             len(outputs),
+                             'time': time.time() - start,
+                             'found': outputs[0][0]}
+        return results
+    finally:
+        shutil.rmtree(directory)
+
+
+def parse_cli_args():
+    """Function to parse the command-line arguments for the benchmarks."""
+    aparse = argparse.ArgumentParser(prog='benchmarks',
+                                     description='PETRARCH benchmarks')
+    sub_parse = aparse.add_subparsers(dest='command_name')
+
+    records_command = sub_parse.add_parser('records', help="""Compare the
+                                           memory used by the legacy story
+                                           dictionaries and by the record
+                                           classes.""")
+    records_command.add_argument('-n', '--stories', type=int, default=2000,
+                                 help='Number of synthetic stories.')
+
+    actors_command = sub_parse.add_parser('actors', help="""Compare finding
+                                          actors with the compiled matcher
+                                          and by trying each dictionary
+                                          pattern.""")
+    actors_command.add_argument('-e', '--entries', type=int, default=100000,
+                                help='Number of synthetic actor entries.')
+    actors_command.add_argument('-n', '--sentences', type=int, default=2000,
+                                help='Number of synthetic sentences.')
+
+    loading_command = sub_parse.add_parser('loading', help="""Time parsing
+                                           large verb and actor
+                                           dictionaries from text.""")
+    loading_command.add_argument('-v', '--verb-lines', type=int,
+                                 default=50000,
+                                 help='Lines in the synthetic verb file.')
+    loading_command.add_argument('-a', '--actor-lines', type=int,
+                                 default=200000,
+                                 help='Lines in the synthetic actor file.')
+
+    coding_command = sub_parse.add_parser('coding', help="""Time coding
+                                          parsed sentences in a batch and
+                                          one at a time.""")
+    coding_command.add_argument('-n', '--sentences', type=int,
+                                default=20000,
+                                help='Number of synthetic sentences.')
+
+    vocabulary_command = sub_parse.add_parser('vocabulary', help="""Measure
+                                              the memory used by the integer
+                                              matcher tables, the vocabulary
+                                              and encoded sentences.""")
+    vocabulary_command.add_argument('-e', '--entries', type=int,
+                                    default=100000,
+                                    help='Number of synthetic actor entries.')
+    vocabulary_command.add_argument('-n', '--sentences', type=int,
+                                    default=2000,
+                                    help='Number of synthetic sentences.')
+
+    shared_command = sub_parse.add_parser('shared', help="""Compare the memory
+                                          used by workers with their own
+                                          actor matcher and with a shared
+                                          one.""")
+    shared_command.add_argument('-e', '--entries', type=int, default=100000,
+                                help='Number of synthetic actor entries.')
+    shared_command.add_argument('-p', '--processes', type=int, default=4,
+                                help='Number of worker processes.')
+
+    return aparse.parse_args()
+
+
+def main():
+    """Main function"""
+    cli_args = parse_cli_args()
+    if cli_args.command_name == 'records':
+        sizes = records_memory(cli_args.stories)
+        mb = 1024.0 * 1024.0
+        print 'Legacy dictionaries: {:.1f} MB'.format(sizes['legacy'] / mb)
+        print 'Records: {:.1f} MB, built in {:.2f}s'.format(
+            sizes['records'] / mb, sizes['records_time'])
+        print 'Records, every value computed: {:.1f} MB'.format(
+            sizes['records_full'] / mb)
+    elif cli_args.command_name == 'actors':
+        times = actor_matching(cli_args.entries, cli_args.sentences)
+        print 'Read {} actors in {:.2f}s, compiled in {:.2f}s'.format(
+            cli_args.entries, times['read'], times['compile'])
+        print 'Matcher: {:.2f}s, pattern scan: {:.2f}s, {} actors ' \
+              'found'.format(times['trie'], times['scan'], times['found'])
+    elif cli_args.command_name == 'loading':
+        results = dictionary_loading(cli_args.verb_lines,
+                                     cli_args.actor_lines)
+        print 'Verbs: {} lines read in {:.2f}s, {} entries'.format(
+            cli_args.verb_lines, results['verbs'], results['verb_entries'])
+        print 'Actors: {} lines read in {:.2f}s, {} keywords'.format(
+            cli_args.actor_lines, results['actors'],
+            results['actor_entries'])
+    elif cli_args.command_name == 'coding':
+        results = coding_throughput(cli_args.sentences)
+        print '{} events coded from {} sentences'.format(
+            results['events'], cli_args.sentences)
+        for name in ('batch', 'single'):
+            print '{}: {:.2f}s, {:.0f} sentences/s'.format(
+                name.capitalize(), results[name],
+                cli_args.sentences / results[name])
+    elif cli_args.command_name == 'vocabulary':
+        sizes = vocabulary_memory(cli_args.entries, cli_args.sentences)
+        mb = 1024.0 * 1024.0
+        print 'Matcher tables: {:.1f} MB, vocabulary: {:.1f} MB'.format(
+            sizes['tables'] / mb, sizes['vocabulary'] / mb)
+        print 'Sentences as words: {:.1f} MB, as ids: {:.1f} MB'.format(
+            sizes['words'] / mb, sizes['ids'] / mb)
+    elif cli_args.command_name == 'shared':
+        results = shared_memory(cli_args.entries, cli_args.processes)
+        mb = 1024.0 * 1024.0
+        for name in ('private', 'shared'):
+            print '{} matchers: {:.1f} MB private memory per worker, ' \
+                  '{:.2f}s'.format(name.capitalize(),
+                                   results[name]['memory'] / mb,
+                                   results[name]['time'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import os
+import time
+import cPickle
+
+JOURNAL_SUFFIX = '.journal'
+
+
+class Journal():
+    """Class implementing an append-only journal of completed stories, used
+    to checkpoint long parse runs so they can be resumed after a crash."""
+    def __init__(self, path, every=100, interval=60):
+        """
+        Instantiate the Journal class.
+
+        Parameters
+        ----------
+
+        path : String
+                Filepath of the journal.
+
+        every : Integer
+                Number of completed stories to buffer before they are
+                written to the journal.
+
+        interval : Integer
+                    Maximum number of seconds between writes, so slow runs
+                    are still checkpointed regularly.
+        """
+        self.path = path
+        self.every = every
+        self.interval = interval
+        self._buffer = list()
+        self._last_flush = time.time()
+        self._good_size = None
+
+    def load(self):
+        """
+        Function to read the stories already recorded in the journal. A
+        record left half-written by a crash is ignored and will be
+        overwritten by the next checkpoint.
+
+        Returns
+        -------
+
+        done : Dictionary
+                Story IDs as keys with their parse results as values.
+        """
+        done = dict()
+        self._good_size = 0
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, 'rb') as f:
+            unpickler = cPickle.Unpickler(f)
+            while True:
+                try:
+                    key, result = unpickler.load()
+                except EOFError:
+                    break
+                except Exception, e:
+                    print 'Ignoring damaged journal record. {}'.format(e)
+                    break
+                done[key] = result
+                self._good_size = f.tell()
+
+        return done
+
+    def record(self, key, result):
+        """
+        Function to add a completed story to the journal. Records are
+        buffered and written every `every` stories or `interval` seconds.
+
+        Parameters
+        ----------
+
+        key : String
+                Story ID.
+
+        result : Dictionary
+                    Parse result for the story.
+        """
+        self._buffer.append((key, result))
+        if len(self._buffer) >= self.every or \
+                time.time() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Function to write the buffered records to the journal."""
+        self._last_flush = time.time()
+        if not self._buffer:
+            return
+        with open(self.path, 'ab') as f:
+            if self._good_size is not None:
+                #Drop anything after the last complete record
+                f.truncate(self._good_size)
+                self._good_size = None
+            for record in self._buffer:
+                cPickle.dump(record, f, cPickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        self._buffer = list()
+
+    def track(self, results):
+        """
+        Generator to record each `(event_id, event_info)` pair that passes
+        through it.
+
+        Parameters
+        ----------
+
+        results : Iterable
+                    Iterable of `(event_id, event_info)` pairs.
+
+        Yields
+        ------
+
+        output : Tuple
+                    The same pairs, once they've been recorded.
+        """
+        try:
+            for key, result in results:
+                self.record(key, result)
+                yield key, result
+        finally:
+            self.flush()
+
+    def remove(self):
+        """Function to delete the journal once the run is complete."""
+        self._buffer = list()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def skip_done(events, done):
+    """
+    Generator to drop stories that have already been completed.
+
+    Parameters
+    ----------
+
+    events : Iterable
+                Iterable of records whose first item is the story ID.
+
+    done : Dictionary
+            Completed story IDs, as returned by `Journal.load`.
+
+    Yields
+    ------
+
+    record : Tuple
+                Each record whose story ID isn't in `done`.
+    """
+    for record in events:
+        if record[0] not in done:
+            yield record
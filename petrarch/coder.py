@@ -1,3 +1,15 @@
+import os
+import gc
+import matchers
+import dict_cache
+import dict_tokenizer
+from vocabulary import Vocabulary, UNKNOWN, encode_sentence
+from compact_tree import CompactTree
+
+#Code for verbs and patterns that aren't coded as events
+NULL_CODE = '---'
+
+
 class ReadDictionaries():
     """Class to parse actor and verb dictionaries into format useable by
     the coder."""
@@ -19,63 +31,78 @@ class ReadDictionaries():
         self.verb_dict = {}
         self.actor_dict = {}
 
-    def read_verb_dictionary(self):
+    def read_verb_dictionary(self, lines=None):
         """
         Function to read the verb dictionary.
 
+        Parameters
+        ----------
+
+        lines : Iterable
+                Optional lines to read instead of the verbs file, e.g. some
+                of the verbs of a dictionary that's changed.
+
         Returns
         -------
 
         verb_dict : Dictionary
                     Dictionary with verbs as keys and ??? as values.
                     TODO: More info on datastructure.
+
+        Raises
+        ------
+
+        ValueError
+                    For a line that can't be read, giving its line number.
         """
     # Verb lists
     # 1. True: primary form; False: next item points to primary form
     # 2. Code
     # remainder: 3-tuples of lower/upper pattern and code
-        fin = open(self.verbs, 'r')
-
-        theverb = ''
-        ka = 0
-        for line in fin:  # loop through the file
-            part = line.partition('[')
-            verb = part[0].strip() + ' '
-            scr = part[2].partition(']')
-            code = scr[0]
-        #print verb, code
-            if verb[0] == '-':
-#			print 'RVD-1',verb
-                if not hasforms:
-                    self._make_verb_forms()
+        if lines is None:
+            fin = open(self.verbs, 'r')
+            source = self.verbs
+        else:
+            fin = lines
+            source = '<lines>'
+
+        collecting = gc.isenabled()
+        #Nothing read has reference cycles, so the collector is paused
+        #rather than left to scan the entries over and over as they're made
+        gc.disable()
+        try:
+            theverb = None
+            hasforms = True
+            for token in dict_tokenizer.verb_tokens(fin, source):
+                kind = token[0]
+                if kind == dict_tokenizer.PATTERN:
+                    #Verbs without a `{...}` block get the regular forms
+                    if not hasforms:
+                        self._make_verb_forms(theverb)
+                        hasforms = True
+                    self.verb_dict[theverb].append(list(token[2:]))
+                elif kind == dict_tokenizer.FORMS:
+                    for form in token[2]:
+                        self.verb_dict[form] = [False, theverb]
                     hasforms = True
-                targ = verb[1:].partition('*')
-                highpat = self._make_phrase_list(targ[0].lstrip())
-#			print 'RVD-2',highpat
-                highpat.reverse()
-                lowphrase = targ[2].rstrip()
-                if len(lowphrase) == 0:
-                    lowpat = []
                 else:
-                    lowpat = [targ[2][0]]   # start with connector
-                    loclist = self._make_phrase_list(lowphrase[1:])
-                    lowpat.extend(loclist[:-1])   # don't need the final blank
-#			print 'RVD-3',lowpat
-                self.verb_dict[theverb].append([highpat, lowpat, code])
-            elif verb[0] == '{':
-                self._get_verb_forms()
-                hasforms = True
-            else:
-#		if theverb != '': print '::', theverb, verb_dict[theverb]
-                theverb = verb
-                self.verb_dict[verb] = [True, code]
-                hasforms = False
-                ka += 1   # counting primary verbs
-#			if ka > 10: break
-
-    def _make_verb_forms(self):
+                    if not hasforms:
+                        self._make_verb_forms(theverb)
+                    theverb = token[2]
+                    self.verb_dict[theverb] = [True, token[3]]
+                    hasforms = False
+            if not hasforms:
+                self._make_verb_forms(theverb)
+        finally:
+            if collecting:
+                gc.enable()
+            if lines is None:
+                fin.close()
+
+        return self.verb_dict
+
+    def _make_verb_forms(self, theverb):
         """Private function to create the regular forms of a verb."""
-        global theverb
         vroot = theverb[:-1]
         vscr = vroot + "S "
         self.verb_dict[vscr] = [False, theverb]
@@ -89,50 +116,28 @@ class ReadDictionaries():
             vscr = vroot + "ING "
         self.verb_dict[vscr] = [False, theverb]
 
-    def _make_phrase_list(thepat):
-    # converts a pattern phrase into a list of alternating words and connectors
-        if len(thepat) == 0:
-            return []
-        phlist = []
-        start = 0
-        maxlen = len(thepat) + 1  # this is just a telltail
-        while start < len(thepat):  # break phrase on ' ' and '_'
-            spfind = thepat.find(' ', start)
-            if spfind == -1:
-                spfind = maxlen
-            unfind = thepat.find('_', start)
-            if unfind == -1:
-                unfind = maxlen
-            if unfind < spfind:   # somehow think I don't need this check...well, I just need the terminating point, still need to see which is lower
-                phlist.append(thepat[start:unfind])
-                phlist.append('_')
-                start = unfind + 1
-            else:
-                phlist.append(thepat[start:spfind])
-                phlist.append(' ')
-                start = spfind + 1
-        return phlist
-
-    def _get_verb_forms(self):
-        """Private function to obtain the irregular forms of a verb."""
-        global verb, theverb
-        scr = verb.partition('{')
-        sc1 = scr[2].partition('}')
-        forms = sc1[0].split()
-        for wrd in forms:
-            vscr = wrd + " "
-            self.verb_dict[vscr] = [False, theverb]
-
-    def read_actor_dictionary(self):
+    def read_actor_dictionary(self, lines=None):
         """
         Function to read the actor dictionary.
 
+        Parameters
+        ----------
+
+        lines : Iterable
+                Optional lines to read instead of the actors file.
+
         Returns
         -------
 
         verb_dict : Dictionary
                     Dictionary with actors as keys and ??? as values.
                     TODO: More info on datastructure.
+
+        Raises
+        ------
+
+        ValueError
+                    For a line that can't be read, giving its line number.
         """
     # Actors are stored in a dictionary of pattern lists keyed on the first word
     # of the phrase. the Pattern lists begin with the code, the connector from then
@@ -140,52 +145,280 @@ class ReadDictionaries():
     # connectors.
     # Still need date restrictions and synonym
     # Still need: optional POS info from patterns, which will be stored in the tuple
-        fin = open(self.actors, 'r')
-
-        #Are these two still necessary?
-        #theverb = ''
-        #ka = 0
-        for line in fin:  # loop through the file
-            part = line.partition('[')
-            actor = part[0].strip() + ' '
-            code = part[2].partition(']')[0]
-#	print verb, code  # debug
-            start = 0
-            maxlen = len(actor) + 1  # this is just a telltail
-            phlist = [code]
-            while start < len(actor):  # break phrase on ' ' and '_'
-                spfind = actor.find(' ', start)
-                if spfind == -1:
-                    spfind = maxlen
-                unfind = actor.find('_', start)
-                if unfind == -1:
-                    unfind = maxlen
-                if unfind < spfind:   # somehow think I don't need this check...well, I just need the terminating point, still need to see which is lower
-                    if len(phlist) == 1:
-                        keyword = actor[start:unfind]
-                        phlist.append('_')
-                    else:
-                        phlist.append((actor[start:unfind], '_'))  # this won't change, so use a tuple
-                    start = unfind + 1
+        if lines is None:
+            fin = open(self.actors, 'r')
+            source = self.actors
+        else:
+            fin = lines
+            source = '<lines>'
+
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            actor_dict = self.actor_dict
+            for number, keyword, phlist in dict_tokenizer.actor_tokens(fin,
+                                                                       source):
+                # we don't need to store the first word, just the connector
+                patterns = actor_dict.get(keyword)
+                if patterns is None:
+                    actor_dict[keyword] = [phlist]
                 else:
-                    if len(phlist) == 1:
-                        keyword = actor[start:spfind]
-                        phlist.append(' ')
-                    else:
-                        phlist.append((actor[start:spfind], ' '))
-                    start = spfind + 1
-            if keyword in self.actor_dict:  # we don't need to store the first word, just the connector
-                self.actor_dict[keyword].append(phlist)
-            else:
-                self.actor_dict[keyword] = [phlist]
+                    patterns.append(phlist)
+        finally:
+            if collecting:
+                gc.enable()
+            if lines is None:
+                fin.close()
 
         # sort the patterns by the number of words
-        for lockey in self.actor_dict.keys():
-            self.actor_dict[lockey].sort(key=len, reverse=True)
+        for patterns in self.actor_dict.itervalues():
+            if len(patterns) > 1:
+                patterns.sort(key=len, reverse=True)
 
         return self.actor_dict
 
 
+def load_dictionaries(actors, verbs, use_cache=True):
+    """
+    Function to load the actor and verb dictionaries. Each dictionary is
+    loaded from the compiled file `dict_cache` keeps next to it, and is only
+    parsed with `ReadDictionaries` when the text has changed since it was
+    last compiled.
+
+    Parameters
+    ----------
+
+    actors : String
+                Filepath for the actors dictionary.
+
+    verbs : String
+            Filepath for the verbs dictionary.
+
+    use_cache : Boolean
+                Whether to use the compiled files. If False, both text
+                dictionaries are parsed. Defaults to True.
+
+    Returns
+    -------
+
+    actor_dict : Dictionary
+                    Actor dictionary as built by
+                    `ReadDictionaries.read_actor_dictionary`.
+
+    verb_dict : Dictionary
+                Verb dictionary as built by
+                `ReadDictionaries.read_verb_dictionary`.
+    """
+    reader = ReadDictionaries(actors, verbs)
+    if not use_cache:
+        return reader.read_actor_dictionary(), reader.read_verb_dictionary()
+    actor_dict = dict_cache.load(actors,
+                                 lambda path: reader.read_actor_dictionary())
+    verb_dict = dict_cache.load(verbs,
+                                lambda path: reader.read_verb_dictionary())
+    return actor_dict, verb_dict
+
+
+def share_dictionaries(actors, verbs, directory):
+    """
+    Function to compile the actor and verb dictionaries into matchers and
+    write them to files that `open_shared` memory-maps, so that several
+    processes can share one copy of them. Both matchers number their words
+    with the same vocabulary, so a sentence only needs encoding once.
+
+    Parameters
+    ----------
+
+    actors : String
+                Filepath for the actors dictionary.
+
+    verbs : String
+            Filepath for the verbs dictionary.
+
+    directory : String
+                Directory to write the files to.
+
+    Returns
+    -------
+
+    shared : Tuple
+                Filepaths of the actor and verb matchers.
+    """
+    actor_dict, verb_dict = load_dictionaries(actors, verbs)
+    actor_path = os.path.join(directory, 'actors.shared')
+    verb_path = os.path.join(directory, 'verbs.shared')
+    vocabulary = Vocabulary()
+    actor_matcher = matchers.ActorMatcher(actor_dict, vocabulary)
+    verb_matcher = matchers.VerbMatcher(verb_dict, vocabulary)
+    #Both are written once the vocabulary is complete
+    actor_matcher.write_shared(actor_path)
+    verb_matcher.write_shared(verb_path)
+    return actor_path, verb_path
+
+
+def open_shared(actor_path, verb_path):
+    """
+    Function to open the matchers written by `share_dictionaries`.
+
+    Parameters
+    ----------
+
+    actor_path : String
+                    Filepath of the actor matcher.
+
+    verb_path : String
+                Filepath of the verb matcher.
+
+    Returns
+    -------
+
+    actor_matcher : SharedActorMatcher
+                    Matcher for the actors.
+
+    verb_matcher : SharedVerbMatcher
+                    Matcher for the verbs, sharing the actor matcher's
+                    vocabulary.
+    """
+    actor_matcher = matchers.SharedActorMatcher(actor_path)
+    return actor_matcher, matchers.SharedVerbMatcher(verb_path,
+                                                     actor_matcher.vocabulary)
+
+
+class SharedDictionaries():
+    """Class holding the matchers written by `share_dictionaries`, opened
+    with `open_shared`, behind the same interface as
+    `dict_watch.Dictionaries`, so `code_batch` can code with one copy of the
+    compiled dictionaries shared between processes."""
+    def __init__(self, actor_path, verb_path, version=None):
+        """
+        Instantiate the SharedDictionaries class.
+
+        Parameters
+        ----------
+
+        actor_path : String
+                        Filepath of the actor matcher.
+
+        verb_path : String
+                    Filepath of the verb matcher.
+
+        version : String
+                    Optional stamp identifying the dictionaries, attached to
+                    every event coded with them.
+        """
+        self._actor_matcher, self._verb_matcher = open_shared(actor_path,
+                                                              verb_path)
+        self.vocabulary = self._actor_matcher.vocabulary
+        self.version = version
+
+    def actor_matcher(self):
+        """Function to get the shared `matchers.SharedActorMatcher`."""
+        return self._actor_matcher
+
+    def verb_matcher(self):
+        """Function to get the shared `matchers.SharedVerbMatcher`."""
+        return self._verb_matcher
+
+
+def code_batch(sentences, dictionaries):
+    """
+    Function to code a batch of parsed sentences into events. Every sentence
+    is coded with the same compiled matchers, which are looked up once for
+    the batch, and a sentence's verbs are only looked for when it has at
+    least two actors.
+
+    An event is coded for each verb with a source and a target, and the
+    event code is the code of the verb's longest matching pattern. Where
+    that pattern has a `$` or `+`, the source or target is the actor at the
+    word it matched, or failing that the nearest actor beyond the word on
+    its side of the verb. Otherwise the source is the nearest actor ending
+    before the verb and the target the nearest actor starting after it.
+    Verbs coded `---` give no event.
+
+    Parameters
+    ----------
+
+    sentences : Iterable
+                Parsed sentences, as parse trees such as `CompactTree`, as
+                bracketed parse tree strings, or as sentence records or
+                dictionaries with a `parse_tree`.
+
+    dictionaries : Dictionaries
+                    Dictionaries to code with, e.g.
+                    `dict_watch.DictionaryWatcher.current` or a
+                    `SharedDictionaries`. Its actor and verb matchers have to
+                    share a vocabulary.
+
+    Returns
+    -------
+
+    events : Generator
+                `(index, source, target, code, version)` tuples, where
+                `index` is the position of the sentence in `sentences` and
+                `version` is the `version` of the dictionaries.
+    """
+    actor_matcher = dictionaries.actor_matcher()
+    verb_matcher = dictionaries.verb_matcher()
+    version = dictionaries.version
+    vocabulary = actor_matcher.vocabulary
+    string = vocabulary.string
+    match_actors = actor_matcher.match_ids
+    match_verbs = verb_matcher.match_ids
+    null = vocabulary.get(NULL_CODE)
+
+    for index, sentence in enumerate(sentences):
+        words, tags = encode_sentence(_sentence_tree(sentence), vocabulary)
+        actors = match_actors(words)
+        if len(actors) < 2:
+            continue
+        for start, end, verb, code, source_at, target_at in match_verbs(
+                words):
+            if code == UNKNOWN or code == null:
+                continue
+            source = _slot_actor(actors, source_at, start, end)
+            target = _slot_actor(actors, target_at, start, end, True)
+            if source is not None and target is not None and (source is not
+                                                              target):
+                yield (index, string(source[2]), string(target[2]),
+                       string(code), version)
+
+
+def _slot_actor(actors, at, start, end, target=False):
+    """Private function to find the actor filling the source or target of a
+    verb at `words[start:end]`, given the index of the word matched by the
+    pattern's marker, if it has one, and actors sorted by their start."""
+    if at is None:
+        #Nearest actor before the verb for the source, after it for the
+        #target
+        at = start - 1 if not target else end
+        after = target
+    else:
+        after = at >= end
+    found = None
+    for actor in actors:
+        if actor[1] > start and actor[0] < end:
+            #Part of the verb
+            continue
+        if actor[0] <= at < actor[1]:
+            return actor
+        if after:
+            if actor[0] > at:
+                return actor
+        elif actor[1] <= at:
+            found = actor
+    return found
+
+
+def _sentence_tree(sentence):
+    """Private function to get the parse tree of a sentence given to
+    `code_batch`."""
+    if isinstance(sentence, basestring):
+        return CompactTree(sentence)
+    elif not hasattr(sentence, 'pos'):
+        return sentence['parse_tree']
+    return sentence
+
+
 class Coder():
     """Class to code a sentence into the standard CAMEO event data format."""
     def __init__(self, parse_tree):
@@ -195,8 +428,12 @@ class Coder():
         Parameters
         ----------
 
-        parse_tree : NLTK.tree object
-                    Parse tree for a given sentence.
+        parse_tree : CompactTree or NLTK.tree object
+                    Parse tree for a given sentence, such as the
+                    `parse_tree` or `coref_tree` stored by
+                    `parse.parse_sents`. A bracketed string is also
+                    accepted, but reusing the stored tree avoids parsing
+                    the string again.
 
         Returns
         -------
@@ -205,8 +442,48 @@ class Coder():
                         Collapsed parse tree that contains noun and verb
                         phrase information.
         """
+        if isinstance(parse_tree, basestring):
+            parse_tree = CompactTree(parse_tree)
+        self.tree = parse_tree
         self.sent = self._tree_to_list(parse_tree)
 
+    def words(self):
+        """
+        Function to get the uppercased words of the sentence, in order, as
+        taken by `matchers.ActorMatcher.match`.
+
+        Returns
+        -------
+
+        words : List
+                Uppercased leaves of the parse tree.
+        """
+        return [word.upper() for word in self.tree.leaves()]
+
+    def encode(self, vocabulary):
+        """
+        Function to get the sentence as the integer arrays the matchers
+        take, rather than as strings.
+
+        Parameters
+        ----------
+
+        vocabulary : Vocabulary
+                        Vocabulary of the matchers, e.g.
+                        `dict_watch.Dictionaries.vocabulary`.
+
+        Returns
+        -------
+
+        words : array
+                Ids of the uppercased words, as taken by
+                `matchers.ActorMatcher.match_ids`.
+
+        tags : array
+                Ids of the part-of-speech tags.
+        """
+        return encode_sentence(self.tree, vocabulary)
+
     def _tree_to_list(self, tree):
         """Private function to convert a parse tree to a list format usable
         by the coder."""
@@ -0,0 +1,770 @@
+import re
+import bisect
+from array import array
+
+#Opening and closing brackets, and anything between them, in a bracketed tree
+_TOKENS = re.compile(r'\(|\)|[^\s()]+')
+
+
+class _TreeStore(object):
+    """Flat arrays holding a whole tree. Nodes, including the leaf words, are
+    stored in preorder, so the descendants of node `i` are the nodes
+    `i + 1` up to `end[i]` and its children are found by hopping from one
+    child's end to the next.
+
+    The arrays are never changed in place; an edit builds new ones. That
+    lets copies of a tree share its arrays until one of them is edited."""
+    __slots__ = ('labels', 'arity', 'is_leaf', 'parent', 'end', 'depth',
+                 'sibling', 'leaf_ids', 'leaves_before')
+
+    def __init__(self, labels, arity, is_leaf):
+        self.labels = labels
+        self.arity = arity
+        self.is_leaf = is_leaf
+        self.reindex()
+
+    def reindex(self):
+        """Rebuild the parent, span, depth and leaf indexes from `labels`,
+        `arity` and `is_leaf`, e.g. after a subtree is replaced."""
+        arity = self.arity
+        is_leaf = self.is_leaf
+        n = len(self.labels)
+        parent = array('i', [-1]) * n
+        end = array('i', [0]) * n
+        depth = array('i', [0]) * n
+        sibling = array('i', [0]) * n
+        leaf_ids = array('i')
+        leaves_before = array('i', [0]) * (n + 1)
+
+        stack = list()
+        remaining = list()
+        leaf_count = 0
+        for i in xrange(n):
+            if stack:
+                parent[i] = stack[-1]
+                sibling[i] = arity[stack[-1]] - remaining[-1]
+                remaining[-1] -= 1
+            depth[i] = len(stack)
+            leaves_before[i] = leaf_count
+            if is_leaf[i]:
+                leaf_ids.append(i)
+                leaf_count += 1
+            if arity[i]:
+                stack.append(i)
+                remaining.append(arity[i])
+            else:
+                end[i] = i + 1
+                #Close every node whose last child this was
+                while stack and not remaining[-1]:
+                    end[stack.pop()] = i + 1
+                    remaining.pop()
+        while stack:
+            end[stack.pop()] = n
+        leaves_before[n] = leaf_count
+
+        self.parent = parent
+        self.end = end
+        self.depth = depth
+        self.sibling = sibling
+        self.leaf_ids = leaf_ids
+        self.leaves_before = leaves_before
+
+    def share(self):
+        """Function to get a new store sharing this store's arrays."""
+        store = _TreeStore.__new__(_TreeStore)
+        for name in _TreeStore.__slots__:
+            setattr(store, name, getattr(self, name))
+        return store
+
+    def subtree(self, i):
+        """Function to get a new store holding a copy of the subtree rooted
+        at node `i`, with its indexes taken from this store's."""
+        end = self.end[i]
+        first_leaf = self.leaves_before[i]
+        last_leaf = self.leaves_before[end]
+        depth = self.depth[i]
+        store = _TreeStore.__new__(_TreeStore)
+        store.labels = self.labels[i:end]
+        store.arity = self.arity[i:end]
+        store.is_leaf = self.is_leaf[i:end]
+        store.parent = array('i', [x - i for x in self.parent[i:end]])
+        store.parent[0] = -1
+        store.end = array('i', [x - i for x in self.end[i:end]])
+        store.depth = array('i', [x - depth for x in self.depth[i:end]])
+        store.sibling = self.sibling[i:end]
+        store.sibling[0] = 0
+        store.leaf_ids = array('i', [x - i for x in
+                                     self.leaf_ids[first_leaf:last_leaf]])
+        store.leaves_before = array('i', [x - first_leaf for x in
+                                          self.leaves_before[i:end + 1]])
+        return store
+
+    def span(self, i):
+        """Preorder arrays for the subtree rooted at node `i`."""
+        end = self.end[i]
+        return self.labels[i:end], self.arity[i:end], self.is_leaf[i:end]
+
+
+class CompactTree(object):
+    """Class implementing a parse tree stored in flat arrays rather than
+    nested lists. It supports the parts of the NLTK `Tree` interface used by
+    PETRARCH, so it can be used in place of an NLTK tree when
+    structuring, coreferencing and coding sentences.
+
+    A `CompactTree` is a view onto one node of a shared store. Indexing a
+    tree returns views of its subtrees, or strings for leaves, without
+    copying anything."""
+    __slots__ = ('_store', '_index')
+
+    def __init__(self, node_or_str, children=None):
+        """
+        Instantiate the CompactTree class.
+
+        Parameters
+        ----------
+
+        node_or_str : String
+                        Bracketed string form of a tree, as produced by
+                        StanfordNLP. If `children` is given this is instead
+                        the label of the new tree's root.
+
+        children : List
+                    Subtrees and leaf strings to use as the children of a
+                    new root labelled `node_or_str`. Subtrees are copied.
+        """
+        if children is None:
+            self._store = _parse(node_or_str)
+        else:
+            self._store = _build(node_or_str, children)
+        self._index = 0
+
+    @property
+    def node(self):
+        """Label of the tree's root."""
+        return self._store.labels[self._index]
+
+    def __len__(self):
+        return self._store.arity[self._index]
+
+    def __iter__(self):
+        store = self._store
+        end = store.end
+        child = self._index + 1
+        last = end[self._index]
+        while child < last:
+            yield _child(store, child)
+            child = end[child]
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, long)):
+            return _child(self._store, self._child_id(index))
+        elif isinstance(index, (list, tuple)):
+            node = self
+            for k in index:
+                node = node[k]
+            return node
+        else:
+            raise TypeError('{} indices must be integers or tuples, '
+                            'not {}'.format(type(self).__name__,
+                                            type(index).__name__))
+
+    def __setitem__(self, index, value):
+        """Replace the subtree or leaf at `index`, which may be a child
+        number or a tree position. Views of nodes after the replaced
+        subtree are invalidated."""
+        if isinstance(index, (int, long)):
+            index = (index,)
+        if not isinstance(index, (list, tuple)):
+            raise TypeError('{} indices must be integers or tuples, '
+                            'not {}'.format(type(self).__name__,
+                                            type(index).__name__))
+        if not index:
+            raise IndexError('The tree position () may not be assigned to.')
+        _splice(self._store, self._node_id(index), value)
+
+    def replaced(self, replacements):
+        """
+        Function to get a copy of the tree with several subtrees replaced.
+
+        Parameters
+        ----------
+
+        replacements : Iterable
+                        `(position, value)` pairs, where `value` is the
+                        subtree or leaf to put at tree position `position`.
+                        The replaced subtrees must not overlap.
+
+        Returns
+        -------
+
+        tree : CompactTree
+                The new tree. The original is unchanged.
+        """
+        targets = sorted([(self._node_id(position), value) for position,
+                          value in replacements], reverse=True)
+        tree = self.copy()
+        #Right to left, so each edit leaves the nodes still to be replaced
+        #where they were
+        last = None
+        for node, value in targets:
+            if last is not None and self._store.end[node] > last:
+                raise ValueError('Replaced subtrees overlap.')
+            _splice(tree._store, node - self._index, value)
+            last = node
+        return tree
+
+    def _node_id(self, position):
+        if not position:
+            return self._index
+        parent = self[tuple(position[:-1])]
+        if not isinstance(parent, CompactTree):
+            raise IndexError('Tree position {} is not in the '
+                             'tree.'.format(tuple(position)))
+        return parent._child_id(position[-1])
+
+    def _child_id(self, k):
+        store = self._store
+        arity = store.arity[self._index]
+        if k < 0:
+            k += arity
+        if not 0 <= k < arity:
+            raise IndexError('index out of range')
+        end = store.end
+        child = self._index + 1
+        for i in xrange(k):
+            child = end[child]
+        return child
+
+    def leaves(self):
+        """
+        Function to get the words at the leaves of the tree.
+
+        Returns
+        -------
+
+        leaves : List
+                    Leaf strings, in order.
+        """
+        store = self._store
+        labels = store.labels
+        first = store.leaves_before[self._index]
+        last = store.leaves_before[store.end[self._index]]
+        return [labels[i] for i in store.leaf_ids[first:last]]
+
+    def pos(self):
+        """
+        Function to get the words at the leaves of the tree along with the
+        labels of the nodes above them, i.e. their part-of-speech tags.
+
+        Returns
+        -------
+
+        pos : List
+                `(word, tag)` tuples, in order.
+        """
+        store = self._store
+        labels = store.labels
+        parent = store.parent
+        first = store.leaves_before[self._index]
+        last = store.leaves_before[store.end[self._index]]
+        return [(labels[i], labels[parent[i]]) for i in
+                store.leaf_ids[first:last]]
+
+    def subtrees(self, filter=None):
+        """
+        Generator over the tree and each of its subtrees, in preorder.
+
+        Parameters
+        ----------
+
+        filter : Function
+                    If given, only subtrees for which it returns True are
+                    yielded.
+
+        Yields
+        ------
+
+        subtree : CompactTree
+                    View of each subtree.
+        """
+        store = self._store
+        is_leaf = store.is_leaf
+        for i in xrange(self._index, store.end[self._index]):
+            if not is_leaf[i]:
+                subtree = _view(store, i)
+                if filter is None or filter(subtree):
+                    yield subtree
+
+    def subtrees_labelled(self, labels):
+        """
+        Generator over the subtrees whose root label is in `labels`, in
+        preorder. Faster than `subtrees` with a filter, since only the
+        matching nodes are turned into views.
+
+        Parameters
+        ----------
+
+        labels : Set
+                    Labels of the subtrees to yield.
+
+        Yields
+        ------
+
+        subtree : CompactTree
+                    View of each matching subtree.
+        """
+        store = self._store
+        node_labels = store.labels
+        is_leaf = store.is_leaf
+        for i in xrange(self._index, store.end[self._index]):
+            if node_labels[i] in labels and not is_leaf[i]:
+                yield _view(store, i)
+
+    def leaf_treeposition(self, index):
+        """
+        Function to find the tree position of a leaf.
+
+        Parameters
+        ----------
+
+        index : Integer
+                Position of the leaf among the tree's leaves.
+
+        Returns
+        -------
+
+        position : Tuple
+                    Tree position such that `tree[position]` is the leaf.
+        """
+        store = self._store
+        first = store.leaves_before[self._index]
+        count = store.leaves_before[store.end[self._index]] - first
+        #As in NLTK, negative indexes don't count from the end
+        if not 0 <= index < count:
+            raise IndexError('index out of range')
+        node = store.leaf_ids[first + index]
+        position = list()
+        while node != self._index:
+            position.append(store.sibling[node])
+            node = store.parent[node]
+        position.reverse()
+        return tuple(position)
+
+    def height(self):
+        """Function to get the height of the tree. A tree whose children are
+        all leaves has a height of two, as in NLTK."""
+        store = self._store
+        i = self._index
+        return max(store.depth[i:store.end[i]]) - store.depth[i] + 1
+
+    def copy(self, deep=False):
+        """Function to copy the tree into a store of its own. The copy is
+        always independent of the original, since leaves are strings. A
+        whole tree is copied without copying its arrays, which are only
+        copied if one of the trees is edited."""
+        if self._index == 0:
+            return _view(self._store.share(), 0)
+        return _view(_TreeStore(*self._store.span(self._index)), 0)
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __copy__(self):
+        return self.copy()
+
+    def __reduce__(self):
+        return (_rebuild, self._store.span(self._index))
+
+    def __eq__(self, other):
+        if isinstance(other, CompactTree):
+            return self._store.span(self._index) == \
+                other._store.span(other._index)
+        if isinstance(other, basestring) or not hasattr(other, 'node'):
+            return False
+        return self._pprint_flat() == other.pprint(margin=_NO_MARGIN)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def pprint(self, margin=70, indent=0, nodesep='', parens='()',
+               quotes=False):
+        """
+        Function to get the bracketed string form of the tree, laid out the
+        same way as NLTK's `Tree.pprint`.
+
+        Parameters
+        ----------
+
+        margin : Integer
+                    Right margin at which to wrap lines.
+
+        indent : Integer
+                    Indentation at which printing begins.
+
+        nodesep : String
+                    Separator between a node's label and its children.
+
+        parens : String
+                    Opening and closing brackets.
+
+        Returns
+        -------
+
+        output : String
+                    Bracketed string form of the tree.
+        """
+        flat = self._pprint_flat(nodesep, parens, quotes)
+        if len(flat) + indent < margin:
+            return flat
+        parts = ['%s%s%s' % (parens[0], self.node, nodesep)]
+        for child in self:
+            if isinstance(child, CompactTree):
+                child = child.pprint(margin, indent + 2, nodesep, parens,
+                                     quotes)
+            elif quotes:
+                child = '%r' % child
+            parts.append('\n' + ' ' * (indent + 2) + child)
+        parts.append(parens[1])
+        return ''.join(parts)
+
+    def _pprint_flat(self, nodesep='', parens='()', quotes=False):
+        store = self._store
+        labels = store.labels
+        arity = store.arity
+        is_leaf = store.is_leaf
+        parts = list()
+        remaining = list()
+        for i in xrange(self._index, store.end[self._index]):
+            if remaining:
+                remaining[-1] -= 1
+            if is_leaf[i]:
+                parts.append(' ')
+                parts.append('%r' % labels[i] if quotes else labels[i])
+            else:
+                if remaining:
+                    parts.append(' ')
+                parts.append(parens[0])
+                parts.append(labels[i])
+                parts.append(nodesep)
+                if not arity[i]:
+                    parts.append(' ')
+                remaining.append(arity[i])
+            while remaining and not remaining[-1]:
+                parts.append(parens[1])
+                remaining.pop()
+        return ''.join(parts)
+
+    def __str__(self):
+        return self.pprint()
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, self._pprint_flat())
+
+
+class LeafTable():
+    """Class mapping each leaf of a tree to its tree position, so
+    coreferencing can find leaves, and the words under any node, without
+    walking the tree."""
+    def __init__(self, tree):
+        """
+        Instantiate the LeafTable class.
+
+        Parameters
+        ----------
+
+        tree : CompactTree or NLTK.tree object
+                Tree to index.
+        """
+        self.tree = tree
+        self.positions = _leaf_positions(tree)
+        self.words = tree.leaves()
+
+    def position(self, index):
+        """Function to get the tree position of the `index`-th leaf. Raises
+        IndexError for an index outside the tree, like
+        `leaf_treeposition`."""
+        if index < 0:
+            raise IndexError('index must be non-negative')
+        return self.positions[index]
+
+    def word(self, index):
+        """Function to get the `index`-th leaf."""
+        if index < 0:
+            raise IndexError('index must be non-negative')
+        return self.words[index]
+
+    def span(self, position):
+        """
+        Function to find the leaves under a node. Leaf positions sort in
+        tree order, so the leaves under `position` are the run of positions
+        that start with it.
+
+        Parameters
+        ----------
+
+        position : Tuple
+                    Tree position of the node.
+
+        Returns
+        -------
+
+        span : Tuple
+                Index of the node's first leaf and one past its last.
+        """
+        position = tuple(position)
+        first = bisect.bisect_left(self.positions, position)
+        last = bisect.bisect_left(self.positions, position + (_NO_MARGIN,),
+                                  first)
+        if first == last:
+            raise IndexError('Tree position {} is not in the '
+                             'tree.'.format(position))
+        return first, last
+
+    def text(self, position):
+        """Function to get the words under a node joined by spaces, i.e.
+        `' '.join(tree[position].leaves())`."""
+        first, last = self.span(position)
+        return ' '.join(self.words[first:last])
+
+
+def _leaf_positions(tree):
+    """Private function to get the tree position of each leaf."""
+    if not isinstance(tree, CompactTree):
+        return tree.treepositions('leaves')
+    store = tree._store
+    parent = store.parent
+    sibling = store.sibling
+    root = tree._index
+    #Positions are built from the parent's, which comes first in preorder
+    positions = {root: ()}
+    for i in xrange(root + 1, store.end[root]):
+        positions[i] = positions[parent[i]] + (sibling[i],)
+    first = store.leaves_before[root]
+    last = store.leaves_before[store.end[root]]
+    return [positions[i] for i in store.leaf_ids[first:last]]
+
+
+#Wide enough that a tree is always printed on one line
+_NO_MARGIN = 2 ** 31
+
+
+def _view(store, index):
+    tree = CompactTree.__new__(CompactTree)
+    tree._store = store
+    tree._index = index
+    return tree
+
+
+def _child(store, i):
+    if store.is_leaf[i]:
+        return store.labels[i]
+    return _view(store, i)
+
+
+def _rebuild(labels, arity, is_leaf):
+    return _view(_TreeStore(labels, arity, is_leaf), 0)
+
+
+def _parse(text):
+    """Private function to read a bracketed tree string into a store. The
+    indexes are filled in as the string is read rather than in a second
+    pass over the tree."""
+    labels = list()
+    arity = list()
+    is_leaf = list()
+    parent = list()
+    end = list()
+    depth = list()
+    sibling = list()
+    leaf_ids = list()
+    leaves_before = list()
+    stack = list()
+
+    def open_node(label):
+        i = len(labels)
+        if stack:
+            top = stack[-1]
+            parent.append(top)
+            sibling.append(arity[top])
+            arity[top] += 1
+        else:
+            if labels:
+                raise ValueError('Tree string holds more than one tree.')
+            parent.append(-1)
+            sibling.append(0)
+        labels.append(_intern(label))
+        arity.append(0)
+        is_leaf.append(0)
+        depth.append(len(stack))
+        end.append(0)
+        leaves_before.append(len(leaf_ids))
+        stack.append(i)
+
+    want_label = False
+    for token in _TOKENS.findall(text):
+        if token == '(':
+            if want_label:
+                #A bracket with no label, as in '( (S ...))'
+                open_node('')
+            want_label = True
+        elif token == ')':
+            if want_label:
+                open_node('')
+                want_label = False
+            if not stack:
+                raise ValueError('Unbalanced brackets in tree string.')
+            end[stack.pop()] = len(labels)
+        elif want_label:
+            open_node(token)
+            want_label = False
+        else:
+            if not stack:
+                raise ValueError('Leaf {} is outside the tree.'.format(token))
+            i = len(labels)
+            top = stack[-1]
+            parent.append(top)
+            sibling.append(arity[top])
+            arity[top] += 1
+            labels.append(token)
+            arity.append(0)
+            is_leaf.append(1)
+            depth.append(len(stack))
+            end.append(i + 1)
+            leaves_before.append(len(leaf_ids))
+            leaf_ids.append(i)
+    if stack or want_label:
+        raise ValueError('Unbalanced brackets in tree string.')
+    if not labels:
+        raise ValueError('Empty tree string.')
+    leaves_before.append(len(leaf_ids))
+
+    store = _TreeStore.__new__(_TreeStore)
+    store.labels = labels
+    store.arity = array('i', arity)
+    store.is_leaf = array('b', is_leaf)
+    store.parent = array('i', parent)
+    store.end = array('i', end)
+    store.depth = array('i', depth)
+    store.sibling = array('i', sibling)
+    store.leaf_ids = array('i', leaf_ids)
+    store.leaves_before = array('i', leaves_before)
+    return store
+
+
+def _intern(label):
+    #Labels repeat across every tree, so share one copy of each
+    if type(label) is str:
+        return intern(label)
+    return label
+
+
+def _flatten(value):
+    """Private function to get preorder arrays for a subtree or leaf."""
+    if isinstance(value, CompactTree):
+        return value._store.span(value._index)
+    elif isinstance(value, basestring):
+        return [value], array('i', [0]), array('b', [1])
+    elif hasattr(value, 'node'):
+        #An NLTK tree
+        return _parse(value.pprint(margin=_NO_MARGIN)).span(0)
+    else:
+        raise TypeError('Cannot add a {} to a '
+                        'CompactTree.'.format(type(value).__name__))
+
+
+def _build(label, children):
+    """Private function to build a store for a new root over `children`.
+    The children's indexes are offset rather than rebuilt."""
+    labels = [_intern(label)]
+    arity = array('i', [len(children)])
+    is_leaf = array('b', [0])
+    parent = array('i', [-1])
+    end = array('i', [0])
+    depth = array('i', [0])
+    sibling = array('i', [0])
+    leaf_ids = array('i')
+    leaves_before = array('i', [0])
+    for k, child in enumerate(children):
+        piece = _piece(child)
+        offset = len(labels)
+        leaf_offset = len(leaf_ids)
+        labels.extend(piece.labels)
+        arity.extend(piece.arity)
+        is_leaf.extend(piece.is_leaf)
+        child_parent = array('i', [x + offset for x in piece.parent])
+        child_parent[0] = 0
+        parent.extend(child_parent)
+        end.extend(array('i', [x + offset for x in piece.end]))
+        depth.extend(array('i', [x + 1 for x in piece.depth]))
+        child_sibling = array('i', piece.sibling)
+        child_sibling[0] = k
+        sibling.extend(child_sibling)
+        leaf_ids.extend(array('i', [x + offset for x in piece.leaf_ids]))
+        leaves_before.extend(array('i', [x + leaf_offset for x in
+                                         piece.leaves_before[:-1]]))
+    end[0] = len(labels)
+    leaves_before.append(len(leaf_ids))
+
+    store = _TreeStore.__new__(_TreeStore)
+    store.labels = labels
+    store.arity = arity
+    store.is_leaf = is_leaf
+    store.parent = parent
+    store.end = end
+    store.depth = depth
+    store.sibling = sibling
+    store.leaf_ids = leaf_ids
+    store.leaves_before = leaves_before
+    return store
+
+
+def _piece(value):
+    """Private function to get a store holding just a subtree or leaf."""
+    if isinstance(value, CompactTree):
+        if value._index == 0:
+            return value._store
+        return value._store.subtree(value._index)
+    return _TreeStore(*_flatten(value))
+
+
+def _splice(store, target, value):
+    """Private function to replace the subtree at node `target` in place.
+    Nodes before the subtree keep their indexes and nodes after it move by
+    the change in size, so the indexes are shifted rather than rebuilt."""
+    piece = _piece(value)
+    end = store.end[target]
+    delta = len(piece.labels) - (end - target)
+    first_leaf = store.leaves_before[target]
+    last_leaf = store.leaves_before[end]
+    leaf_delta = len(piece.leaf_ids) - (last_leaf - first_leaf)
+
+    parent = array('i', [x + target for x in piece.parent])
+    parent[0] = store.parent[target]
+    sibling = array('i', piece.sibling)
+    sibling[0] = store.sibling[target]
+    depth = store.depth[target]
+
+    store.labels = store.labels[:target] + piece.labels + store.labels[end:]
+    store.arity = store.arity[:target] + piece.arity + store.arity[end:]
+    store.is_leaf = store.is_leaf[:target] + piece.is_leaf + \
+        store.is_leaf[end:]
+    #Only nodes after the subtree can have a parent after it
+    store.parent = store.parent[:target] + parent + \
+        array('i', [x + delta if x >= end else x for x in
+                    store.parent[end:]])
+    #Only the subtree's ancestors end after it starts
+    store.end = array('i', [x + delta if x > target else x for x in
+                            store.end[:target]]) + \
+        array('i', [x + target for x in piece.end]) + \
+        array('i', [x + delta for x in store.end[end:]])
+    store.depth = store.depth[:target] + \
+        array('i', [x + depth for x in piece.depth]) + store.depth[end:]
+    store.sibling = store.sibling[:target] + sibling + store.sibling[end:]
+    store.leaf_ids = store.leaf_ids[:first_leaf] + \
+        array('i', [x + target for x in piece.leaf_ids]) + \
+        array('i', [x + delta for x in store.leaf_ids[last_leaf:]])
+    store.leaves_before = store.leaves_before[:target] + \
+        array('i', [x + first_leaf for x in piece.leaves_before[:-1]]) + \
+        array('i', [x + leaf_delta for x in store.leaves_before[end:]])
@@ -0,0 +1,254 @@
+import atexit
+import threading
+import Queue
+import corenlp
+from contextlib import contextmanager
+
+#Number of stories a worker parses before it is restarted to bound the
+#growth of the JVM heap
+MAX_STORIES = 5000
+
+
+class CoreNLPWorker():
+    """Class wrapping a single long-lived StanfordCoreNLP process."""
+    def __init__(self, stanford_dir, max_stories=MAX_STORIES):
+        """
+        Instantiate the CoreNLPWorker class. The CoreNLP process is not
+        started until the worker is first used.
+
+        Parameters
+        ----------
+
+        stanford_dir : String
+                        Directory that contains the StanfordNLP files.
+
+        max_stories : Integer
+                        Number of stories to parse before the process is
+                        recycled. None or 0 never recycles.
+        """
+        self.stanford_dir = stanford_dir
+        self.max_stories = max_stories
+        self.core = None
+        self.parsed = 0
+        self.restarts = 0
+
+    def start(self):
+        """Function to start the CoreNLP process."""
+        self.core = corenlp.StanfordCoreNLP(self.stanford_dir)
+        self.parsed = 0
+
+    def stop(self):
+        """Function to stop the CoreNLP process, if it is running."""
+        core = self.core
+        self.core = None
+        if core is not None:
+            try:
+                core.corenlp.terminate(force=True)
+            except Exception:
+                pass
+
+    def restart(self):
+        """Function to stop and start the CoreNLP process."""
+        self.stop()
+        self.start()
+        self.restarts += 1
+
+    def is_alive(self):
+        """Function to check whether the CoreNLP process is running."""
+        process = getattr(self.core, 'corenlp', None)
+        return process is not None and process.isalive()
+
+    def is_spent(self):
+        """Function to check whether the worker has parsed enough stories
+        that it should be recycled."""
+        return bool(self.max_stories) and self.parsed >= self.max_stories
+
+    def raw_parse(self, text):
+        """
+        Function to parse text with the worker's CoreNLP process, starting
+        it first if it is not running.
+
+        Parameters
+        ----------
+
+        text : String
+                Text to parse.
+
+        Returns
+        -------
+
+        result : Dictionary
+                Parsed results as output by the StanfordCoreNLP Python
+                library.
+        """
+        if not self.is_alive():
+            if self.core is not None:
+                self.restarts += 1
+            self.stop()
+            self.start()
+        result = self.core.raw_parse(text)
+        self.parsed += 1
+        return result
+
+
+class CoreNLPPool():
+    """Class managing a pool of warm CoreNLP workers that can be checked out
+    by the parsing functions."""
+    def __init__(self, stanford_dir, size=1, max_stories=MAX_STORIES,
+                 retries=1):
+        """
+        Instantiate the CoreNLPPool class. Workers are created on demand, up
+        to `size`, and then reused for the life of the pool.
+
+        Parameters
+        ----------
+
+        stanford_dir : String
+                        Directory that contains the StanfordNLP files.
+
+        size : Integer
+                Maximum number of CoreNLP processes in the pool.
+
+        max_stories : Integer
+                        Number of stories a worker parses before it is
+                        recycled.
+
+        retries : Integer
+                    Number of times a story is retried on a restarted
+                    worker after the parse fails.
+        """
+        self.stanford_dir = stanford_dir
+        self.size = size
+        self.max_stories = max_stories
+        self.retries = retries
+        self.workers = list()
+        self._idle = Queue.Queue()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def checkout(self):
+        """
+        Function to check a worker out of the pool for the duration of a
+        `with` block. Blocks if every worker is in use. The worker is health
+        checked on checkout and recycled on return if it is spent.
+        """
+        worker = self._acquire()
+        try:
+            yield worker
+        finally:
+            self._release(worker)
+
+    def raw_parse(self, text):
+        """
+        Function to parse text using a worker from the pool. If the parse
+        fails the worker is restarted and the text retried.
+
+        Parameters
+        ----------
+
+        text : String
+                Text to parse.
+
+        Returns
+        -------
+
+        result : Dictionary
+                Parsed results as output by the StanfordCoreNLP Python
+                library.
+        """
+        with self.checkout() as worker:
+            attempt = 0
+            while True:
+                try:
+                    return worker.raw_parse(text)
+                except Exception, e:
+                    if attempt >= self.retries:
+                        raise
+                    attempt += 1
+                    print 'CoreNLP worker failed, restarting. {}'.format(e)
+                    worker.restart()
+
+    def stats(self):
+        """Function to report the number of workers and their restarts."""
+        return {'workers': len(self.workers),
+                'restarts': sum([worker.restarts for worker in self.workers])}
+
+    def close(self):
+        """Function to stop every CoreNLP process in the pool."""
+        for worker in self.workers:
+            worker.stop()
+
+    def _acquire(self):
+        try:
+            worker = self._idle.get_nowait()
+        except Queue.Empty:
+            with self._lock:
+                if len(self.workers) < self.size:
+                    worker = CoreNLPWorker(self.stanford_dir,
+                                           self.max_stories)
+                    self.workers.append(worker)
+                else:
+                    worker = None
+            if worker is None:
+                worker = self._idle.get()
+        if worker.core is not None and not worker.is_alive():
+            print 'CoreNLP worker died, restarting.'
+            worker.restart()
+        return worker
+
+    def _release(self, worker):
+        if worker.is_spent():
+            #Stopping here means the restart happens lazily on next use
+            worker.stop()
+        self._idle.put(worker)
+
+
+_pools = dict()
+_pools_lock = threading.Lock()
+
+
+def get_pool(stanford_dir, size=1, max_stories=MAX_STORIES):
+    """
+    Function to get the process-wide CoreNLP pool for a StanfordNLP
+    directory, creating it on first use. Every caller in a process shares
+    the same pool, so the JVM start-up and model loading is paid once per
+    process rather than once per call.
+
+    Parameters
+    ----------
+
+    stanford_dir : String
+                    Directory that contains the StanfordNLP files.
+
+    size : Integer
+            Maximum number of CoreNLP processes in the pool. An existing
+            pool is grown to this size if needed.
+
+    max_stories : Integer
+                    Number of stories a worker parses before it is
+                    recycled.
+
+    Returns
+    -------
+
+    pool : CoreNLPPool
+            The shared pool.
+    """
+    with _pools_lock:
+        pool = _pools.get(stanford_dir)
+        if pool is None:
+            pool = CoreNLPPool(stanford_dir, size, max_stories)
+            _pools[stanford_dir] = pool
+        elif pool.size < size:
+            pool.size = size
+    return pool
+
+
+def close_pools():
+    """Function to stop every CoreNLP process started in this process."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+atexit.register(close_pools)
@@ -0,0 +1,112 @@
+import os
+import hashlib
+import marshal
+import tempfile
+
+#Extension of the compiled file written next to each dictionary file
+SUFFIX = '.compiled'
+
+#Version of the compiled format. Bump it whenever the dictionary readers
+#change what they build, so that older compiled files are rebuilt
+FORMAT = 2
+
+
+def load(path, build):
+    """
+    Function to load a parsed dictionary from its compiled file, parsing the
+    text dictionary only when the compiled file is missing or stale. The
+    compiled file sits next to the text file and stores the parsed
+    dictionary in `marshal` format along with the size, modification time
+    and SHA-1 hash of the text it was built from. A compiled file is used
+    straight away if the size and modification time still match, and
+    otherwise only if the text's hash matches, so touching or copying a
+    dictionary doesn't force it to be parsed again.
+
+    Parameters
+    ----------
+
+    path : String
+            Filepath of the text dictionary.
+
+    build : Function
+            Function taking `path` and returning the parsed dictionary.
+            Called when there's no usable compiled file. The result must
+            only hold types `marshal` can store, e.g. dictionaries, lists,
+            tuples, strings, numbers and booleans.
+
+    Returns
+    -------
+
+    parsed : Object
+                The parsed dictionary.
+    """
+    stat = os.stat(path)
+    digest = None
+    try:
+        with open(path + SUFFIX, 'rb') as f:
+            header = marshal.load(f)
+            if header[0] == FORMAT and header[1] == stat.st_size:
+                if header[2] == stat.st_mtime:
+                    return marshal.load(f)
+                digest = _digest(path)
+                if header[3] == digest:
+                    parsed = marshal.load(f)
+                    #Record the new modification time so the hash isn't
+                    #needed next time
+                    _write(path, parsed, stat, digest)
+                    return parsed
+    except (IOError, OSError, EOFError, ValueError, TypeError, IndexError):
+        pass
+
+    #The hash is taken before parsing, so a file that changes while it's
+    #being parsed will be parsed again next time
+    if digest is None:
+        digest = _digest(path)
+    parsed = build(path)
+    _write(path, parsed, stat, digest)
+    return parsed
+
+
+def remove(path):
+    """Function to remove the compiled file for a text dictionary, if there
+    is one."""
+    try:
+        os.remove(path + SUFFIX)
+    except OSError:
+        pass
+
+
+def _digest(path):
+    """Private function to get the SHA-1 hash of a file."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), ''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write(path, parsed, stat, digest):
+    """Private function to write the compiled file for a text dictionary.
+    The file is written to a temporary file and renamed into place, so
+    other processes never load a partially written file. Failing to write,
+    e.g. because the dictionaries are installed read-only, isn't an error;
+    the text is just parsed again next time."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except (IOError, OSError), e:
+        print 'Unable to write compiled dictionary for {}. {}'.format(path,
+                                                                       e)
+        return
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            marshal.dump((FORMAT, stat.st_size, stat.st_mtime, digest), f)
+            marshal.dump(parsed, f)
+        os.rename(temp_path, path + SUFFIX)
+    except (IOError, OSError, ValueError), e:
+        print 'Unable to write compiled dictionary for {}. {}'.format(path,
+                                                                       e)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
@@ -0,0 +1,206 @@
+import re
+
+#Kinds of token in a verb dictionary
+VERB = 'verb'
+FORMS = 'forms'
+PATTERN = 'pattern'
+
+#Characters starting a comment line. A comment after the code of an entry,
+#e.g. `ATTACK [190] ;pas 5/12/98`, is dropped along with the rest of the
+#line after the code
+COMMENTS = (';', '#')
+
+#Splits a phrase into its words, keeping the connectors between them
+_CONNECTOR_SPLIT = re.compile('([ _])').split
+
+
+def phrase_list(phrase):
+    """
+    Function to split a phrase into a list alternating words and the
+    connectors after them, e.g. `['BURN', '_', 'DOWN', ' ']` for
+    `BURN_DOWN`. The last word is followed by a space unless the phrase
+    ends with a connector.
+
+    Parameters
+    ----------
+
+    phrase : String
+                Phrase with its words joined by `_` or a space.
+
+    Returns
+    -------
+
+    phlist : List
+                Words and connectors. Repeated connectors leave empty words.
+    """
+    if '_' not in phrase and ' ' not in phrase:
+        #A single word, which most patterns are on each side of the verb
+        if phrase:
+            return [phrase, ' ']
+        return []
+    parts = _CONNECTOR_SPLIT(phrase)
+    if parts[-1]:
+        parts.append(' ')
+    else:
+        parts.pop()
+    return parts
+
+
+def starts_verb(line):
+    """Function to tell whether a line of a verb dictionary starts a new
+    verb, rather than giving forms or a pattern of the one before it or
+    being a comment or blank."""
+    text = line.lstrip()
+    return bool(text) and text[0] not in COMMENTS and text[0] not in '-{'
+
+
+def verb_tokens(lines, source='<lines>'):
+    """
+    Function to read a verb dictionary in one pass, giving a token for each
+    entry as it's read. Blank lines and comment lines are skipped.
+
+    Parameters
+    ----------
+
+    lines : Iterable
+            Lines of the dictionary, e.g. an open file.
+
+    source : String
+                Name of the dictionary to give in error messages.
+
+    Returns
+    -------
+
+    tokens : Generator
+                Tuples starting with the token kind and the line number:
+                `(VERB, number, verb, code)` for a primary verb such as
+                `ATTACK ` or `BURN_DOWN `, `(FORMS, number, forms)` for a
+                `{...}` block, with each form as a verb key, and
+                `(PATTERN, number, highpat, lowpat, code)` for a
+                `- pattern [code]` line, with the words before the `*`
+                in `highpat` reading leftwards from the verb.
+
+    Raises
+    ------
+
+    ValueError
+                For a line that can't be read, giving its line number.
+    """
+    seen_verb = False
+    number = 0
+    for line in lines:
+        number += 1
+        text = line.strip()
+        if not text or text[0] in COMMENTS:
+            continue
+        first = text[0]
+        if first == '{':
+            close = text.find('}')
+            if close < 0:
+                raise ValueError(_error(source, number, 'Unclosed `{` in '
+                                        'verb forms.'))
+            if not seen_verb:
+                raise ValueError(_error(source, number, 'Verb forms come '
+                                        'before any verb.'))
+            yield FORMS, number, [form + ' ' for form in
+                                  text[1:close].split()]
+            continue
+
+        opening = text.find('[')
+        if opening < 0:
+            phrase = text
+            code = ''
+        else:
+            closing = text.find(']', opening)
+            if closing < 0:
+                raise ValueError(_error(source, number, 'Unclosed `[` in '
+                                        'code.'))
+            phrase = text[:opening].rstrip()
+            code = text[opening + 1:closing]
+        if first != '-':
+            seen_verb = True
+            yield VERB, number, phrase + ' ', code
+            continue
+        if not seen_verb:
+            raise ValueError(_error(source, number, 'Pattern comes before '
+                                    'any verb.'))
+        high, star, low = (phrase[1:] + ' ').partition('*')
+        highpat = phrase_list(high.lstrip())
+        highpat.reverse()
+        lowphrase = low.rstrip()
+        if lowphrase:
+            #Start with the connector after the verb, and leave out the
+            #space after the last word
+            lowpat = [low[0]] + phrase_list(lowphrase[1:])[:-1]
+        else:
+            lowpat = []
+        yield PATTERN, number, highpat, lowpat, code
+
+
+def actor_tokens(lines, source='<lines>'):
+    """
+    Function to read an actor dictionary in one pass, giving a token for
+    each actor as it's read. Blank lines and comment lines are skipped.
+
+    Parameters
+    ----------
+
+    lines : Iterable
+            Lines of the dictionary, e.g. an open file.
+
+    source : String
+                Name of the dictionary to give in error messages.
+
+    Returns
+    -------
+
+    tokens : Generator
+                `(number, keyword, pattern)` tuples, where `keyword` is the
+                first word of the actor and `pattern` is the code, the
+                connector after the keyword, and then `(word, connector)`
+                pairs for the remaining words.
+
+    Raises
+    ------
+
+    ValueError
+                For a line that can't be read, giving its line number.
+    """
+    number = 0
+    for line in lines:
+        number += 1
+        text = line.strip()
+        if not text or text[0] in COMMENTS:
+            continue
+        opening = text.find('[')
+        if opening < 0:
+            phrase = text
+            code = ''
+        else:
+            closing = text.find(']', opening)
+            if closing < 0:
+                raise ValueError(_error(source, number, 'Unclosed `[` in '
+                                        'code.'))
+            phrase = text[:opening].rstrip()
+            code = text[opening + 1:closing]
+        if ' ' in phrase:
+            parts = _CONNECTOR_SPLIT(phrase + ' ')
+            keyword = parts[0]
+            pattern = [code, parts[1]]
+            pattern.extend(zip(parts[2::2], parts[3::2]))
+        else:
+            #Most actors only join their words with `_`, which can be split
+            #without the regular expression
+            words = phrase.split('_')
+            keyword = words[0]
+            if len(words) == 1:
+                pattern = [code, ' ']
+            else:
+                pattern = [code, '_']
+                pattern.extend(zip(words[1:], ['_'] * (len(words) - 2) +
+                                   [' ']))
+        yield number, keyword, pattern
+
+
+def _error(source, number, problem):
+    return '{}, line {}: {}'.format(source, number, problem)
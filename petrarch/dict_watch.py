@@ -0,0 +1,305 @@
+import os
+import re
+import hashlib
+import threading
+from collections import defaultdict
+
+import coder
+import matchers
+import dict_tokenizer
+from vocabulary import Vocabulary
+
+#Ends the first word of an actor phrase
+_KEYWORD_END = re.compile('[ _]')
+
+
+class Dictionaries():
+    """Class holding one version of the actor and verb dictionaries. A
+    reload makes a new one rather than changing it, so anything coding with
+    it keeps a consistent view of the dictionaries until it asks for the
+    current one again. Its matchers share `vocabulary`, so a sentence
+    encoded with it can be given to either. Once a matcher is compiled its
+    raw dictionary is let go, and `actor_dict` or `verb_dict` is None."""
+    def __init__(self, actor_dict, verb_dict, version):
+        """
+        Instantiate the Dictionaries class.
+
+        Parameters
+        ----------
+
+        actor_dict : Dictionary
+                        Actor dictionary as built by
+                        `coder.ReadDictionaries.read_actor_dictionary`.
+
+        verb_dict : Dictionary
+                    Verb dictionary as built by
+                    `coder.ReadDictionaries.read_verb_dictionary`.
+
+        version : String
+                    Stamp identifying the text of both dictionaries, to be
+                    attached to every event coded with them.
+        """
+        self.actor_dict = actor_dict
+        self.verb_dict = verb_dict
+        self.version = version
+        self.vocabulary = Vocabulary()
+        self._actor_matcher = None
+        self._verb_matcher = None
+
+    def actor_matcher(self):
+        """Function to get a `matchers.ActorMatcher` for the actors,
+        compiling it the first time it's asked for."""
+        if self._actor_matcher is None:
+            self._actor_matcher = matchers.ActorMatcher(self.actor_dict,
+                                                       self.vocabulary)
+            self.actor_dict = None
+        return self._actor_matcher
+
+    def verb_matcher(self):
+        """Function to get a `matchers.VerbMatcher` for the verbs, compiling
+        it the first time it's asked for."""
+        if self._verb_matcher is None:
+            self._verb_matcher = matchers.VerbMatcher(self.verb_dict,
+                                                     self.vocabulary)
+            self.verb_dict = None
+        return self._verb_matcher
+
+
+class DictionaryWatcher():
+    """Class to keep the actor and verb dictionaries up to date while
+    PETRARCH runs. A background thread polls the dictionary files and, when
+    one has changed, parses only the actors and verbs whose lines changed,
+    builds a new `Dictionaries` alongside the current one, and swaps it in
+    with a single assignment. Coding that's under way carries on with the
+    `Dictionaries` it started with.
+
+    A change is only picked up once the file has stayed the same for a
+    whole poll, so a file that's still being saved isn't read half
+    written."""
+    def __init__(self, actors, verbs, interval=5.0):
+        """
+        Instantiate the DictionaryWatcher class. The dictionaries are read
+        straight away.
+
+        Parameters
+        ----------
+
+        actors : String
+                    Filepath for the actors dictionary.
+
+        verbs : String
+                Filepath for the verbs dictionary.
+
+        interval : Float
+                    Seconds between polls of the files.
+        """
+        self.actors = actors
+        self.verbs = verbs
+        self.interval = interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pending = dict()
+
+        self._actor_stat = _stat(actors)
+        self._actor_lines = _read_lines(actors)
+        #The raw dictionaries are kept here for the next reload to update,
+        #as `Dictionaries` lets go of them once its matchers are compiled
+        self._actor_dict = _read_actors(self._actor_lines)
+        self._verb_stat = _stat(verbs)
+        self._verb_lines = _read_lines(verbs)
+        #Each verb's block of lines, with the entries it gives
+        self._verb_blocks = dict()
+        self._verb_dict = self._merge_verbs(self._verb_lines)
+        self.current = Dictionaries(self._actor_dict, self._verb_dict,
+                                    self._version())
+
+    def start(self):
+        """Function to start polling the files in a background thread."""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Function to stop polling the files."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """
+        Function to poll the dictionary files once, reloading them if one
+        has changed and has stayed the same since the last poll.
+
+        Returns
+        -------
+
+        reloaded : Boolean
+                    Whether a new `Dictionaries` was swapped in.
+        """
+        with self._lock:
+            actor_stat = self._settled(self.actors, self._actor_stat)
+            verb_stat = self._settled(self.verbs, self._verb_stat)
+            if actor_stat is None and verb_stat is None:
+                return False
+            try:
+                actor_dict = self._actor_dict
+                verb_dict = self._verb_dict
+                if actor_stat is not None:
+                    actor_lines = _read_lines(self.actors)
+                    actor_dict = _update_actors(actor_dict, self._actor_lines,
+                                                actor_lines)
+                if verb_stat is not None:
+                    verb_lines = _read_lines(self.verbs)
+                    verb_dict = self._merge_verbs(verb_lines)
+            except Exception, e:
+                print 'Problem reloading the dictionaries. {}'.format(e)
+                #Wait for the next change rather than retrying every poll
+                self._actor_stat = actor_stat or self._actor_stat
+                self._verb_stat = verb_stat or self._verb_stat
+                return False
+
+            if actor_stat is not None:
+                self._actor_stat = actor_stat
+                self._actor_lines = actor_lines
+                self._actor_dict = actor_dict
+            if verb_stat is not None:
+                self._verb_stat = verb_stat
+                self._verb_lines = verb_lines
+                self._verb_dict = verb_dict
+            new = Dictionaries(actor_dict, verb_dict, self._version())
+            #Compile the matchers before the swap if they were in use, so
+            #coding doesn't stall compiling them
+            old = self.current
+            if old._actor_matcher is not None:
+                new.actor_matcher()
+            if old._verb_matcher is not None:
+                new.verb_matcher()
+            self.current = new
+            self.reloads += 1
+            return True
+
+    def _settled(self, path, known):
+        """Private function to get the new size and modification time of a
+        file that's changed and has stayed the same since the last poll, or
+        None."""
+        try:
+            stat = _stat(path)
+        except OSError:
+            return None
+        if stat == known:
+            self._pending.pop(path, None)
+            return None
+        if self._pending.get(path) != stat:
+            self._pending[path] = stat
+            return None
+        del self._pending[path]
+        return stat
+
+    def _merge_verbs(self, lines):
+        """Private function to build the verb dictionary from the blocks of
+        a verb file, only parsing the blocks that haven't been seen before.
+        Later blocks win where two give the same entry, as they do when the
+        whole file is read."""
+        blocks = _verb_blocks(lines)
+        parsed = dict()
+        verb_dict = dict()
+        for block in blocks:
+            entries = parsed.get(block)
+            if entries is None:
+                entries = self._verb_blocks.get(block)
+                if entries is None:
+                    entries = coder.ReadDictionaries(None, None) \
+                        .read_verb_dictionary(block)
+                parsed[block] = entries
+            verb_dict.update(entries)
+        self._verb_blocks = parsed
+        return verb_dict
+
+    def _version(self):
+        digest = hashlib.sha1()
+        digest.update(''.join(self._actor_lines))
+        digest.update('\0')
+        digest.update(''.join(self._verb_lines))
+        return digest.hexdigest()[:12]
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+def _read_lines(path):
+    with open(path, 'r') as f:
+        return f.readlines()
+
+
+def _read_actors(lines):
+    return coder.ReadDictionaries(None, None).read_actor_dictionary(lines)
+
+
+def _actor_keyword(line):
+    """Private function to get the word an actor line is keyed on in the
+    actor dictionary."""
+    return _KEYWORD_END.split(line.partition('[')[0].strip() + ' ', 1)[0]
+
+
+def _update_actors(actor_dict, old_lines, new_lines):
+    """
+    Private function to update an actor dictionary for a changed actors
+    file. Only the keywords whose lines were added, removed or reordered
+    are parsed again, from every line they key, so their patterns keep the
+    order a full read gives them.
+
+    Returns
+    -------
+
+    actor_dict : Dictionary
+                    New actor dictionary. The one passed in isn't changed.
+    """
+    old = _keyword_lines(old_lines)
+    new = _keyword_lines(new_lines)
+    changed = set([keyword for keyword in set(old) | set(new) if
+                   old.get(keyword) != new.get(keyword)])
+    if not changed:
+        return actor_dict
+    updated = dict(actor_dict)
+    for keyword in changed:
+        updated.pop(keyword, None)
+    updated.update(_read_actors([line for line in new_lines if
+                                 _actor_keyword(line) in changed]))
+    return updated
+
+
+def _keyword_lines(lines):
+    """Private function to group the lines of an actors file by the keyword
+    they're keyed on, keeping their order."""
+    grouped = defaultdict(list)
+    for line in lines:
+        grouped[_actor_keyword(line)].append(line)
+    return grouped
+
+
+def _verb_blocks(lines):
+    """Private function to split the lines of a verb file into blocks, each
+    a primary verb line followed by its form, pattern and comment lines."""
+    blocks = list()
+    block = list()
+    for line in lines:
+        if dict_tokenizer.starts_verb(line) and block:
+            blocks.append(tuple(block))
+            block = list()
+        block.append(line)
+    if block:
+        blocks.append(tuple(block))
+    return blocks
@@ -0,0 +1,946 @@
+from array import array
+
+import shared_dict
+from vocabulary import Vocabulary, UNKNOWN
+
+#Connector joining words that must be next to each other in the sentence
+ADJACENT = '_'
+#Connector joining words that can have other words between them
+GAP = ' '
+#TABARI markers for the target, source and so on in verb patterns, which
+#match any one word. Each is compiled as its own word, so where a pattern's
+#markers matched can be told apart
+WILDCARDS = ('+', '$', '%', '^')
+#Markers of the target and source of an event
+TARGET = '+'
+SOURCE = '$'
+
+#Characters opening and closing a set of alternatives in a verb pattern,
+#e.g. `{ GENEVA | INTERNATIONAL }`, and separating the alternatives
+_ALTERNATIVES = {'{': '}', '}': '{'}
+_SEPARATOR = '|'
+
+#Flags for the kinds of children a node of a `_Trie` has
+_ADJACENT_CHILD = 1
+_GAP_CHILD = 2
+_WILD_CHILD = 4
+
+#Edges are keyed on a single integer holding the node above the word id
+_NODE_SHIFT = 32
+
+
+class ActorMatcher():
+    """Class to find the actors in a sentence with a word-level trie compiled
+    from the patterns built by `coder.ReadDictionaries.read_actor_dictionary`.
+    Every pattern is matched in a single left-to-right pass over the words,
+    rather than by trying each pattern in turn at every word.
+
+    Words joined by `_` in a pattern have to be next to each other in the
+    sentence, while words joined by a space can have other words between
+    them. Where several patterns match from the same word the one with the
+    most words wins, and matches don't overlap, so the leftmost match is
+    kept.
+
+    Words and codes are stored as their ids in a `vocabulary.Vocabulary`.
+    `match` takes and returns strings, while `match_ids` works on a
+    sentence already encoded with `vocabulary.encode` and returns code
+    ids."""
+    #Tables holding the compiled trie, as written by `write_shared`
+    _TABLES = ('roots', 'adjacent_edges', 'gap_edges', 'codes', 'ranks',
+               'adjacent', 'gap_words')
+
+    def __init__(self, actor_dict=None, vocabulary=None):
+        """
+        Instantiate the ActorMatcher class.
+
+        Parameters
+        ----------
+
+        actor_dict : Dictionary
+                        Actor dictionary as built by
+                        `ReadDictionaries.read_actor_dictionary`.
+
+        vocabulary : Vocabulary
+                        Vocabulary to number the words and codes with, e.g.
+                        one shared with a `VerbMatcher`. Defaults to a new
+                        one.
+        """
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+        self.vocabulary = vocabulary
+        #Trie nodes are numbered from 1. Edges out of a node are keyed on the
+        #node and the next word's id, in separate tables for each connector
+        self._roots = dict()
+        self._adjacent_edges = dict()
+        self._gap_edges = dict()
+        #Per node: the code of the pattern ending there, whether it has
+        #children joined by `_`, and the words of its children joined by a
+        #space. Index 0 is unused
+        self._codes = array('i', [UNKNOWN])
+        #Order in which the patterns ending at each node were added, to
+        #break ties between matches in favour of the earlier pattern
+        self._ranks = array('i', [0])
+        self._adjacent = array('b', [0])
+        self._gap_words = [()]
+        self._added = 0
+        if actor_dict:
+            for keyword, patterns in actor_dict.iteritems():
+                for pattern in patterns:
+                    self.add(keyword, pattern)
+
+    def __len__(self):
+        """Number of nodes in the trie."""
+        return len(self._codes) - 1
+
+    def add(self, keyword, pattern):
+        """
+        Function to add a pattern to the matcher. If the same pattern was
+        already added, the code it was added with is kept.
+
+        Parameters
+        ----------
+
+        keyword : String
+                    First word of the pattern.
+
+        pattern : List
+                    Pattern as stored in the actor dictionary, i.e. the code,
+                    the connector after the keyword, and then
+                    `(word, connector)` pairs for the remaining words.
+        """
+        vocabulary = self.vocabulary
+        word = vocabulary.id(keyword)
+        node = self._roots.get(word)
+        if node is None:
+            node = self._new_node()
+            self._roots[word] = node
+        connector = pattern[1]
+        for word, next_connector in pattern[2:]:
+            #Repeated spaces leave empty words, which just join the words
+            #either side of them
+            if word:
+                node = self._add_edge(node, connector, vocabulary.id(word))
+            connector = next_connector
+        if self._codes[node] == UNKNOWN:
+            self._codes[node] = _code_id(vocabulary, pattern[0])
+            self._ranks[node] = self._added
+        self._added += 1
+
+    def write_shared(self, path):
+        """Function to write the compiled matcher, with its vocabulary, to a
+        file that `SharedActorMatcher` can open."""
+        tables = self.vocabulary.tables()
+        for name in self._TABLES:
+            tables[name] = getattr(self, '_' + name)
+        shared_dict.write(path, tables)
+
+    def _new_node(self):
+        self._codes.append(UNKNOWN)
+        self._ranks.append(0)
+        self._adjacent.append(0)
+        self._gap_words.append(())
+        return len(self._codes) - 1
+
+    def _add_edge(self, node, connector, word):
+        """Private function to get the child of a node, adding it if it
+        doesn't exist."""
+        if connector == ADJACENT:
+            edges = self._adjacent_edges
+        else:
+            edges = self._gap_edges
+        key = node << _NODE_SHIFT | word
+        child = edges.get(key)
+        if child is None:
+            child = self._new_node()
+            edges[key] = child
+            if connector == ADJACENT:
+                self._adjacent[node] = 1
+            else:
+                self._gap_words[node] += (word,)
+        return child
+
+    def find_all(self, words):
+        """
+        Function to find every pattern matching the words. Each start word
+        gives at most one match, the pattern with the most words, taking
+        the one ending first and then the one added first if there's a
+        tie.
+
+        Parameters
+        ----------
+
+        words : List
+                Uppercased words of the sentence.
+
+        Returns
+        -------
+
+        matches : List
+                    `(start, end, code)` tuples, sorted by start, where
+                    `words[start:end]` is the matched span.
+        """
+        string = self.vocabulary.string
+        return [(start, end, string(code)) for start, end, code in
+                self.find_ids(self.vocabulary.encode(words))]
+
+    def find_ids(self, words):
+        """Function to find every pattern matching a sentence encoded with
+        the matcher's vocabulary, as `find_all` does, giving the id of each
+        match's code."""
+        roots = self._roots
+        adjacent_edges = self._adjacent_edges
+        gap_edges = self._gap_edges
+        codes = self._codes
+        ranks = self._ranks
+        has_adjacent = self._adjacent
+        gap_words = self._gap_words
+        shift = _NODE_SHIFT
+        #Longest match so far for each start word, as
+        #(length, end, rank, code)
+        best = dict()
+        #Partial matches, as (node, start, words matched), that need the
+        #next word to continue by a `_` edge
+        live = list()
+        #Partial matches waiting across a gap, listed under each word that
+        #would continue them
+        expect = dict()
+        waiting = set()
+        for i, word in enumerate(words):
+            if live or expect:
+                advanced = list()
+                for node, start, length in live:
+                    child = adjacent_edges.get(node << shift | word)
+                    if child is not None:
+                        advanced.append((child, start, length + 1))
+                for node, start, length in expect.get(word, ()):
+                    advanced.append((gap_edges[node << shift | word], start,
+                                     length + 1))
+                child = roots.get(word)
+                if child is not None:
+                    advanced.append((child, i, 1))
+                elif not advanced:
+                    live = ()
+                    continue
+            else:
+                #Nothing is partly matched, so only a new match can start
+                child = roots.get(word)
+                if child is None:
+                    continue
+                advanced = [(child, i, 1)]
+
+            live = list()
+            for thread in advanced:
+                node, start, length = thread
+                code = codes[node]
+                if code != UNKNOWN:
+                    current = best.get(start)
+                    if current is None or length > current[0] or \
+                            (length == current[0] and i + 1 == current[1] and
+                             ranks[node] < current[2]):
+                        best[start] = (length, i + 1, ranks[node], code)
+                if has_adjacent[node]:
+                    live.append(thread)
+                #A partial match waiting across a gap only depends on its
+                #node and start, so it's only listed once
+                if gap_words[node] and (node, start) not in waiting:
+                    waiting.add((node, start))
+                    for next_word in gap_words[node]:
+                        expect.setdefault(next_word, list()).append(thread)
+        return [(start, best[start][1], best[start][3]) for start in
+                sorted(best)]
+
+    def match(self, words):
+        """
+        Function to find the actors in a sentence. Matches are taken from
+        `find_all` left to right, skipping any that overlap a match already
+        taken.
+
+        Parameters
+        ----------
+
+        words : List
+                Uppercased words of the sentence, e.g. from `Coder.words`.
+
+        Returns
+        -------
+
+        matches : List
+                    `(start, end, code)` tuples, sorted by start, where
+                    `words[start:end]` is the matched span.
+        """
+        string = self.vocabulary.string
+        return [(start, end, string(code)) for start, end, code in
+                self.match_ids(self.vocabulary.encode(words))]
+
+    def match_ids(self, words):
+        """Function to find the actors in a sentence encoded with the
+        matcher's vocabulary, as `match` does, giving the id of each
+        match's code."""
+        matches = list()
+        end = 0
+        for match in self.find_ids(words):
+            if match[0] >= end:
+                matches.append(match)
+                end = match[1]
+        return matches
+
+
+class _Trie():
+    """Class holding a word-level trie that's walked out from a fixed word
+    in the sentence, either to the right or to the left. Nodes are numbered
+    from 1 and each can hold a value. Words are vocabulary ids, and
+    `wildcards` are the ids of the words that match any word."""
+    _TABLES = ('adjacent_edges', 'gap_edges', 'flags', 'values')
+
+    def __init__(self, wildcards):
+        self.wildcards = tuple(wildcards)
+        self.adjacent_edges = dict()
+        self.gap_edges = dict()
+        #Per node: `_ADJACENT_CHILD`, `_GAP_CHILD` and `_WILD_CHILD` flags
+        #for the kinds of children it has, and its value. Index 0 is unused
+        self.flags = array('b', [0])
+        self.values = [None]
+
+    def add_node(self):
+        self.flags.append(0)
+        self.values.append(None)
+        return len(self.values) - 1
+
+    def add_edge(self, node, connector, word):
+        """Function to get the child of a node, adding it if it doesn't
+        exist."""
+        if word in self.wildcards:
+            self.flags[node] |= _WILD_CHILD
+        if connector == ADJACENT:
+            edges = self.adjacent_edges
+            self.flags[node] |= _ADJACENT_CHILD
+        else:
+            edges = self.gap_edges
+            self.flags[node] |= _GAP_CHILD
+        key = node << _NODE_SHIFT | word
+        child = edges.get(key)
+        if child is None:
+            child = self.add_node()
+            edges[key] = child
+        return child
+
+    def add_path(self, node, pairs):
+        """Function to add a path of `(connector, word id)` pairs below a
+        node, returning the node at its end."""
+        for connector, word in pairs:
+            node = self.add_edge(node, connector, word)
+        return node
+
+    def walk(self, node, words, anchor, step):
+        """
+        Function to find the nodes reached from a node by the words on one
+        side of an anchor word.
+
+        Parameters
+        ----------
+
+        node : Integer
+                Node to start from.
+
+        words : array
+                Ids of the uppercased words of the sentence.
+
+        anchor : Integer
+                    Index of the word the walk starts next to.
+
+        step : Integer
+                1 to walk to the right of the anchor, -1 to walk to the left.
+
+        Returns
+        -------
+
+        reached : List
+                    `(node, words matched, index of the last word matched,
+                    slots)` tuples, starting with the node walked from.
+                    `slots` holds a `(wildcard, index)` pair for each word
+                    matched by a wildcard, in the order they were walked.
+        """
+        adjacent_edges = self.adjacent_edges
+        gap_edges = self.gap_edges
+        flags = self.flags
+        wildcards = self.wildcards
+        reached = [(node, 0, anchor, ())]
+        #Nodes reached by the last word, and nodes waiting across a gap,
+        #of which only one copy of each is needed
+        fresh = reached
+        waiting = list()
+        seen = set()
+        i = anchor + step
+        while (fresh or waiting) and 0 <= i < len(words):
+            word = words[i]
+            advanced = list()
+            for node, count, last, slots in fresh:
+                flag = flags[node]
+                if flag & _GAP_CHILD and node not in seen:
+                    seen.add(node)
+                    waiting.append((node, count, slots,
+                                    flag & _WILD_CHILD))
+                if flag & _ADJACENT_CHILD:
+                    key = node << _NODE_SHIFT
+                    child = adjacent_edges.get(key | word)
+                    if child is not None:
+                        advanced.append((child, count + 1, i, slots))
+                    if flag & _WILD_CHILD:
+                        for wildcard in wildcards:
+                            child = adjacent_edges.get(key | wildcard)
+                            if child is not None:
+                                advanced.append((child, count + 1, i, slots +
+                                                 ((wildcard, i),)))
+            for node, count, slots, wild in waiting:
+                key = node << _NODE_SHIFT
+                child = gap_edges.get(key | word)
+                if child is not None:
+                    advanced.append((child, count + 1, i, slots))
+                if wild:
+                    for wildcard in wildcards:
+                        child = gap_edges.get(key | wildcard)
+                        if child is not None:
+                            advanced.append((child, count + 1, i, slots +
+                                             ((wildcard, i),)))
+            reached.extend(advanced)
+            fresh = advanced
+            i += step
+        return reached
+
+
+class VerbMatcher():
+    """Class to find the verbs in a sentence, and the pattern each matches,
+    with structures compiled from the verb dictionary built by
+    `coder.ReadDictionaries.read_verb_dictionary`.
+
+    Every form of a verb, e.g. `ATTACKS` or `BROKE DOWN`, is compiled into a
+    trie leading to its primary verb, so it's resolved without going
+    through the `[False, theverb]` entries. The patterns of each primary
+    verb are compiled into a trie of their words before the verb, read
+    leftwards from the verb, and from the end of each of those into a trie
+    of their words after the verb. Finding the longest matching pattern
+    only walks the parts of those tries that match the sentence, so it
+    takes the same time however many patterns the verb has. Connectors
+    behave as in `ActorMatcher`, and the TABARI markers `$`, `+`, `%` and
+    `^` match any one word. Each marker is compiled as its own word, so the
+    words matched by a pattern's `$` and `+`, its source and target, are
+    found along with its code. A set of alternatives such as
+    `{ GENEVA | INTERNATIONAL }` is compiled as a pattern for each of
+    them.
+
+    As in `ActorMatcher`, words, verbs and codes are stored as vocabulary
+    ids, and `match_ids` works on an encoded sentence."""
+    _TABLES = ('form_roots', 'low_roots', 'verbs')
+    _TRIES = ('forms', 'high', 'low')
+
+    def __init__(self, verb_dict=None, vocabulary=None):
+        """
+        Instantiate the VerbMatcher class.
+
+        Parameters
+        ----------
+
+        verb_dict : Dictionary
+                    Verb dictionary as built by
+                    `ReadDictionaries.read_verb_dictionary`.
+
+        vocabulary : Vocabulary
+                        Vocabulary to number the words, verbs and codes
+                        with, e.g. one shared with an `ActorMatcher`.
+                        Defaults to a new one.
+        """
+        if vocabulary is None:
+            vocabulary = Vocabulary()
+        self.vocabulary = vocabulary
+        wildcards = [vocabulary.id(marker) for marker in WILDCARDS]
+        self._source = wildcards[WILDCARDS.index(SOURCE)]
+        self._target = wildcards[WILDCARDS.index(TARGET)]
+        #Forms of the verbs, with the primary verb's id as the value at the
+        #end of each form
+        self._forms = _Trie(wildcards)
+        self._form_roots = dict()
+        #Words before the verb, with the root of the trie of the words
+        #after the verb for each node that ends a pattern's first part
+        self._high = _Trie(wildcards)
+        self._low = _Trie(wildcards)
+        self._low_roots = dict()
+        #Primary verb's id: (root in `_high`, id of the verb's code)
+        self._verbs = dict()
+        if verb_dict:
+            #Primary verbs first, so a form never hides a primary verb
+            primaries = sorted([key for key in verb_dict if
+                                verb_dict[key][0]])
+            forms = sorted([key for key in verb_dict if not
+                            verb_dict[key][0]])
+            for key in primaries:
+                entry = verb_dict[key]
+                self.add_verb(key, entry[1])
+                for rank, pattern in enumerate(entry[2:]):
+                    self.add_pattern(key, pattern, rank)
+            for key in forms:
+                self.add_form(key, verb_dict[key][1])
+
+    def add_verb(self, verb, code):
+        """
+        Function to add a primary verb.
+
+        Parameters
+        ----------
+
+        verb : String
+                Verb as keyed in the verb dictionary, e.g. `ATTACK ` or
+                `BURN DOWN `.
+
+        code : String
+                Code of the verb.
+        """
+        verb_id = self.vocabulary.id(verb)
+        if verb_id not in self._verbs:
+            self._verbs[verb_id] = (self._high.add_node(),
+                                    _code_id(self.vocabulary, code))
+        self.add_form(verb, verb)
+
+    def add_form(self, form, verb):
+        """
+        Function to add a form of a primary verb. If the form is already
+        known, the verb it was added for is kept.
+
+        Parameters
+        ----------
+
+        form : String
+                Form as keyed in the verb dictionary, e.g. `ATTACKED `.
+
+        verb : String
+                Primary verb the form belongs to.
+        """
+        pairs = self._encode_pairs(_phrase_pairs(form))
+        if not pairs:
+            return
+        node = self._form_roots.get(pairs[0][1])
+        if node is None:
+            node = self._forms.add_node()
+            self._form_roots[pairs[0][1]] = node
+        node = self._forms.add_path(node, pairs[1:])
+        if self._forms.values[node] is None:
+            self._forms.values[node] = self.vocabulary.id(verb)
+
+    def add_pattern(self, verb, pattern, rank=0):
+        """
+        Function to add a pattern to a primary verb.
+
+        Parameters
+        ----------
+
+        verb : String
+                Primary verb, which has to have been added.
+
+        pattern : List
+                    `[highpat, lowpat, code]` as stored in the verb
+                    dictionary.
+
+        rank : Integer
+                Position of the pattern among the verb's patterns. If two
+                patterns match equally well, the one with the lower rank
+                wins.
+
+        Raises
+        ------
+
+        ValueError
+                    For a set of alternatives that isn't closed, or that's
+                    inside another.
+        """
+        highpat, lowpat, code = pattern
+        verb_root = self._verbs[self.vocabulary.get(verb)][0]
+        code_id = _code_id(self.vocabulary, code)
+        for high in _pattern_alternatives(highpat):
+            high = self._encode_pairs(high)
+            node = self._high.add_path(verb_root, high)
+            low_root = self._low_roots.get(node)
+            if low_root is None:
+                low_root = self._low.add_node()
+                self._low_roots[node] = low_root
+            for low in _pattern_alternatives(lowpat):
+                low = self._encode_pairs(low)
+                end = self._low.add_path(low_root, low)
+                value = (len(high) + len(low), -rank, code_id)
+                current = self._low.values[end]
+                if current is None or value[:2] > current[:2]:
+                    self._low.values[end] = value
+
+    def _encode_pairs(self, pairs):
+        """Private function to swap the words of `(connector, word)` pairs
+        for their ids."""
+        vocabulary = self.vocabulary
+        return [(connector, vocabulary.id(word)) for connector, word in pairs]
+
+    def write_shared(self, path):
+        """Function to write the compiled matcher, with its vocabulary, to a
+        file that `SharedVerbMatcher` can open."""
+        tables = self.vocabulary.tables()
+        for name in self._TABLES:
+            tables[name] = getattr(self, '_' + name)
+        for name in self._TRIES:
+            trie = getattr(self, '_' + name)
+            for table in trie._TABLES:
+                tables[name + '.' + table] = getattr(trie, table)
+        shared_dict.write(path, tables)
+
+    def primary(self, word):
+        """Function to get the primary verb for a single-word form, e.g.
+        `ATTACKED ` for `ATTACKED`, or None."""
+        node = self._form_roots.get(self.vocabulary.get(word))
+        if node is None:
+            return None
+        return self.vocabulary.string(self._forms.values[node])
+
+    def find(self, words, index):
+        """
+        Function to find the verb starting at a word, and the longest of its
+        patterns that matches the sentence.
+
+        Parameters
+        ----------
+
+        words : List
+                Uppercased words of the sentence.
+
+        index : Integer
+                Index of the word to look for a verb at.
+
+        Returns
+        -------
+
+        match : Tuple
+                `(end, verb, code, source, target)`, where
+                `words[index:end]` is the verb, `verb` is the primary verb
+                and `code` is the code of the longest matching pattern or
+                otherwise of the verb. `source` and `target` are the
+                indices of the words matched by the pattern's `$` and `+`,
+                or None where it has no such marker. None if no verb starts
+                at the word.
+        """
+        found = self.find_ids(self.vocabulary.encode(words), index)
+        if found is None:
+            return None
+        string = self.vocabulary.string
+        return (found[0], string(found[1]), string(found[2])) + found[3:]
+
+    def find_ids(self, words, index):
+        """Function to find the verb starting at a word of a sentence
+        encoded with the matcher's vocabulary, as `find` does, giving the
+        ids of the verb and code."""
+        root = self._form_roots.get(words[index])
+        if root is None:
+            return None
+        verb = None
+        for node, count, last, slots in self._forms.walk(root, words, index,
+                                                          1):
+            value = self._forms.values[node]
+            if value is not None and (verb is None or count > verb[0]):
+                verb = (count, last, value)
+        if verb is None:
+            return None
+        last, verb = verb[1:]
+        high_root, code = self._verbs[verb]
+
+        #Each node reached before the verb ends the first part of some
+        #patterns, whose second parts are then walked after the verb
+        best = None
+        best_slots = ()
+        low_values = self._low.values
+        for high, h, first, high_slots in self._high.walk(high_root, words,
+                                                          index, -1):
+            low_root = self._low_roots.get(high)
+            if low_root is None:
+                continue
+            for low, l, end, low_slots in self._low.walk(low_root, words,
+                                                         last, 1):
+                value = low_values[low]
+                if value is not None and (best is None or
+                                          value[:2] > best[:2]):
+                    best = value
+                    best_slots = high_slots + low_slots
+        if best is not None:
+            code = best[2]
+        source = None
+        target = None
+        for wildcard, i in best_slots:
+            if wildcard == self._source:
+                source = i
+            elif wildcard == self._target:
+                target = i
+        return last + 1, verb, code, source, target
+
+    def match(self, words):
+        """
+        Function to find the verbs in a sentence, left to right.
+
+        Parameters
+        ----------
+
+        words : List
+                Uppercased words of the sentence, e.g. from `Coder.words`.
+
+        Returns
+        -------
+
+        matches : List
+                    `(start, end, verb, code, source, target)` tuples,
+                    where `words[start:end]` is the verb, `verb` is the
+                    primary verb, `code` is the code it's coded with, and
+                    `source` and `target` are as given by `find`.
+        """
+        string = self.vocabulary.string
+        return [(start, end, string(verb), string(code), source, target)
+                for start, end, verb, code, source, target in
+                self.match_ids(self.vocabulary.encode(words))]
+
+    def match_ids(self, words):
+        """Function to find the verbs in a sentence encoded with the
+        matcher's vocabulary, as `match` does, giving the ids of the verbs
+        and codes."""
+        form_roots = self._form_roots
+        matches = list()
+        i = 0
+        while i < len(words):
+            #Most words don't start a verb, which is cheaper to check here
+            #than by trying to find one
+            if words[i] not in form_roots:
+                i += 1
+                continue
+            found = self.find_ids(words, i)
+            if found is None:
+                i += 1
+                continue
+            matches.append((i,) + found)
+            i = found[0]
+        return matches
+
+
+class SharedActorMatcher(ActorMatcher):
+    """Class to find actors, as `ActorMatcher` does, with a compiled matcher
+    that's been written to a file by `ActorMatcher.write_shared`. The file
+    is memory-mapped and searched in place, so any number of processes can
+    share the one copy of a large actor dictionary. The matcher is
+    read-only."""
+    def __init__(self, path, vocabulary=None):
+        """
+        Instantiate the SharedActorMatcher class.
+
+        Parameters
+        ----------
+
+        path : String
+                Filepath written by `ActorMatcher.write_shared`.
+
+        vocabulary : Vocabulary
+                        Vocabulary to use instead of the one in the file,
+                        which it must number the same way, e.g. one opened
+                        from another file written with the same vocabulary.
+        """
+        tables = shared_dict.load(path)
+        if vocabulary is None:
+            vocabulary = _shared_vocabulary(tables)
+        self.vocabulary = vocabulary
+        for name in self._TABLES:
+            setattr(self, '_' + name, tables[name])
+
+    def add(self, keyword, pattern):
+        raise TypeError('A SharedActorMatcher is read-only.')
+
+    def write_shared(self, path):
+        raise TypeError('A SharedActorMatcher is already shared.')
+
+
+class SharedVerbMatcher(VerbMatcher):
+    """Class to find verbs, as `VerbMatcher` does, with a compiled matcher
+    that's been written to a file by `VerbMatcher.write_shared`. The file
+    is memory-mapped and searched in place, so any number of processes can
+    share the one copy of a large verb dictionary. The matcher is
+    read-only."""
+    def __init__(self, path, vocabulary=None):
+        """
+        Instantiate the SharedVerbMatcher class.
+
+        Parameters
+        ----------
+
+        path : String
+                Filepath written by `VerbMatcher.write_shared`.
+
+        vocabulary : Vocabulary
+                        Vocabulary to use instead of the one in the file,
+                        which it must number the same way, e.g. one opened
+                        from another file written with the same vocabulary.
+        """
+        tables = shared_dict.load(path)
+        if vocabulary is None:
+            vocabulary = _shared_vocabulary(tables)
+        self.vocabulary = vocabulary
+        for name in self._TABLES:
+            setattr(self, '_' + name, tables[name])
+        wildcards = [self.vocabulary.get(marker) for marker in WILDCARDS]
+        self._source = wildcards[WILDCARDS.index(SOURCE)]
+        self._target = wildcards[WILDCARDS.index(TARGET)]
+        for name in self._TRIES:
+            trie = _Trie(wildcards)
+            for table in trie._TABLES:
+                setattr(trie, table, tables[name + '.' + table])
+            setattr(self, '_' + name, trie)
+
+    def add_verb(self, verb, code):
+        raise TypeError('A SharedVerbMatcher is read-only.')
+
+    def add_form(self, form, verb):
+        raise TypeError('A SharedVerbMatcher is read-only.')
+
+    def add_pattern(self, verb, pattern, rank=0):
+        raise TypeError('A SharedVerbMatcher is read-only.')
+
+    def write_shared(self, path):
+        raise TypeError('A SharedVerbMatcher is already shared.')
+
+
+def _shared_vocabulary(tables):
+    """Private function to get the vocabulary stored with a shared
+    matcher."""
+    return Vocabulary(tables['vocabulary.ids'], tables['vocabulary.strings'])
+
+
+def _code_id(vocabulary, code):
+    """Private function to get the id of a code, with `UNKNOWN` standing for
+    a missing code."""
+    if code is None:
+        return UNKNOWN
+    return vocabulary.id(code)
+
+
+def _phrase_pairs(phrase):
+    """Private function to split a verb or form such as `BURN_DOWN ` into
+    `(connector, word)` pairs, the connector being the one before the
+    word."""
+    pairs = list()
+    connector = GAP
+    start = 0
+    phrase = phrase.strip()
+    for i, char in enumerate(phrase):
+        if char in (ADJACENT, GAP):
+            if i > start:
+                pairs.append((connector, phrase[start:i]))
+            connector = char
+            start = i + 1
+    if start < len(phrase):
+        pairs.append((connector, phrase[start:]))
+    return pairs
+
+
+def _pattern_pairs(pattern):
+    """Private function to turn a `highpat` or `lowpat` list, which
+    alternates connectors and words starting from the one next to the
+    verb, into `(connector, word)` pairs, skipping empty words."""
+    return [(pattern[k], pattern[k + 1]) for k in xrange(0, len(pattern) - 1,
+                                                          2)
+            if pattern[k + 1]]
+
+
+def _pattern_alternatives(pattern):
+    """
+    Private function to expand the sets of alternatives in a `highpat` or
+    `lowpat` list, e.g. `DEMAND_{ GENEVA_ | INTERNATIONAL }_CONVENTIONS`,
+    into the `(connector, word)` pairs of each pattern they stand for.
+
+    Spaces padding the braces and bars don't separate the words either side
+    of them, so a word is joined to the one before it with `_` if any
+    connector between them is `_`, and otherwise with a space.
+
+    Parameters
+    ----------
+
+    pattern : List
+                Connectors and words, starting from the one next to the
+                verb, as in `_pattern_pairs`. A `highpat` reads leftwards,
+                so its sets of alternatives open with `}`.
+
+    Returns
+    -------
+
+    patterns : List
+                List of the `(connector, word)` pairs of each pattern.
+
+    Raises
+    ------
+
+    ValueError
+                For a set of alternatives that isn't closed, or that's
+                inside another.
+    """
+    words = pattern[1::2]
+    if not any(word in _ALTERNATIVES for word in words):
+        return [_pattern_pairs(pattern)]
+    for word in words:
+        if word not in _ALTERNATIVES and word != _SEPARATOR and (
+                '{' in word or '}' in word or _SEPARATOR in word):
+            raise ValueError('Braces and bars of alternatives in a verb '
+                             'pattern have to be set off by spaces: '
+                             '{}.'.format(word))
+
+    #Each pattern is built as its pairs, with the connectors seen since its
+    #last word
+    patterns = [([], [])]
+    closing = None
+    options = None
+    for k in xrange(0, len(pattern) - 1, 2):
+        connector = pattern[k]
+        word = pattern[k + 1]
+        if closing is None:
+            if word in _ALTERNATIVES:
+                closing = _ALTERNATIVES[word]
+                for pairs, connectors in patterns:
+                    connectors.append(connector)
+                options = [[]]
+            else:
+                for pairs, connectors in patterns:
+                    _add_word(pairs, connectors, connector, word)
+        elif word == closing:
+            options[-1].append(connector)
+            patterns = [(pairs + option_pairs, option_connectors)
+                        for pairs, connectors in patterns
+                        for option_pairs, option_connectors in
+                        [_option_pairs(connectors, option)
+                         for option in options]]
+            closing = None
+        elif word in _ALTERNATIVES:
+            raise ValueError('Alternatives inside alternatives in a verb '
+                             'pattern.')
+        elif word == _SEPARATOR:
+            options[-1].append(connector)
+            options.append([])
+        else:
+            options[-1].extend((connector, word))
+    if closing is not None:
+        raise ValueError('Unclosed alternatives in a verb pattern.')
+    return [pairs for pairs, connectors in patterns]
+
+
+def _add_word(pairs, connectors, connector, word):
+    """Private function to add a word, or the connector before an empty
+    word, to a pattern being built by `_pattern_alternatives`."""
+    connectors.append(connector)
+    if word:
+        pairs.append((ADJACENT if ADJACENT in connectors else GAP, word))
+        del connectors[:]
+
+
+def _option_pairs(connectors, option):
+    """Private function to get the pairs and trailing connectors of one
+    alternative, following the connectors of the pattern it extends."""
+    pairs = list()
+    connectors = list(connectors)
+    #An alternative holds the connector before each word and ends with the
+    #connector before the bar or brace after it
+    for k in xrange(0, len(option) - 1, 2):
+        _add_word(pairs, connectors, option[k], option[k + 1])
+    connectors.append(option[-1])
+    return pairs, connectors
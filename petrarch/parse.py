@@ -1,9 +1,21 @@
+import os
+import heapq
+import shutil
+import tempfile
+import multiprocessing
 import corenlp
-import nltk.tree
 import utilities
+import coder
+import records
+import corenlp_pool
+import parse_cache
 
+#Token placed between stories when several are parsed in one request
+STORY_SEPARATOR = 'PETRARCHSTORYBREAK'
 
-def parse(event_dict, stanford_dir):
+
+def parse(event_dict, stanford_dir, pool=None, batch_size=1, cache=None,
+          phrase_labels=None):
     """Function to parse single-sentence input using StanfordNLP. The function
     parses the input, and performs pronoun coreferencing where appropriate. If
     the input is longer than one setence as determined by StanfordNLP, the
@@ -20,6 +32,23 @@ def parse(event_dict, stanford_dir):
     stanford_dir: String.
                     Directory that contains the StanfordNLP files.
 
+    pool: corenlp_pool.CoreNLPPool.
+            Pool of CoreNLP workers to parse with. Defaults to the shared
+            pool for `stanford_dir`, so the CoreNLP start-up cost is paid
+            once per process.
+
+    batch_size: Integer.
+                Number of stories to send to CoreNLP in a single request.
+                Defaults to 1.
+
+    cache: parse_cache.ParseCache.
+            Optional cache of parse results. Stories found in the cache
+            aren't sent to CoreNLP, and new results are added to it.
+
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence, as for
+                    `parse_sents`. Defaults to noun and verb phrases.
+
     Returns
     --------
 
@@ -36,7 +65,7 @@ def parse(event_dict, stanford_dir):
                     dictionaries as their values. The `sents` dictionary has
                     integers as keys, which represent the different sentences
                     within a text input. Each individual sentence dictionary
-                    contains the keys `parse_tree` (nltk.tree),
+                    contains the keys `parse_tree` (CompactTree),
                     `dependencies` (list), `np_words` (list),
                     `word_info` (list), `verb_phrases` (list),
                     `vp_words` (list), and `noun_phrases` (list).
@@ -53,24 +82,539 @@ def parse(event_dict, stanford_dir):
                                                 }}}
     """
     output_dict = dict()
-    corenlp_dir = stanford_dir
-    core = corenlp.StanfordCoreNLP(corenlp_dir)
-    for key in event_dict:
-        result = core.raw_parse(event_dict[key]['story'])
-        if len(result['sentences']) == 1:
-            output = parse_sents(key, result)
-            output_dict.update(output)
-            if 'coref' in result:
-                utilities.coref_replace(output_dict, key)
-        else:
-            print """Key {} is longer than one sentence, passing. Please check
-the input format if you would like this key to be parsed!""".format(key)
-            pass
+    for key, output in iter_parse(event_dict, stanford_dir, pool,
+                                  batch_size, cache, phrase_labels):
+        output_dict[key] = output
 
     return output_dict
 
 
-def batch_parse(text_dir, stanford_dir):
+def iter_parse(events, stanford_dir, pool=None, batch_size=1, cache=None,
+               phrase_labels=None):
+    """Generator version of `parse`. Stories are parsed and yielded one at a
+    time, so the input can be streamed straight from
+    `reader.iter_stories` and the output straight to the writer without
+    holding every story in memory.
+
+    Parameters
+    ----------
+
+    events : Dictionary or iterable
+                Either a dictionary of events as taken by `parse`, or an
+                iterable of `(id, day, story)` records as yielded by
+                `reader.iter_stories`.
+
+    stanford_dir: String.
+                    Directory that contains the StanfordNLP files.
+
+    pool: corenlp_pool.CoreNLPPool.
+            Pool of CoreNLP workers to parse with. Defaults to the shared
+            pool for `stanford_dir`.
+
+    batch_size: Integer.
+                Number of stories to send to CoreNLP in a single request.
+                Stories in a batch are joined with `STORY_SEPARATOR` and the
+                returned sentences mapped back to their stories, giving the
+                same output as parsing them one at a time. Batches that
+                can't be aligned are re-parsed story by story. Defaults
+                to 1.
+
+    cache: parse_cache.ParseCache.
+            Optional cache of parse results, consulted before CoreNLP.
+
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence, as for
+                    `parse_sents`. Defaults to noun and verb phrases.
+
+    Yields
+    ------
+
+    output : Tuple
+                `(event_id, event_info)` where `event_info` is the value
+                `parse` would store under `event_id` in `output_dict`.
+    """
+    if pool is None:
+        pool = corenlp_pool.get_pool(stanford_dir)
+    stories = _iter_stories(events)
+    for key, result in _iter_results(stories, pool, batch_size, cache):
+        output = _structure(key, result, phrase_labels)
+        if output is not None:
+            yield key, output
+
+
+def parse_unit(unit, pool, cache=None):
+    """Function to run CoreNLP over a unit of stories in one batch. Used as
+    the parse stage of a `pipeline.Pipeline`.
+
+    Parameters
+    ----------
+
+    unit: List.
+            List of `(id, story)` pairs.
+
+    pool: corenlp_pool.CoreNLPPool.
+            Pool of CoreNLP workers to parse with.
+
+    cache: parse_cache.ParseCache.
+            Optional cache of parse results.
+
+    Returns
+    -------
+
+    results: List.
+                List of `(id, result)` pairs holding the raw CoreNLP
+                results.
+    """
+    return list(_iter_results(unit, pool, len(unit), cache))
+
+
+def structure_unit(results, phrase_labels=None):
+    """Function to turn raw CoreNLP results into the structured output of
+    `parse`, performing coreferencing. Used as the coreference stage of a
+    `pipeline.Pipeline`.
+
+    Parameters
+    ----------
+
+    results: List.
+                List of `(id, result)` pairs as returned by `parse_unit`.
+
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence, as for
+                    `parse_sents`. Defaults to noun and verb phrases.
+
+    Returns
+    -------
+
+    output: List.
+            List of `(event_id, event_info)` pairs. Stories longer than one
+            sentence are left out, as in `parse`.
+    """
+    output = list()
+    for key, result in results:
+        event_info = _structure(key, result, phrase_labels)
+        if event_info is not None:
+            output.append((key, event_info))
+
+    return output
+
+
+def _structure(key, result, phrase_labels=None):
+    """Private function to build the structured output for a single-sentence
+    story and perform coreferencing. Returns None for longer stories."""
+    if len(result['sentences']) != 1:
+        print """Key {} is longer than one sentence, passing. Please check
+the input format if you would like this key to be parsed!""".format(key)
+        return None
+    output = parse_sents(key, result, phrase_labels)
+    if 'coref' in result:
+        utilities.coref_replace(output, key)
+
+    return output[key]
+
+
+def parallel_parse(events, stanford_dir, processes=None, batch_size=1,
+                   cache_dir=None, cache_size=parse_cache.MAX_SIZE,
+                   unit_size=None, stats=None, dictionaries=None,
+                   phrase_labels=None):
+    """Function to parse single-sentence input in parallel across a pool of
+    worker processes. Stories are handed out in small work units that idle
+    workers pull from a shared queue, so a slow story only holds up its own
+    unit rather than a fixed share of the input. Each worker keeps its own
+    CoreNLP process warm for the whole run.
+
+    Parameters
+    ----------
+
+    events : Dictionary or iterable
+                Either a dictionary of events as taken by `parse`, or an
+                iterable of `(id, day, story)` records as yielded by
+                `reader.iter_stories`.
+
+    stanford_dir: String.
+                    Directory that contains the StanfordNLP files.
+
+    processes: Integer.
+                Number of worker processes. Defaults to the number of CPUs.
+
+    batch_size: Integer.
+                Number of stories to send to CoreNLP in a single request.
+
+    cache_dir: String.
+                Optional directory of a parse cache shared by the workers.
+
+    cache_size: Integer.
+                Size limit of the parse cache in bytes.
+
+    unit_size: Integer.
+                Number of stories in each work unit. If not given, units
+                shrink as the input runs out when the number of events is
+                known, and otherwise hold `batch_size` stories.
+
+    stats: Dictionary.
+            Optional dictionary updated with the total cache `hits` and
+            `misses` of the workers.
+
+    dictionaries: Tuple.
+                    Optional `(actors, verbs)` filepaths of the dictionaries.
+                    If given, each worker codes the sentences it parses with
+                    `coder.code_batch`, storing each sentence's
+                    `(source, target, code)` events under `events`. The
+                    dictionaries are compiled into matchers once, in a
+                    shared file that every worker memory-maps rather than
+                    loading its own copy.
+
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence, as for
+                    `parse_sents`. Defaults to noun and verb phrases.
+
+    Yields
+    ------
+
+    output : Tuple
+                `(event_id, event_info)` pairs, in the order the work units
+                complete.
+    """
+    if not processes or processes < 1:
+        processes = multiprocessing.cpu_count()
+    if stats is not None:
+        stats.setdefault('hits', 0)
+        stats.setdefault('misses', 0)
+    total = len(events) if hasattr(events, 'iteritems') else None
+    units = _make_units(_iter_stories(events), processes,
+                        unit_size or batch_size, total)
+
+    shared_dir = None
+    shared = None
+    if dictionaries:
+        shared_dir = tempfile.mkdtemp(prefix='petrarch-')
+        shared = coder.share_dictionaries(dictionaries[0], dictionaries[1],
+                                          shared_dir)
+    try:
+        workers = multiprocessing.Pool(processes, _init_worker,
+                                       (stanford_dir, batch_size, cache_dir,
+                                        cache_size, shared, phrase_labels))
+        try:
+            for outputs, hits, misses in workers.imap_unordered(_parse_unit,
+                                                                units):
+                if stats is not None:
+                    stats['hits'] += hits
+                    stats['misses'] += misses
+                for output in outputs:
+                    yield output
+            workers.close()
+        finally:
+            workers.terminate()
+            workers.join()
+    finally:
+        if shared_dir:
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+
+def iter_units(events, unit_size):
+    """Generator to group events into work units for `parse_unit`.
+
+    Parameters
+    ----------
+
+    events : Dictionary or iterable
+                Events as taken by `iter_parse`.
+
+    unit_size: Integer.
+                Number of stories in each unit.
+
+    Yields
+    ------
+
+    unit : List
+            List of `(id, story)` pairs.
+    """
+    return _make_units(_iter_stories(events), 1, max(unit_size, 1))
+
+
+def _make_units(stories, processes, unit_size, total=None):
+    """Private generator to group `(id, story)` pairs into work units. When
+    the number of stories is known the unit size is guided by the remaining
+    work, starting larger and shrinking towards `unit_size` so the tail of
+    the run is spread across every worker."""
+    unit = list()
+    remaining = total
+    size = unit_size
+    for item in stories:
+        if not unit and remaining is not None:
+            size = max(unit_size, min(remaining / (4 * processes),
+                                      8 * unit_size))
+        unit.append(item)
+        if len(unit) >= size:
+            if remaining is not None:
+                remaining -= len(unit)
+            yield unit
+            unit = list()
+    if unit:
+        yield unit
+
+
+_worker_state = dict()
+
+
+def _init_worker(stanford_dir, batch_size, cache_dir, cache_size,
+                 shared=None, phrase_labels=None):
+    """Private function to set up a `parallel_parse` worker process."""
+    _worker_state['stanford_dir'] = stanford_dir
+    _worker_state['batch_size'] = batch_size
+    _worker_state['phrase_labels'] = phrase_labels
+    _worker_state['pool'] = corenlp_pool.get_pool(stanford_dir)
+    if cache_dir:
+        _worker_state['cache'] = parse_cache.ParseCache(cache_dir,
+                                                        stanford_dir,
+                                                        cache_size)
+    else:
+        _worker_state['cache'] = None
+    if shared:
+        _worker_state['dictionaries'] = coder.SharedDictionaries(*shared)
+    else:
+        _worker_state['dictionaries'] = None
+
+
+def _parse_unit(unit):
+    """Private function run by the `parallel_parse` workers to parse, and
+    with shared dictionaries code, a work unit. Returns the outputs along
+    with the unit's cache hits and misses."""
+    cache = _worker_state['cache']
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+    outputs = list(iter_parse(unit, _worker_state['stanford_dir'],
+                              _worker_state['pool'],
+                              _worker_state['batch_size'], cache,
+                              _worker_state['phrase_labels']))
+    dictionaries = _worker_state['dictionaries']
+    if dictionaries is not None:
+        for key, event_info in outputs:
+            code_story(event_info, dictionaries)
+    if cache is not None:
+        return outputs, cache.hits - hits, cache.misses - misses
+    return outputs, 0, 0
+
+
+def code_story(event_info, dictionaries):
+    """
+    Function to code the sentences of a parsed story into events with
+    `coder.code_batch`. Sentences are coded from their `coref_tree` where
+    coreferencing made one, and otherwise from their `parse_tree`.
+
+    Parameters
+    ----------
+
+    event_info: Dictionary.
+                    Parsed story, as yielded by `iter_parse`. Each sentence
+                    gets an `events` list of `(source, target, code)`
+                    tuples.
+
+    dictionaries: coder.SharedDictionaries.
+                    Dictionaries to code with, or anything else
+                    `coder.code_batch` takes.
+    """
+    sents = event_info['sent_info']['sents']
+    order = sorted(sents)
+    trees = list()
+    for sent in order:
+        tree = sents[sent].get('coref_tree')
+        if tree is None:
+            tree = sents[sent]['parse_tree']
+        trees.append(tree)
+        sents[sent]['events'] = list()
+    for index, source, target, code, version in coder.code_batch(
+            trees, dictionaries):
+        sents[order[index]]['events'].append((source, target, code))
+
+
+def _iter_results(stories, pool, batch_size=1, cache=None):
+    """Private generator to parse `(id, story)` pairs, either one at a time
+    or in batches, yielding `(id, result)` pairs. Stories found in the cache
+    are yielded straight away."""
+    batch = list()
+    for key, story in stories:
+        if cache is not None:
+            result = cache.get(story)
+            if result is not None:
+                yield key, result
+                continue
+        batch.append((key, story))
+        if len(batch) >= batch_size:
+            for output in _parse_stories(batch, pool, cache):
+                yield output
+            batch = list()
+    if batch:
+        for output in _parse_stories(batch, pool, cache):
+            yield output
+
+
+def _parse_stories(batch, pool, cache=None):
+    """Private function to parse a list of `(id, story)` pairs and add the
+    results to the cache."""
+    if len(batch) == 1:
+        key, story = batch[0]
+        parsed = [(key, pool.raw_parse(story))]
+    else:
+        parsed = _parse_batch(batch, pool)
+    if cache is not None:
+        for (key, story), (key, result) in zip(batch, parsed):
+            cache.put(story, result)
+
+    return parsed
+
+
+def _parse_batch(batch, pool):
+    """
+    Private function to parse several stories in one CoreNLP request. The
+    stories are joined by a separator sentence and the character offsets
+    CoreNLP reports for each token are used to assign every sentence to
+    its story. If any sentence can't be assigned unambiguously the stories
+    are parsed one at a time instead. A story that CoreNLP linked by
+    coreference to another story, or to the separator, is parsed again on
+    its own, since the links it gets on its own can differ.
+
+    Parameters
+    ----------
+
+    batch: List.
+            List of `(id, story)` pairs.
+
+    pool: corenlp_pool.CoreNLPPool.
+            Pool of CoreNLP workers to parse with.
+
+    Returns
+    -------
+
+    output: List.
+            List of `(id, result)` pairs, where each result has the same
+            form as parsing the story on its own.
+    """
+    separator = ' {} . '.format(STORY_SEPARATOR)
+    spans = list()
+    position = 0
+    for key, story in batch:
+        if spans:
+            position += len(separator)
+        spans.append((position, position + _char_len(story)))
+        position += _char_len(story)
+    text = separator.join([story for key, story in batch])
+
+    split = None
+    try:
+        split = _split_batch(pool.raw_parse(text), spans)
+    except Exception, e:
+        print 'Problem parsing batch. {}'.format(e)
+    if split is None:
+        print 'Batch of {} stories could not be aligned, parsing them one at '\
+              'a time.'.format(len(batch))
+        return [(key, pool.raw_parse(story)) for key, story in batch]
+
+    output = list()
+    for (key, story), story_result in zip(batch, split):
+        if story_result is None:
+            story_result = pool.raw_parse(story)
+        output.append((key, story_result))
+    return output
+
+
+def _split_batch(result, spans):
+    """Private function to split a batched CoreNLP result into one result
+    per story. Returns None if the sentences don't line up with the story
+    spans. The result is None for a story with a coreference link that
+    leaves the story, which can't be split off."""
+    groups = [list() for span in spans]
+    story = 0
+    for index, sentence in enumerate(result['sentences']):
+        words = sentence['words']
+        tokens = [word[0] for word in words]
+        if STORY_SEPARATOR in tokens:
+            if set(tokens) - set([STORY_SEPARATOR, '.']):
+                return None
+            continue
+        begin = int(words[0][1]['CharacterOffsetBegin'])
+        end = int(words[-1][1]['CharacterOffsetEnd'])
+        while story < len(spans) and begin >= spans[story][1]:
+            story += 1
+        if story == len(spans) or begin < spans[story][0] or \
+                end > spans[story][1]:
+            return None
+        groups[story].append(index)
+    if not all(groups):
+        return None
+
+    #Global sentence index -> (story, sentence index within the story)
+    located = dict()
+    for story, indexes in enumerate(groups):
+        for local_index, index in enumerate(indexes):
+            located[index] = (story, local_index)
+
+    corefs = [list() for span in spans]
+    crossed = set()
+    for chain in result.get('coref', list()):
+        story_chains = [list() for span in spans]
+        for pair in chain:
+            mention = located.get(pair[0][1])
+            ref = located.get(pair[1][1])
+            #Links to the separator or across stories would be lost, so
+            #those stories have to be parsed on their own
+            if mention is None or ref is None or mention[0] != ref[0]:
+                crossed.update([place[0] for place in (mention, ref) if
+                                place is not None])
+                continue
+            story_chains[mention[0]].append(type(pair)([
+                _relocate(pair[0], mention[1]), _relocate(pair[1], ref[1])]))
+        for story, pairs in enumerate(story_chains):
+            if pairs:
+                corefs[story].append(pairs)
+
+    split = list()
+    for story, indexes in enumerate(groups):
+        if story in crossed:
+            split.append(None)
+            continue
+        start = spans[story][0]
+        sentences = [result['sentences'][index] for index in indexes]
+        for sentence in sentences:
+            for word, attributes in sentence['words']:
+                for offset in ('CharacterOffsetBegin', 'CharacterOffsetEnd'):
+                    attributes[offset] = str(int(attributes[offset]) - start)
+        story_result = {'sentences': sentences}
+        if corefs[story]:
+            story_result['coref'] = corefs[story]
+        split.append(story_result)
+
+    return split
+
+
+def _relocate(mention, sent_index):
+    """Private function to point a coreference mention at a new sentence
+    index."""
+    return mention[:1] + type(mention)([sent_index]) + mention[2:]
+
+
+def _char_len(text):
+    """Private function to get the length of a story in characters, which is
+    how CoreNLP reports offsets."""
+    if isinstance(text, str):
+        text = text.decode('utf-8', 'replace')
+    return len(text)
+
+
+def _iter_stories(events):
+    """Private generator to pull `(id, story)` pairs out of either an event
+    dictionary, an iterable of `(id, day, story)` records or an iterable of
+    `(id, story)` pairs."""
+    if hasattr(events, 'iteritems'):
+        for key, event in events.iteritems():
+            yield key, event['story']
+    else:
+        for record in events:
+            yield record[0], record[-1]
+
+
+def batch_parse(text_dir, stanford_dir, pool=None, cache=None, shards=1,
+                phrase_labels=None):
     """Function to parse multi-sentence input using StanfordNLP in batch mode.
     The function parses the input, and performs pronoun coreferencing where
     appropriate. Coreferences are linked across sentences.
@@ -84,6 +628,25 @@ def batch_parse(text_dir, stanford_dir):
     stanford_dir: String.
                     Directory that contains the StanfordNLP files.
 
+    pool: corenlp_pool.CoreNLPPool.
+            Optional pool of CoreNLP workers. If given, each file is parsed
+            by a warm worker from the pool rather than by starting a new
+            CoreNLP batch process for the directory.
+
+    cache: parse_cache.ParseCache.
+            Optional cache of parse results. Only files missing from the
+            cache are sent to CoreNLP.
+
+    shards: Integer.
+            Number of CoreNLP batch processes to run at once. The files are
+            split into shards of roughly equal total size, each shard is
+            parsed and coreferenced by its own process, and the results are
+            merged. Defaults to 1. Ignored if `pool` is given.
+
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence, as for
+                    `parse_sents`. Defaults to noun and verb phrases.
+
     Returns
     --------
 
@@ -100,7 +663,7 @@ def batch_parse(text_dir, stanford_dir):
                     dictionaries as their values. The `sents` dictionary has
                     integers as keys, which represent the different sentences
                     within a text input. Each individual sentence dictionary
-                    contains the keys `parse_tree` (nltk.tree),
+                    contains the keys `parse_tree` (CompactTree),
                     `dependencies` (list), `np_words` (list),
                     `word_info` (list), `verb_phrases` (list),
                     `vp_words` (list), and `noun_phrases` (list).
@@ -118,19 +681,224 @@ def batch_parse(text_dir, stanford_dir):
 
     """
     output_dict = dict()
-    results = corenlp.batch_parse(text_dir, stanford_dir)
-    for index in xrange(len(results)):
-        parsed = results[index]
+    for key, output in iter_batch_parse(text_dir, stanford_dir, pool, cache,
+                                        shards,
+                                        phrase_labels=phrase_labels):
+        output_dict[key] = output
+
+    return output_dict
+
+
+def iter_batch_parse(text_dir, stanford_dir, pool=None, cache=None, shards=1,
+                     exclude=None, phrase_labels=None):
+    """Generator version of `batch_parse`. Articles are yielded as soon as
+    they, or with `shards`, their shard, have been parsed and coreferenced.
+
+    Parameters
+    ----------
+
+    text_dir: String.
+                Directory of text files to parse using StanfordNLP.
+
+    stanford_dir: String.
+                    Directory that contains the StanfordNLP files.
+
+    pool: corenlp_pool.CoreNLPPool.
+            Optional pool of CoreNLP workers, as for `batch_parse`.
+
+    cache: parse_cache.ParseCache.
+            Optional cache of parse results.
+
+    shards: Integer.
+            Number of CoreNLP batch processes to run at once.
+
+    exclude: Set.
+                Optional set of file names to skip, such as articles
+                completed before a run was interrupted.
+
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence, as for
+                    `parse_sents`. Defaults to noun and verb phrases.
+
+    Yields
+    ------
+
+    output : Tuple
+                `(file_name, event_info)` where `event_info` is the value
+                `batch_parse` would store under `file_name` in
+                `output_dict`.
+    """
+    names = _list_files(text_dir)
+    if exclude:
+        names = [name for name in names if name not in exclude]
+
+    if shards > 1 and pool is None:
+        if cache is not None:
+            cached, names = _split_cached(text_dir, names, cache)
+            for parsed in cached:
+                name = parsed['file_name']
+                output = parse_sents(name, parsed, phrase_labels)
+                utilities.coref_replace(output, name)
+                yield name, output[name]
+        for output in _sharded_parse(text_dir, names, stanford_dir, shards,
+                                     cache, phrase_labels):
+            for item in output.iteritems():
+                yield item
+        return
+
+    for parsed in _iter_batch_results(text_dir, stanford_dir, pool, cache,
+                                      names):
         name = parsed['file_name']
-        output = parse_sents(name, parsed)
+        output = parse_sents(name, parsed, phrase_labels)
+        utilities.coref_replace(output, name)
+        yield name, output[name]
+
+
+def _iter_batch_results(text_dir, stanford_dir, pool=None, cache=None,
+                        names=None):
+    """Private generator yielding a CoreNLP result, with a `file_name` key,
+    for every file in `text_dir`, or just those in `names`. Cached results
+    are used where possible and the remaining files parsed with the pool or
+    a CoreNLP batch process."""
+    if names is None:
+        names = _list_files(text_dir)
+    if cache is not None:
+        cached, names = _split_cached(text_dir, names, cache)
+        for parsed in cached:
+            yield parsed
+    if not names:
+        return
+
+    if pool is not None:
+        for name in names:
+            text = _read_file(text_dir, name)
+            parsed = pool.raw_parse(text)
+            parsed['file_name'] = name
+            if cache is not None:
+                cache.put(text, parsed)
+            yield parsed
+        return
+
+    if len(names) == len(_list_files(text_dir)):
+        staged = text_dir
+    else:
+        staged = _stage_files(text_dir, names)
+    try:
+        for parsed in corenlp.batch_parse(staged, stanford_dir):
+            if cache is not None:
+                name = os.path.basename(parsed['file_name'])
+                cache.put(_read_file(text_dir, name), parsed)
+            yield parsed
+    finally:
+        if staged != text_dir:
+            shutil.rmtree(staged, ignore_errors=True)
+
+
+def _split_cached(text_dir, names, cache):
+    """Private function to look files up in the parse cache. Returns the
+    cached results, with `file_name` set, and the names of the files that
+    weren't found."""
+    cached = list()
+    misses = list()
+    for name in names:
+        parsed = cache.get(_read_file(text_dir, name))
+        if parsed is None:
+            misses.append(name)
+        else:
+            parsed['file_name'] = name
+            cached.append(parsed)
+
+    return cached, misses
+
+
+def _sharded_parse(text_dir, names, stanford_dir, shards, cache=None,
+                   phrase_labels=None):
+    """Private generator to parse files with several CoreNLP batch processes
+    at once, yielding each shard's output dictionary as it finishes."""
+    partitions = _partition_by_size(text_dir, names, shards)
+    if not partitions:
+        return
+    if cache is not None:
+        cache_args = (cache.cache_dir, cache.max_size)
+    else:
+        cache_args = (None, None)
+    staged = [_stage_files(text_dir, partition) for partition in partitions]
+    workers = multiprocessing.Pool(len(staged))
+    try:
+        jobs = [(shard, stanford_dir) + cache_args + (phrase_labels,)
+                for shard in staged]
+        for output in workers.imap_unordered(_parse_shard, jobs):
+            yield output
+        workers.close()
+    finally:
+        workers.terminate()
+        workers.join()
+        for shard in staged:
+            shutil.rmtree(shard, ignore_errors=True)
+
+
+def _parse_shard(job):
+    """Private function run by the shard processes. Parses one directory
+    with a CoreNLP batch process and performs coreferencing per article."""
+    shard_dir, stanford_dir, cache_dir, cache_size, phrase_labels = job
+    cache = None
+    if cache_dir:
+        cache = parse_cache.ParseCache(cache_dir, stanford_dir, cache_size)
+    output_dict = dict()
+    for parsed in _iter_batch_results(shard_dir, stanford_dir):
+        name = os.path.basename(parsed['file_name'])
+        if cache is not None:
+            cache.put(_read_file(shard_dir, name), parsed)
+        output = parse_sents(parsed['file_name'], parsed, phrase_labels)
+        utilities.coref_replace(output, parsed['file_name'])
         output_dict.update(output)
-    for article in output_dict:
-        utilities.coref_replace(output_dict, article)
 
     return output_dict
 
 
-def parse_sents(key, results):
+def _partition_by_size(text_dir, names, shards):
+    """Private function to split files into at most `shards` groups of
+    roughly equal total size. Files are assigned largest first to the
+    currently smallest group."""
+    sizes = [(os.path.getsize(os.path.join(text_dir, name)), name)
+             for name in names]
+    sizes.sort(reverse=True)
+    shards = min(shards, len(sizes))
+    partitions = [list() for i in xrange(shards)]
+    loads = [(0, i) for i in xrange(shards)]
+    for size, name in sizes:
+        load, i = heapq.heappop(loads)
+        partitions[i].append(name)
+        heapq.heappush(loads, (load + size, i))
+
+    return partitions
+
+
+def _list_files(text_dir):
+    """Private function to list the files, but not directories, in a
+    directory."""
+    return [name for name in sorted(os.listdir(text_dir))
+            if os.path.isfile(os.path.join(text_dir, name))]
+
+
+def _read_file(text_dir, name):
+    with open(os.path.join(text_dir, name), 'r') as f:
+        return f.read()
+
+
+def _stage_files(text_dir, names):
+    """Private function to create a temporary directory holding links to a
+    subset of the files in `text_dir`, so a CoreNLP batch process can be
+    pointed at just those files. The caller removes the directory."""
+    staged = tempfile.mkdtemp(prefix='petrarch_')
+    for name in names:
+        os.symlink(os.path.abspath(os.path.join(text_dir, name)),
+                   os.path.join(staged, name))
+
+    return staged
+
+
+def parse_sents(key, results, phrase_labels=None):
     """
     Function to create structured input for use in the other functions within
     PETRARCH. Final output is a series of dictionaries within dictionaries
@@ -148,27 +916,35 @@ def parse_sents(key, results):
                 Parsed results as output by StanfordNLP and the StanfordCoreNLP
                 Python library.
 
+    phrase_labels: Iterable.
+                    Phrase types to collect for each sentence. Defaults to
+                    `utilities.PHRASE_LABELS`, i.e. noun and verb phrases.
+
     Returns
     -------
 
     sent_output: Dictionary.
                     Information for each sentence within a news story.
                     Output dictionary format is of the following form. The
-                    main level has event or story IDs as keys, with dictionaries
-                    as values. At this stage, the value dictionary has
+                    main level has event or story IDs as keys, with
+                    `records.Story` records as values. These act as
+                    dictionaries, and `records.story_to_dict` turns them
+                    into plain ones. At this stage, the value dictionary has
                     one key, `sent_info`, which has another dictionary as
                     the value. Within the `sent_info` dictionary are keys
                     `sents` and `coref_info`. Each has dictionaries as their
                     values. The `sents` dictionary has integers as keys, which
                     represent the different sentences within a text input. Each
-                    individual sentence dictionary contains the keys
-                    `parse_tree` (nltk.tree), `dependencies` (list),
+                    individual sentence is a `records.Sentence`, which acts
+                    as a dictionary with the keys
+                    `parse_tree` (CompactTree), `dependencies` (list),
                     `np_words` (list), `word_info` (list),
                     `verb_phrases` (list), `vp_words` (list), and
-                    `noun_phrases` (list). The `coref_info` dictionary has a
+                    `noun_phrases` (list). The tree and phrases are built
+                    when first accessed. The `coref_info` dictionary has a
                     similar structure, with each sentence having its own
-                    individual dictionary with keys `shift` (integer) and
-                    `corefs` (list). Given this, the final structure of the
+                    `records.CorefInfo` with keys `shift` (integer),
+                    `corefs` (list) and `errors` (list). Given this, the final structure of the
                     output resembles:
                     {'event_id': {'sent_info': {'sents': {0: {'parse_tree': tree
                                                                 'dependencies': list}
@@ -181,27 +957,20 @@ def parse_sents(key, results):
     num_sents = len(results['sentences'])
     sent_info = dict()
     for i, content in enumerate(results['sentences']):
-        sent_info[i] = dict()
-        sent_info[i]['parse_tree'] = (content['parsetree'])
-        sent_info[i]['word_info'] = (content['words'])
-        sent_info[i]['dependencies'] = (content['dependencies'])
-
-        parsed = nltk.tree.Tree(content['parsetree'])
-        sent_info[i].update(utilities._get_np(parsed))
-        sent_info[i].update(utilities._get_vp(parsed))
-        del parsed
-    sent_output[key] = {'sent_info': {'sents': sent_info}}
+        #The tree and phrases are built the first time they're used, and
+        #the tree is then shared by the coreferencing and coding
+        sent_info[i] = records.Sentence(content, phrase_labels)
+    sent_output[key] = records.Story(sent_info)
 
     if 'coref' in results.keys():
         corefs = results['coref']
         ordered_corefs = dict()
         for i in xrange(num_sents):
-            ordered_corefs[i] = {'corefs': list(), 'shift': 0,
-                                 'errors': list()}
+            ordered_corefs[i] = records.CorefInfo()
         for i in xrange(len(corefs)):
             for x in xrange(len(corefs[i])):
                 pronoun_sent = corefs[i][x][0][1]
-                ordered_corefs[pronoun_sent]['corefs'].append(corefs[i][x])
-        sent_output[key]['sent_info']['coref_info'] = ordered_corefs
+                ordered_corefs[pronoun_sent].corefs.append(corefs[i][x])
+        sent_output[key].coref_info = ordered_corefs
 
     return sent_output
@@ -0,0 +1,208 @@
+import os
+import glob
+import errno
+import hashlib
+import tempfile
+import cPickle
+import threading
+
+#Default cache size limit, in bytes
+MAX_SIZE = 1024 * 1024 * 1024
+
+
+class ParseCache():
+    """Class implementing a persistent, content-addressed cache of CoreNLP
+    parse results. Entries are keyed on a hash of the story text, the
+    CoreNLP version and the annotator settings, so a cached result is only
+    reused when CoreNLP would produce the same output."""
+    def __init__(self, cache_dir, stanford_dir=None, max_size=MAX_SIZE):
+        """
+        Instantiate the ParseCache class.
+
+        Parameters
+        ----------
+
+        cache_dir : String
+                    Directory in which to store cached results. Several
+                    processes can share the same directory.
+
+        stanford_dir : String
+                        Directory that contains the StanfordNLP files. Used
+                        to identify the CoreNLP version.
+
+        max_size : Integer
+                    Size limit of the cache in bytes. The least recently
+                    used entries are evicted once the limit is exceeded.
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size = max_size
+        self.version = _corenlp_version(stanford_dir)
+        self.hits = 0
+        self.misses = 0
+        self._written = 0
+        self._evicting = False
+        #The parse stage's threads share the cache
+        self._lock = threading.Lock()
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def key(self, text):
+        """
+        Function to get the cache key for a piece of text.
+
+        Parameters
+        ----------
+
+        text : String
+                Text that is to be parsed.
+
+        Returns
+        -------
+
+        key : String
+                Hex digest identifying the text and CoreNLP configuration.
+        """
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        digest = hashlib.sha1(self.version)
+        digest.update('\0')
+        digest.update(text)
+        return digest.hexdigest()
+
+    def get(self, text):
+        """
+        Function to look up the cached parse of a piece of text.
+
+        Parameters
+        ----------
+
+        text : String
+                Text that is to be parsed.
+
+        Returns
+        -------
+
+        result : Dictionary
+                    Parsed results as output by the StanfordCoreNLP Python
+                    library, or None if the text isn't cached.
+        """
+        path = self._path(self.key(text))
+        try:
+            with open(path, 'rb') as f:
+                result = cPickle.load(f)
+        except (IOError, OSError, EOFError, cPickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+            return None
+        #Mark the entry as recently used for eviction
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, text, result):
+        """
+        Function to add a parse result to the cache. The entry is written to
+        a temporary file and renamed into place, so concurrent readers never
+        see a partially written entry.
+
+        Parameters
+        ----------
+
+        text : String
+                Text that was parsed.
+
+        result : Dictionary
+                    Parsed results as output by the StanfordCoreNLP Python
+                    library.
+        """
+        path = self._path(self.key(text))
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'wb') as f:
+            cPickle.dump(result, f, cPickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        os.rename(temp_path, path)
+
+        #Only walk the cache occasionally rather than on every write, and
+        #by one thread at a time
+        with self._lock:
+            self._written += size
+            if self._written <= self.max_size / 10 or self._evicting:
+                return
+            self._evicting = True
+        try:
+            self.evict()
+        finally:
+            with self._lock:
+                self._evicting = False
+
+    def evict(self):
+        """Function to remove the least recently used entries until the cache
+        is back under its size limit."""
+        with self._lock:
+            self._written = 0
+        entries = list()
+        total = 0
+        for path in glob.glob(os.path.join(self.cache_dir, '*', '*.pickle')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        if total <= self.max_size:
+            return
+
+        #Evict down to 90% of the limit so eviction doesn't run constantly
+        target = self.max_size * 0.9
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                #Another process got there first
+                pass
+            total -= size
+
+    def stats(self):
+        """Function to report the cache hits and misses for this process."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.pickle')
+
+
+def _corenlp_version(stanford_dir):
+    """Private function to build a string identifying the CoreNLP version
+    and annotator settings in use."""
+    parts = list()
+    if stanford_dir:
+        jars = glob.glob(os.path.join(os.path.expanduser(stanford_dir),
+                                      '*.jar'))
+        parts.extend(sorted([os.path.basename(jar) for jar in jars]))
+    try:
+        import corenlp
+        properties = os.path.join(os.path.dirname(corenlp.__file__),
+                                  'default.properties')
+        with open(properties, 'r') as f:
+            parts.append(f.read())
+    except (ImportError, IOError):
+        pass
+    return '\n'.join(parts)
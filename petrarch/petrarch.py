@@ -1,5 +1,12 @@
-import dateutil.parser
 import postprocess
+import reader
+import corenlp_pool
+import parse_cache
+import checkpoint
+import pipeline
+import utilities
+import coder
+import itertools
 import argparse
 import parse
 import glob
@@ -15,11 +22,12 @@ def _get_data(path):
     return os.path.join(cwd, 'data', path)
 
 
-def read_data(filepath):
+def read_data(filepath, use_mmap=False, ids=None):
     """
     Function to read in a file of news stories. Expects stories formatted
     in the traditional TABARI format. Adds each sentence, along with the
-    meta data, to a dictionary.
+    meta data, to a dictionary. Use `reader.iter_stories` instead to stream
+    the stories one at a time without holding the whole file in memory.
 
     Parameters
     ----------
@@ -27,17 +35,22 @@ def read_data(filepath):
     filepath : String
                 Filepath of the file containing the sentence to be parsed.
 
+    use_mmap : Boolean
+                Whether to read the file through a memory map. Defaults to
+                False.
+
+    ids : List
+            Optional list of story IDs. If given, only these stories are
+            read, using the file's byte-offset index to seek straight to
+            them.
+
     """
     event_dict = dict()
-    data = open(filepath, 'r').read()
-    sentences = data.split('\n\n')
-    for sentence in sentences:
-        #Strings are weird, so split into meta string, which contains meta
-        #info and story part of the string
-        meta_string = sentence[:sentence.find('\n')]
-        day, ident = meta_string.split()[:2]
-        day = dateutil.parser.parse(day)
-        story_string = sentence[sentence.find('\n'):].replace('\n', '')
+    if ids:
+        stories = reader.read_ids(filepath, ids)
+    else:
+        stories = reader.iter_stories(filepath, use_mmap)
+    for ident, day, story_string in stories:
         #Combine info into a dictionary
         story_info = {'day': day, 'id': ident, 'story': story_string}
         #Add the new dict to the events dict with the ID as the key
@@ -46,6 +59,80 @@ def read_data(filepath):
     return event_dict
 
 
+def write_events(results, out_path):
+    """
+    Function to write parsed events to a file. Events are written as they
+    arrive, so `results` can be a generator and the output is never built
+    up in memory.
+
+    Parameters
+    ----------
+
+    results : Dictionary or iterable
+                Either a dictionary of parsed events as produced by
+                `parse.parse`, or an iterable of `(event_id, event_info)`
+                pairs such as produced by `parse.iter_parse`.
+
+    out_path : String
+                Filepath to write the events to.
+
+    """
+    if hasattr(results, 'iteritems'):
+        results = results.iteritems()
+
+    with open(out_path, 'w') as f:
+        for event, event_info in results:
+            event_output = '\n=======================\n\n'
+            event_output += 'event id: {}\n\n'.format(event)
+            sent_inf = event_info['sent_info']
+            for sent in sent_inf['sents']:
+                try:
+                    event_output += 'Sentence {}:\n'.format(sent)
+                    event_output += 'Word info:\n {}\n\n'.format(sent_inf['sents'][sent]['word_info'])
+                    event_output += 'Parse tree:\n {}\n\n'.format(_tree_string(sent_inf['sents'][sent]))
+                    event_output += 'Word dependencies:\n {}\n\n'.format(sent_inf['sents'][sent]['dependencies'])
+                    if 'events' in sent_inf['sents'][sent]:
+                        event_output += 'Events:\n {}\n\n'.format(sent_inf['sents'][sent]['events'])
+                    event_output += 'Coref info:\n\n'
+                    try:
+                        event_output += 'Corefs:\n {}\n\n'.format(sent_inf['coref_info'][sent]['corefs'])
+                        event_output += 'Coref tree:\n {}\n\n'.format(sent_inf['sents'][sent]['coref_tree'])
+                    except KeyError:
+                        pass
+                    event_output += '----------------------\n\n'
+                except KeyError:
+                    print 'There was a key error'
+                    print event_info.keys()
+                    print sent_inf['sents'][sent].keys()
+            f.write(event_output)
+
+
+def _tree_string(sentence):
+    """Private function to get the parse tree string for a sentence,
+    without building the tree if nothing else needed it."""
+    if hasattr(sentence, 'tree_string'):
+        return sentence.tree_string()
+    return utilities.tree_to_string(sentence['parse_tree'])
+
+
+def _get_ids(ids):
+    """Private function to turn the `--ids` argument, either a file of story
+    IDs or a comma-separated list, into a list of IDs."""
+    if not ids:
+        return None
+    if os.path.isfile(ids):
+        return reader.read_id_file(ids)
+    return [ident.strip() for ident in ids.split(',') if ident.strip()]
+
+
+def _get_labels(labels):
+    """Private function to turn the `--phrase_labels` argument into a list
+    of phrase labels, or None for the default ones."""
+    if not labels:
+        return None
+    return [label.strip() for label in labels.split(',') if label.strip()]
+
+
 def parse_cli_args():
     """Function to parse the command-line arguments for PETRARCH."""
     __description__ = """
@@ -75,6 +162,39 @@ PETRARCH
                                default=False,
                                help="""Whether to extract features from
                                sentence. Defaults to False""")
+    parse_command.add_argument('-b', '--batch_size', type=int, default=1,
+                               help="""Number of stories to send to CoreNLP in
+                               each request. Defaults to 1""")
+    parse_command.add_argument('-C', '--cache', default=None,
+                               help="""Directory of the on-disk CoreNLP parse
+                               cache. Defaults to no cache""")
+    parse_command.add_argument('--cache_size', type=int, default=1024,
+                               help="""Size limit of the parse cache in MB.
+                               Defaults to 1024""")
+    parse_command.add_argument('-R', '--resume', action='store_true',
+                               default=False, help="""Whether to resume an
+                               interrupted run from its checkpoint journal.
+                               Defaults to False""")
+    parse_command.add_argument('--checkpoint_every', type=int, default=100,
+                               help="""Number of completed stories between
+                               checkpoints. Defaults to 100""")
+    parse_command.add_argument('--parse_workers', type=int, default=1,
+                               help="""Number of CoreNLP processes parsing at
+                               once. Defaults to 1""")
+    parse_command.add_argument('--geo_workers', type=int, default=2,
+                               help="""Number of threads running
+                               postprocessing. Defaults to 2""")
+    parse_command.add_argument('--queue_size', type=int, default=100,
+                               help="""Maximum number of work units waiting
+                               in front of each stage. Defaults to 100""")
+    parse_command.add_argument('-I', '--ids', default=None,
+                               help="""Story IDs to parse, either as a
+                               comma-separated list or a file with one ID per
+                               line. Defaults to all stories""")
+    parse_command.add_argument('-P', '--phrase_labels', default=None,
+                               help="""Comma-separated phrase types to collect
+                               for each sentence, e.g. NP,VP,PP. Defaults to
+                               NP,VP""")
 
     batch_command = sub_parse.add_parser('batch_parse', help="""Command to run
                                          the PETRARCH parser in batch mode.""",
@@ -95,6 +215,31 @@ PETRARCH
                                default=False,
                                help="""Whether to extract features from
                                sentence. Defaults to False""")
+    batch_command.add_argument('-C', '--cache', default=None,
+                               help="""Directory of the on-disk CoreNLP parse
+                               cache. Defaults to no cache""")
+    batch_command.add_argument('--cache_size', type=int, default=1024,
+                               help="""Size limit of the parse cache in MB.
+                               Defaults to 1024""")
+    batch_command.add_argument('-s', '--shards', type=int, default=1,
+                               help="""Number of CoreNLP batch processes to
+                               split the files across. Defaults to 1""")
+    batch_command.add_argument('-R', '--resume', action='store_true',
+                               default=False, help="""Whether to resume an
+                               interrupted run from its checkpoint journal.
+                               Defaults to False""")
+    batch_command.add_argument('--checkpoint_every', type=int, default=100,
+                               help="""Number of completed stories between
+                               checkpoints. Defaults to 100""")
+    batch_command.add_argument('-W', '--warm', action='store_true',
+                               default=False,
+                               help="""Whether to parse each file with a warm
+                               CoreNLP worker rather than a new CoreNLP batch
+                               process. Defaults to False""")
+    batch_command.add_argument('-P', '--phrase_labels', default=None,
+                               help="""Comma-separated phrase types to collect
+                               for each sentence, e.g. NP,VP,PP. Defaults to
+                               NP,VP""")
 
     parallel_command = sub_parse.add_parser('parallel_parse',
                                             help="""Command to run the
@@ -118,6 +263,45 @@ PETRARCH
                                   help="""Number of cores to use for parallel
                                   processing. parse_command to -1 for all
                                   cores""")
+    parallel_command.add_argument('-b', '--batch_size', type=int, default=1,
+                                  help="""Number of stories to send to CoreNLP
+                                  in each request. Defaults to 1""")
+    parallel_command.add_argument('-C', '--cache', default=None,
+                                  help="""Directory of the on-disk CoreNLP parse
+                                  cache. Defaults to no cache""")
+    parallel_command.add_argument('--cache_size', type=int, default=1024,
+                                  help="""Size limit of the parse cache in MB.
+                                  Defaults to 1024""")
+    parallel_command.add_argument('-R', '--resume', action='store_true',
+                                  default=False, help="""Whether to resume an
+                                  interrupted run from its checkpoint journal.
+                                  Defaults to False""")
+    parallel_command.add_argument('--checkpoint_every', type=int, default=100,
+                                  help="""Number of completed stories between
+                                  checkpoints. Defaults to 100""")
+    parallel_command.add_argument('-I', '--ids', default=None,
+                                  help="""Story IDs to parse, either as a
+                                  comma-separated list or a file with one ID
+                                  per line. Defaults to all stories""")
+    parallel_command.add_argument('-E', '--code', action='store_true',
+                                  default=False, help="""Whether to code the
+                                  parsed sentences into events, with one copy
+                                  of the dictionaries shared by the workers.
+                                  Defaults to False""")
+    parallel_command.add_argument('-P', '--phrase_labels', default=None,
+                                  help="""Comma-separated phrase types to
+                                  collect for each sentence, e.g. NP,VP,PP.
+                                  Defaults to NP,VP""")
+
+    index_command = sub_parse.add_parser('index', help="""Command to build the
+                                         byte-offset index for an input
+                                         file.""",
+                                         description="""Command to build the
+                                         byte-offset index used to read
+                                         individual stories from an input
+                                         file.""")
+    index_command.add_argument('-i', '--inputs',
+                               help='File to index.', required=True)
 
     args = aparse.parse_args()
     return args
@@ -166,138 +350,139 @@ def main():
     cli_args = parse_cli_args()
     cli_command = cli_args.command_name
     inputs = cli_args.inputs
+    if cli_command == 'index':
+        print 'Wrote index {}'.format(reader.build_index(inputs))
+        return
+    #Compile the dictionaries if they've changed, so later loads only read
+    #the compiled files
+    coder.load_dictionaries(actors, verbs)
+
     out_path = cli_args.output
     username = cli_args.username
     if cli_command == 'parallel_parse':
         cpus = cli_args.n_cores
+    if cli_command in ('parse', 'parallel_parse'):
+        ids = _get_ids(cli_args.ids)
+        batch_size = cli_args.batch_size
     geo_boolean = cli_args.geolocate
     feature_boolean = cli_args.features
+    cache_dir = cli_args.cache
+    phrase_labels = _get_labels(cli_args.phrase_labels)
+    cache_size = cli_args.cache_size * 1024 * 1024
+    cache = None
+    cache_stats = None
+    stream = None
+    if cache_dir and cli_command != 'parallel_parse':
+        cache = parse_cache.ParseCache(cache_dir, stanford_dir, cache_size)
+
+    #Completed stories are journaled so an interrupted run can be resumed
+    journal = checkpoint.Journal(out_path + checkpoint.JOURNAL_SUFFIX,
+                                 max(cli_args.checkpoint_every, 1))
+    if cli_args.resume:
+        done = journal.load()
+        print 'Resuming, {} stories already done.'.format(len(done))
+    else:
+        journal.remove()
+        done = dict()
 
     if cli_command == 'parse':
-        print 'Reading in sentences...{}:{}.{}'.format(datetime.now().hour,
-                                                       datetime.now().minute,
-                                                       datetime.now().second)
-        events = read_data(inputs)
-
         print 'Parsing sentences...{}:{}.{}'.format(datetime.now().hour,
                                                     datetime.now().minute,
                                                     datetime.now().second)
-        results = parse.parse(events, stanford_dir)
-        print 'Done processing...{}:{}.{}'.format(datetime.now().hour,
-                                                  datetime.now().minute,
-                                                  datetime.now().second)
-
+        if ids:
+            events = reader.read_ids(inputs, ids)
+        else:
+            events = reader.iter_stories(inputs)
+        events = checkpoint.skip_done(events, done)
+
+        #Stories are streamed through concurrent read, parse, coref and
+        #postprocess stages, joined by bounded queues, to the writer
+        pool = corenlp_pool.get_pool(stanford_dir, cli_args.parse_workers)
+        stream = pipeline.Pipeline(parse.iter_units(events, batch_size),
+                                   cli_args.queue_size)
+        stream.add_stage('parse',
+                         lambda unit: parse.parse_unit(unit, pool, cache),
+                         cli_args.parse_workers)
+        stream.add_stage('coref',
+                         lambda results: parse.structure_unit(results,
+                                                              phrase_labels))
         if geo_boolean or feature_boolean:
-            print 'Feature extraction...{}:{}.{}'.format(datetime.now().hour,
-                                                         datetime.now().minute,
-                                                         datetime.now().second)
-            postprocess.process(events, username, geo_boolean, feature_boolean)
-            print 'Done...{}:{}.{}'.format(datetime.now().hour,
-                                           datetime.now().minute,
-                                           datetime.now().second)
+            stream.add_stage('postprocess',
+                             lambda unit: list(postprocess.iter_process(
+                                 unit, username, geo_boolean,
+                                 feature_boolean)),
+                             cli_args.geo_workers)
+        results = (event for unit in stream.run() for event in unit)
     elif cli_command == 'batch_parse':
-        print 'Running...{}:{}.{}'.format(datetime.now().hour,
-                                          datetime.now().minute,
-                                          datetime.now().second)
-
         print 'Parsing sentences...{}:{}.{}'.format(datetime.now().hour,
                                                     datetime.now().minute,
                                                     datetime.now().second)
-        results = parse.batch_parse(inputs, stanford_dir)
-        print 'Done processing...{}:{}.{}'.format(datetime.now().hour,
-                                                  datetime.now().minute,
-                                                  datetime.now().second)
+        if cli_args.warm:
+            pool = corenlp_pool.get_pool(stanford_dir)
+        else:
+            pool = None
+        results = parse.iter_batch_parse(inputs, stanford_dir, pool, cache,
+                                         cli_args.shards, exclude=done,
+                                         phrase_labels=phrase_labels)
 
         if geo_boolean or feature_boolean:
-            print 'Feature extraction...{}:{}.{}'.format(datetime.now().hour,
-                                                         datetime.now().minute,
-                                                         datetime.now().second)
-            postprocess.process(events, username, geo_boolean, feature_boolean)
-            print 'Done...{}:{}.{}'.format(datetime.now().hour,
-                                           datetime.now().minute,
-                                           datetime.now().second)
+            results = postprocess.iter_process(results, username, geo_boolean,
+                                               feature_boolean)
     elif cli_command == 'parallel_parse':
-        import pp
-
-        print 'Reading in sentences...{}:{}.{}'.format(datetime.now().hour,
-                                                       datetime.now().minute,
-                                                       datetime.now().second)
-        events = read_data(inputs)
-
-        ppservers = ()
         if cpus == -1:
-            job_server = pp.Server(ppservers=ppservers)
-        else:
-            job_server = pp.Server(cpus, ppservers=ppservers)
-
-        chunks = list()
-
-        if len(events) % int(len(events) / (job_server.get_ncpus())) == 1:
-            chunk_size = int(len(events) / (job_server.get_ncpus()-1))
-        else:
-            chunk_size = int(len(events) / (job_server.get_ncpus()))
-
-        for i in xrange(0, len(events), chunk_size):
-            chunks.append(dict(events.items()[i:i+chunk_size]))
+            cpus = None
 
         print 'Parsing sentences...{}:{}.{}'.format(datetime.now().hour,
                                                     datetime.now().minute,
                                                     datetime.now().second)
-        jobs = [job_server.submit(parse.parse, (chunk, stanford_dir,),
-                                  (parse.parse_sents,),
-                                  ("corenlp", "nltk.tree", "utilities",))
-                for chunk in chunks]
-
-        parallel_results = list()
-        for job in jobs:
-            parallel_results.append(job())
-
-        results = dict()
-        for result in parallel_results:
-            results.update(result)
+        if ids:
+            events = reader.read_ids(inputs, ids)
+        else:
+            events = reader.iter_stories(inputs)
+        events = checkpoint.skip_done(events, done)
 
-        print 'Done processing...{}:{}.{}'.format(datetime.now().hour,
-                                                  datetime.now().minute,
-                                                  datetime.now().second)
+        #Results stream back from the workers as each work unit finishes.
+        #Workers only need the dictionaries when they code
+        if cli_args.code:
+            dictionaries = (actors, verbs)
+        else:
+            dictionaries = None
+        cache_stats = dict()
+        results = parse.parallel_parse(events, stanford_dir, cpus,
+                                       batch_size, cache_dir, cache_size,
+                                       stats=cache_stats,
+                                       dictionaries=dictionaries,
+                                       phrase_labels=phrase_labels)
 
         if geo_boolean or feature_boolean:
-            print 'Feature extraction...{}:{}.{}'.format(datetime.now().hour,
-                                                         datetime.now().minute,
-                                                         datetime.now().second)
-            postprocess.process(events, username, geo_boolean, feature_boolean)
-            print 'Donel..{}:{}.{}'.format(datetime.now().hour,
-                                           datetime.now().minute,
-                                           datetime.now().second)
+            results = postprocess.iter_process(results, username, geo_boolean,
+                                               feature_boolean)
     else:
         print 'Please enter a valid command!'
 
-    event_output = str()
+    results = itertools.chain(done.iteritems(), journal.track(results))
 
     print 'Writing the events to file...'
-    for event in results:
-        event_output += '\n=======================\n\n'
-        event_output += 'event id: {}\n\n'.format(event)
-        sent_inf = results[event]['sent_info']
-        for sent in sent_inf['sents']:
-            try:
-                event_output += 'Sentence {}:\n'.format(sent)
-                event_output += 'Word info:\n {}\n\n'.format(sent_inf['sents'][sent]['word_info'])
-                event_output += 'Parse tree:\n {}\n\n'.format(sent_inf['sents'][sent]['parse_tree'])
-                event_output += 'Word dependencies:\n {}\n\n'.format(sent_inf['sents'][sent]['dependencies'])
-                event_output += 'Coref info:\n\n'
-                try:
-                    event_output += 'Corefs:\n {}\n\n'.format(sent_inf['coref_info'][sent]['corefs'])
-                    event_output += 'Coref tree:\n {}\n\n'.format(sent_inf['sents'][sent]['coref_tree'])
-                except KeyError:
-                    pass
-                event_output += '----------------------\n\n'
-            except KeyError:
-                print 'There was a key error'
-                print results[event].keys()
-                print sent_inf['sents'][sent].keys()
+    write_events(results, out_path)
+
+    if stream:
+        stream.report()
+
+    #Stories a pipeline stage failed on, or never read, are missing from the
+    #output, so the journal is kept for `--resume` to parse just those
+    if stream and not stream.complete():
+        for name, unit, error in stream.failures():
+            print 'Stage {} failed on stories {}. {}'.format(
+                name, ', '.join(str(key) for key, story in unit), error)
+        print 'Some stories were not parsed. Keeping the journal {} so that '\
+              'the run can be resumed.'.format(journal.path)
+    else:
+        journal.remove()
 
-    with open(out_path, 'w') as f:
-        f.write(event_output)
+    if cache:
+        cache_stats = cache.stats()
+    if cache_dir and cache_stats:
+        print 'Parse cache: {hits} hits, {misses} misses'.format(**cache_stats)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,241 @@
+import time
+import Queue
+import threading
+
+#Marks the end of the stream as it is passed from stage to stage
+_DONE = object()
+
+
+class Stage():
+    """Class holding one stage of a Pipeline: a function applied to each
+    item by a number of worker threads, and statistics on its progress."""
+    def __init__(self, name, func, workers=1):
+        """
+        Instantiate the Stage class.
+
+        Parameters
+        ----------
+
+        name : String
+                Name of the stage, used in reports.
+
+        func : Function
+                Function applied to each item. Its return value is passed
+                to the next stage; returning None drops the item.
+
+        workers : Integer
+                    Number of threads running the stage.
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.queue = None
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.failed = list()
+        self.busy = 0.0
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """
+        Function to report the stage's progress.
+
+        Returns
+        -------
+
+        stats : Dictionary
+                Items processed, dropped and failed, busy seconds summed over
+                workers, throughput in items per busy second, and the current,
+                mean and maximum depth of the stage's input queue.
+        """
+        with self._lock:
+            samples = self._depth_samples or 1
+            return {'processed': self.processed,
+                    'dropped': self.dropped,
+                    'errors': self.errors,
+                    'busy': self.busy,
+                    'throughput': self.processed / self.busy
+                    if self.busy else 0.0,
+                    'depth': self.queue.qsize() if self.queue else 0,
+                    'mean_depth': self._depth_total / float(samples),
+                    'max_depth': self.max_depth}
+
+    def _put(self, item):
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        with self._lock:
+            self._depth_total += depth
+            self._depth_samples += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+
+
+class Pipeline():
+    """Class to run a series of stages concurrently. Each stage reads from a
+    bounded queue, so a slow stage makes the stages before it wait rather
+    than letting work pile up in memory."""
+    def __init__(self, source, queue_size=100):
+        """
+        Instantiate the Pipeline class.
+
+        Parameters
+        ----------
+
+        source : Iterable
+                    Items fed into the first stage, read by its own thread.
+
+        queue_size : Integer
+                        Maximum number of items waiting in front of each
+                        stage.
+        """
+        self.source = source
+        self.queue_size = queue_size
+        self.stages = list()
+        self.started = None
+        self.finished = None
+        self.read_error = None
+
+    def add_stage(self, name, func, workers=1):
+        """
+        Function to add a stage to the end of the pipeline.
+
+        Parameters
+        ----------
+
+        name : String
+                Name of the stage.
+
+        func : Function
+                Function applied to each item.
+
+        workers : Integer
+                    Number of threads running the stage.
+        """
+        stage = Stage(name, func, max(workers, 1))
+        stage.queue = Queue.Queue(self.queue_size)
+        self.stages.append(stage)
+        return stage
+
+    def run(self):
+        """
+        Generator to run the pipeline. Output of the last stage is yielded to
+        the caller, which acts as the final, single-threaded consumer such as
+        a writer.
+
+        Yields
+        ------
+
+        item : Object
+                Each item that made it through every stage.
+        """
+        output = Queue.Queue(self.queue_size)
+        self.started = time.time()
+        threads = [threading.Thread(target=self._read)]
+        for index, stage in enumerate(self.stages):
+            if index + 1 < len(self.stages):
+                next_put = self.stages[index + 1]._put
+            else:
+                next_put = output.put
+            stage._running = stage.workers
+            for i in xrange(stage.workers):
+                threads.append(threading.Thread(target=self._work,
+                                                args=(stage, next_put)))
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        while True:
+            item = output.get()
+            if item is _DONE:
+                break
+            yield item
+        for thread in threads:
+            thread.join()
+        self.finished = time.time()
+
+    def complete(self):
+        """Function to tell whether every item was read and no stage failed
+        on one, i.e. whether the output of `run` covers the whole input."""
+        return self.read_error is None and not any(stage.errors for stage
+                                                   in self.stages)
+
+    def failures(self):
+        """
+        Function to list the items each stage failed on.
+
+        Returns
+        -------
+
+        failures : List
+                    `(stage name, item, exception)` tuples, in stage order.
+        """
+        return [(stage.name, item, error) for stage in self.stages
+                for item, error in stage.failed]
+
+    def stats(self):
+        """Function to report the statistics of every stage, keyed on the
+        stage name."""
+        return dict([(stage.name, stage.stats()) for stage in self.stages])
+
+    def report(self):
+        """Function to print the statistics of every stage."""
+        elapsed = (self.finished or time.time()) - (self.started or
+                                                    time.time())
+        print 'Pipeline ran for {:.1f}s'.format(elapsed)
+        for stage in self.stages:
+            stats = stage.stats()
+            rate = stats['processed'] / elapsed if elapsed else 0.0
+            print '{}: {} items ({:.1f}/s, {} workers), {} dropped, {} errors,'\
+                  ' queue depth mean {:.1f} max {}'.format(
+                      stage.name, stats['processed'], rate, stage.workers,
+                      stats['dropped'], stats['errors'], stats['mean_depth'],
+                      stats['max_depth'])
+        if self.read_error is not None:
+            print 'Reading the input stopped early. {}'.format(
+                self.read_error)
+
+    def _read(self):
+        first = self.stages[0]
+        try:
+            for item in self.source:
+                first._put(item)
+        except Exception, e:
+            print 'Problem reading pipeline input. {}'.format(e)
+            self.read_error = e
+        first.queue.put(_DONE)
+
+    def _work(self, stage, next_put):
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                #Let the stage's other workers see the end of the stream
+                stage.queue.put(_DONE)
+                break
+            start = time.time()
+            try:
+                result = stage.func(item)
+            except Exception, e:
+                print 'Pipeline stage {} failed on an item. {}'.format(
+                    stage.name, e)
+                result = None
+                with stage._lock:
+                    stage.errors += 1
+                    stage.failed.append((item, e))
+            with stage._lock:
+                stage.busy += time.time() - start
+                stage.processed += 1
+                if result is None:
+                    stage.dropped += 1
+            if result is not None:
+                next_put(result)
+
+        with stage._lock:
+            stage._running -= 1
+            last = stage._running == 0
+        if last:
+            next_put(_DONE)
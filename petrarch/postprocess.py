@@ -16,19 +16,33 @@ stopwords = _get_data("english_stopwords.pickle")
 
 def process(event_dict, username=None, geolocate=False, feature_extract=False):
 
-    processed = list()
-    for key in event_dict.keys():
-        tagged_sent = event_dict[key]['tagged']
-        noun_phrases = event_dict[key]['noun_phrases']
-        verb_phrases = event_dict[key]['verb_phrases']
-        temp = post_process(tagged_sent, key, noun_phrases, verb_phrases,
-                            geo=geolocate, username=username,
-                            feature=feature_extract)
-        processed.append(temp)
-
-    for processed_sent in processed:
-        key = processed_sent.keys()[0]
-        event_dict[key].update(processed_sent[key])
+    for key, event in iter_process(event_dict.items(), username, geolocate,
+                                   feature_extract):
+        event_dict[key] = event
+
+
+def iter_process(events, username=None, geolocate=False,
+                 feature_extract=False):
+    """
+    Generator version of `process` that consumes and yields
+    `(event_id, event_info)` pairs, such as those produced by
+    `parse.iter_parse`, so postprocessing can run on a stream of events.
+
+    Parameters
+    ----------
+
+    events : Iterable
+                Iterable of `(event_id, event_info)` pairs.
+
+    """
+    for key, event in events:
+        processed_sent = post_process(event['tagged'], key,
+                                      event['noun_phrases'],
+                                      event['verb_phrases'], geo=geolocate,
+                                      username=username,
+                                      feature=feature_extract)
+        event.update(processed_sent[key])
+        yield key, event
 
 
 def post_process(pos_tagged, key, noun_phrases, verb_phrases, geo=False,
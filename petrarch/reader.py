@@ -0,0 +1,290 @@
+import os
+import mmap
+import struct
+import dateutil.parser
+
+INDEX_SUFFIX = '.idx'
+_INDEX_MAGIC = 'PETRIDX1'
+#Source file size and modification time, used to spot stale indexes
+_INDEX_HEADER = struct.Struct('<Qd')
+#Byte offset, byte length, line number and ID length for each story
+_INDEX_ENTRY = struct.Struct('<QIIH')
+
+
+def iter_stories(filepath, use_mmap=False, errors=None):
+    """
+    Generator to read a file of news stories formatted in the traditional
+    TABARI format. Stories are separated by blank lines; the first line of
+    each story holds the date and story ID, the remaining lines hold the
+    text. Stories are yielded one at a time so the whole file never has to
+    be held in memory.
+
+    Parameters
+    ----------
+
+    filepath : String
+                Filepath of the file containing the stories to be parsed.
+
+    use_mmap : Boolean
+                Whether to read the file through a read-only memory map
+                rather than a regular buffered file object. Defaults to
+                False.
+
+    errors : List
+                Optional list to which a `(line_number, meta_string, error)`
+                tuple is appended for each malformed record. Malformed
+                records are reported and skipped rather than raising.
+
+    Yields
+    ------
+
+    record : Tuple
+                `(id, day, story)` for each well-formed story, where `day`
+                is a datetime object.
+
+    """
+    with open(filepath, 'rb') as fin:
+        for offset, length, lineno, lines in _iter_records(fin, use_mmap):
+            record = _parse_record(lines, lineno, errors)
+            if record:
+                yield record
+
+
+def build_index(filepath, index_path=None):
+    """
+    Function to build a byte-offset index for a TABARI formatted file. The
+    index is written to a compact binary sidecar file that records each
+    story ID's byte offset and length, allowing individual stories to be
+    read without scanning the whole file.
+
+    Parameters
+    ----------
+
+    filepath : String
+                Filepath of the TABARI formatted file to index.
+
+    index_path : String
+                Filepath of the sidecar index. Defaults to `filepath` with
+                `INDEX_SUFFIX` appended.
+
+    Returns
+    -------
+
+    index_path : String
+                Filepath of the written index.
+
+    """
+    if not index_path:
+        index_path = filepath + INDEX_SUFFIX
+    stat = os.stat(filepath)
+    temp_path = index_path + '.tmp'
+    with open(filepath, 'rb') as fin, open(temp_path, 'wb') as fout:
+        fout.write(_INDEX_MAGIC)
+        fout.write(_INDEX_HEADER.pack(stat.st_size, stat.st_mtime))
+        for offset, length, lineno, lines in _iter_records(fin):
+            meta = lines[0].split()
+            if len(meta) < 2:
+                continue
+            ident = meta[1]
+            fout.write(_INDEX_ENTRY.pack(offset, length, lineno, len(ident)))
+            fout.write(ident)
+    os.rename(temp_path, index_path)
+
+    return index_path
+
+
+def load_index(index_path, filepath=None):
+    """
+    Function to load an index written by `build_index`.
+
+    Parameters
+    ----------
+
+    index_path : String
+                Filepath of the sidecar index.
+
+    filepath : String
+                Optional filepath of the indexed file. If given, the index
+                is checked against the file's current size and modification
+                time and None is returned if it is stale.
+
+    Returns
+    -------
+
+    index : Dictionary
+            Story IDs as keys with `(offset, length, line_number)` tuples
+            as values, or None if the index is missing or stale.
+
+    """
+    try:
+        with open(index_path, 'rb') as fin:
+            data = fin.read()
+    except IOError:
+        return None
+    if not data.startswith(_INDEX_MAGIC):
+        return None
+
+    position = len(_INDEX_MAGIC)
+    size, mtime = _INDEX_HEADER.unpack_from(data, position)
+    if filepath:
+        stat = os.stat(filepath)
+        if stat.st_size != size or stat.st_mtime != mtime:
+            return None
+    position += _INDEX_HEADER.size
+
+    index = dict()
+    entry_size = _INDEX_ENTRY.size
+    while position < len(data):
+        offset, length, lineno, id_len = _INDEX_ENTRY.unpack_from(data,
+                                                                  position)
+        position += entry_size
+        index[data[position:position + id_len]] = (offset, length, lineno)
+        position += id_len
+
+    return index
+
+
+def read_ids(filepath, ids, index_path=None, errors=None):
+    """
+    Generator to read only the requested stories from a TABARI formatted
+    file. The byte-offset index is used to seek straight to each story; it
+    is built, or rebuilt if stale, when needed.
+
+    Parameters
+    ----------
+
+    filepath : String
+                Filepath of the file containing the stories.
+
+    ids : Iterable
+            Story IDs to read.
+
+    index_path : String
+                Filepath of the sidecar index. Defaults to `filepath` with
+                `INDEX_SUFFIX` appended.
+
+    errors : List
+                Optional list collecting malformed records, as for
+                `iter_stories`.
+
+    Yields
+    ------
+
+    record : Tuple
+                `(id, day, story)` for each requested story, in file order.
+
+    """
+    if not index_path:
+        index_path = filepath + INDEX_SUFFIX
+    index = load_index(index_path, filepath)
+    if index is None:
+        print 'Building index {}'.format(index_path)
+        build_index(filepath, index_path)
+        index = load_index(index_path)
+
+    locations = list()
+    for ident in set(ids):
+        if ident in index:
+            locations.append(index[ident])
+        else:
+            print 'Story ID {} not found in {}'.format(ident, filepath)
+    #Read in file order so the seeks only move forward
+    locations.sort()
+
+    with open(filepath, 'rb') as fin:
+        for offset, length, lineno in locations:
+            fin.seek(offset)
+            lines = fin.read(length).splitlines(True)
+            record = _parse_record(lines, lineno, errors)
+            if record:
+                yield record
+
+
+def read_id_file(filepath):
+    """
+    Function to read a file of story IDs, one per line. Blank lines and
+    lines starting with `#` are ignored.
+
+    Parameters
+    ----------
+
+    filepath : String
+                Filepath of the ID file.
+
+    Returns
+    -------
+
+    ids : List
+            Story IDs in the file.
+
+    """
+    ids = list()
+    with open(filepath, 'r') as fin:
+        for line in fin:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                ids.append(line)
+
+    return ids
+
+
+def _iter_records(fin, use_mmap=False):
+    """
+    Private generator to split an open TABARI file into raw records.
+
+    Yields
+    ------
+
+    record : Tuple
+                `(offset, length, line_number, lines)` where `offset` and
+                `length` give the record's position in bytes, `line_number`
+                is the line of the meta string, and `lines` is the list of
+                lines making up the record.
+
+    """
+    source = fin
+    if use_mmap:
+        try:
+            mapped = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+            source = iter(mapped.readline, '')
+        except ValueError:
+            #Empty files can't be mapped, fall back to the file object
+            pass
+
+    position = 0
+    start = 0
+    start_line = 1
+    lines = list()
+    for lineno, line in enumerate(source, 1):
+        if line.strip():
+            if not lines:
+                start = position
+                start_line = lineno
+            lines.append(line)
+        elif lines:
+            yield start, position - start, start_line, lines
+            lines = list()
+        position += len(line)
+    if lines:
+        yield start, position - start, start_line, lines
+
+
+def _parse_record(lines, lineno, errors=None):
+    """
+    Private function to turn the lines of a single TABARI record into an
+    `(id, day, story)` tuple. Returns None, and reports the problem, if
+    the record is malformed.
+    """
+    meta_string = lines[0].strip()
+    try:
+        day, ident = meta_string.split()[:2]
+        day = dateutil.parser.parse(day)
+    except (ValueError, TypeError, OverflowError), e:
+        print 'Malformed record at line {}: "{}". {}'.format(lineno,
+                                                            meta_string, e)
+        if errors is not None:
+            errors.append((lineno, meta_string, str(e)))
+        return None
+    story_string = ''.join([line.rstrip('\r\n') for line in lines[1:]])
+
+    return ident, day, story_string
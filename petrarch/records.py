@@ -0,0 +1,406 @@
+import utilities
+from compact_tree import CompactTree
+
+#Keys taken straight from the CoreNLP output for the sentence
+_CONTENT_KEYS = {'word_info': 'words', 'dependencies': 'dependencies'}
+
+
+def _intern_key(key):
+    #The same few keys are used by every record, so share one copy of each
+    if type(key) is str:
+        return intern(key)
+    return key
+
+
+class _Record(object):
+    """Base class giving a record the dictionary methods used by the rest of
+    PETRARCH. Subclasses provide `keys`, `__getitem__` and `__setitem__`."""
+    __slots__ = ()
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        """Function to list the record's `(key, value)` pairs."""
+        return [(key, self[key]) for key in self.keys()]
+
+    def iteritems(self):
+        for key in self.keys():
+            yield key, self[key]
+
+    def update(self, other):
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, value in other:
+            self[key] = value
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.keys())
+
+
+class Sentence(_Record):
+    """Class holding the information for one sentence of a story. It behaves
+    like the dictionary `parse.parse_sents` used to build, e.g.
+    `sentence['np_words']`, but the parse tree and phrases are only built
+    the first time they're asked for and are then kept, so runs that never
+    look at them don't pay for them."""
+    __slots__ = ('_content', '_phrase_labels', '_values', '_parse_tree',
+                 '_phrases')
+
+    def __init__(self, content, phrase_labels=None):
+        """
+        Instantiate the Sentence class.
+
+        Parameters
+        ----------
+
+        content : Dictionary
+                    Information for the sentence as output by StanfordNLP and
+                    the StanfordCoreNLP Python library, with the keys
+                    `parsetree`, `words` and `dependencies`.
+
+        phrase_labels : Iterable
+                        Phrase types to collect when the phrases are first
+                        asked for. Defaults to `utilities.PHRASE_LABELS`.
+        """
+        self._content = content
+        if phrase_labels is None:
+            phrase_labels = utilities.PHRASE_LABELS
+        self._phrase_labels = tuple(phrase_labels)
+        self._values = None
+        self._parse_tree = None
+        self._phrases = None
+
+    def tree_string(self):
+        """Function to get the bracketed string form of the parse tree
+        without building the tree if it hasn't been built already."""
+        if self._values and 'parse_tree' in self._values:
+            return utilities.tree_to_string(self._values['parse_tree'])
+        if self._parse_tree is not None:
+            return utilities.tree_to_string(self._parse_tree)
+        return self._content['parsetree']
+
+    def _lazy_keys(self):
+        keys = ['parse_tree', 'word_info', 'dependencies']
+        for label in self._phrase_labels:
+            keys.extend(utilities.phrase_keys(label))
+        return keys
+
+    def _compute(self, key):
+        if key == 'parse_tree':
+            if self._parse_tree is None:
+                self._parse_tree = CompactTree(self._content['parsetree'])
+            return self._parse_tree
+        if key in _CONTENT_KEYS:
+            return self._content[_CONTENT_KEYS[key]]
+        if self._phrases is None:
+            #All phrase types are collected in the one pass
+            self._phrases = utilities._get_phrases(self['parse_tree'],
+                                                   self._phrase_labels)
+        return self._phrases[key]
+
+    def __getitem__(self, key):
+        if self._values and key in self._values:
+            return self._values[key]
+        if key in self._lazy_keys():
+            return self._compute(key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if self._values is None:
+            self._values = dict()
+        self._values[_intern_key(key)] = value
+
+    def __delitem__(self, key):
+        if not self._values or key not in self._values:
+            raise KeyError(key)
+        del self._values[key]
+
+    def keys(self):
+        """Function to list the sentence's keys, including those that
+        haven't been computed yet."""
+        keys = self._lazy_keys()
+        if self._values:
+            keys.extend([key for key in self._values if key not in keys])
+        return keys
+
+    def __getstate__(self):
+        #Computed values are left out and rebuilt after unpickling
+        return self._content, self._phrase_labels, self._values
+
+    def __setstate__(self, state):
+        self._content, self._phrase_labels, self._values = state
+        self._parse_tree = None
+        self._phrases = None
+
+
+class CorefInfo(_Record):
+    """Class holding the coreferences whose pronoun is in one sentence, and
+    the bookkeeping `utilities.coref_replace` does while replacing them.
+    Acts as a dictionary with the keys `corefs`, `shift` and `errors`."""
+    __slots__ = ('_corefs', 'shift', '_errors')
+    _KEYS = ('corefs', 'shift', 'errors')
+
+    def __init__(self, corefs=None, shift=0, errors=None):
+        """
+        Instantiate the CorefInfo class.
+
+        Parameters
+        ----------
+
+        corefs : List
+                    Coreference pairs, as output by the StanfordCoreNLP
+                    Python library, whose pronoun is in the sentence.
+
+        shift : Integer
+                Number of words added to the sentence by replacing its
+                pronouns.
+
+        errors : List
+                    Whether each coreference that was tried failed.
+        """
+        self._corefs = corefs
+        self.shift = shift
+        self._errors = errors
+
+    @property
+    def corefs(self):
+        #Most sentences have no coreferences, so only make a list when
+        #one is needed
+        if self._corefs is None:
+            self._corefs = list()
+        return self._corefs
+
+    @property
+    def errors(self):
+        if self._errors is None:
+            self._errors = list()
+        return self._errors
+
+    def keys(self):
+        return list(self._KEYS)
+
+    def __getitem__(self, key):
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key == 'shift':
+            self.shift = value
+        elif key == 'corefs':
+            self._corefs = value
+        elif key == 'errors':
+            self._errors = value
+        else:
+            raise KeyError(key)
+
+    def __getstate__(self):
+        return self._corefs, self.shift, self._errors
+
+    def __setstate__(self, state):
+        self._corefs, self.shift, self._errors = state
+
+
+class Story(_Record):
+    """Class holding a parsed story: its sentences, their coreference
+    information, and anything added to it later such as the story date.
+    Acts as the dictionary `parse.parse_sents` used to build, so
+    `story['sent_info']['sents'][0]` still works."""
+    __slots__ = ('sents', 'coref_info', '_values')
+
+    def __init__(self, sents=None, coref_info=None):
+        """
+        Instantiate the Story class.
+
+        Parameters
+        ----------
+
+        sents : Dictionary
+                Sentence numbers as keys with `Sentence` records as values.
+
+        coref_info : Dictionary
+                        Sentence numbers as keys with `CorefInfo` records as
+                        values, or None if the story has no coreference
+                        information.
+        """
+        if sents is None:
+            sents = dict()
+        self.sents = sents
+        self.coref_info = coref_info
+        self._values = None
+
+    def keys(self):
+        keys = ['sent_info']
+        if self._values:
+            keys.extend(self._values.keys())
+        return keys
+
+    def __getitem__(self, key):
+        if key == 'sent_info':
+            return SentInfo(self)
+        if self._values and key in self._values:
+            return self._values[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'sent_info':
+            self.sents = value['sents']
+            self.coref_info = value.get('coref_info')
+            return
+        if self._values is None:
+            self._values = dict()
+        self._values[_intern_key(key)] = value
+
+    def __delitem__(self, key):
+        if not self._values or key not in self._values:
+            raise KeyError(key)
+        del self._values[key]
+
+    def __getstate__(self):
+        return self.sents, self.coref_info, self._values
+
+    def __setstate__(self, state):
+        self.sents, self.coref_info, self._values = state
+
+
+class SentInfo(_Record):
+    """Class giving the `sent_info` dictionary view of a `Story`, with the
+    keys `sents` and, if the story has coreference information,
+    `coref_info`. It's made on access, so nothing is stored for it."""
+    __slots__ = ('_story',)
+
+    def __init__(self, story):
+        self._story = story
+
+    def keys(self):
+        if self._story.coref_info is None:
+            return ['sents']
+        return ['sents', 'coref_info']
+
+    def __getitem__(self, key):
+        if key == 'sents':
+            return self._story.sents
+        if key == 'coref_info' and self._story.coref_info is not None:
+            return self._story.coref_info
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'sents':
+            self._story.sents = value
+        elif key == 'coref_info':
+            self._story.coref_info = value
+        else:
+            raise KeyError(key)
+
+
+def sentence_from_dict(sentence):
+    """
+    Function to build a `Sentence` record from a sentence dictionary in the
+    form `parse.parse_sents` used to produce.
+
+    Parameters
+    ----------
+
+    sentence : Dictionary
+                Sentence information with at least the keys `parse_tree`,
+                `word_info` and `dependencies`.
+
+    Returns
+    -------
+
+    record : Sentence
+                Record holding the same information.
+    """
+    if isinstance(sentence, Sentence):
+        return sentence
+    content = {'parsetree': utilities.tree_to_string(sentence['parse_tree']),
+               'words': sentence.get('word_info', list()),
+               'dependencies': sentence.get('dependencies', list())}
+    record = Sentence(content)
+    for key, value in sentence.iteritems():
+        if key not in _CONTENT_KEYS:
+            record[key] = value
+    return record
+
+
+def sentence_to_dict(sentence):
+    """Function to turn a `Sentence` record into a plain dictionary. Every
+    lazily computed value is computed."""
+    return dict(sentence.items())
+
+
+def story_from_dict(event_info):
+    """
+    Function to build a `Story` record from a story dictionary in the form
+    `parse.parse_sents` used to produce, i.e.
+    `{'sent_info': {'sents': {...}, 'coref_info': {...}}, ...}`.
+
+    Parameters
+    ----------
+
+    event_info : Dictionary
+                    Story information.
+
+    Returns
+    -------
+
+    record : Story
+                Record holding the same information.
+    """
+    if isinstance(event_info, Story):
+        return event_info
+    sent_info = event_info['sent_info']
+    sents = dict([(i, sentence_from_dict(sentence)) for i, sentence
+                  in sent_info['sents'].iteritems()])
+    coref_info = None
+    if 'coref_info' in sent_info:
+        coref_info = dict()
+        for i, info in sent_info['coref_info'].iteritems():
+            coref_info[i] = CorefInfo(info['corefs'], info['shift'],
+                                      info['errors'])
+    record = Story(sents, coref_info)
+    for key, value in event_info.iteritems():
+        if key != 'sent_info':
+            record[key] = value
+    return record
+
+
+def story_to_dict(story):
+    """
+    Function to turn a `Story` record into the nested dictionaries
+    `parse.parse_sents` used to produce.
+
+    Parameters
+    ----------
+
+    story : Story
+            Story record.
+
+    Returns
+    -------
+
+    event_info : Dictionary
+                    Story information as plain dictionaries.
+    """
+    event_info = dict([(key, value) for key, value in story.iteritems()
+                       if key != 'sent_info'])
+    sent_info = {'sents': dict([(i, sentence_to_dict(sentence)) for
+                                i, sentence in story.sents.iteritems()])}
+    if story.coref_info is not None:
+        sent_info['coref_info'] = dict([(i, dict(info.items())) for i, info
+                                        in story.coref_info.iteritems()])
+    event_info['sent_info'] = sent_info
+    return event_info
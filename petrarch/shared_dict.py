@@ -0,0 +1,350 @@
+import os
+import mmap
+import zlib
+import struct
+import marshal
+import tempfile
+from array import array
+
+MAGIC = 'PETRSHD1'
+#File header: magic and the offset of the table directory
+_HEADER = struct.Struct('<8sQ')
+#Hash table slot: key hash, key offset and length, value offset and length.
+#Empty slots have a key offset of 0, which is inside the header
+_SLOT = struct.Struct('<IQIQI')
+#List entry: value offset and length
+_ENTRY = struct.Struct('<QI')
+_unpack_slot = _SLOT.unpack_from
+_unpack_entry = _ENTRY.unpack_from
+_SLOT_SIZE = _SLOT.size
+_ENTRY_SIZE = _ENTRY.size
+
+
+class SharedDict():
+    """Class giving read-only dictionary access to a hash table stored in a
+    memory-mapped file written by `write`. Every process that opens the
+    file shares the same pages, and lookups read straight from the map
+    rather than from Python objects, so the table costs each process almost
+    nothing however large it is.
+
+    Keys and values can be anything `marshal` can store. Unicode strings in
+    keys are looked up by their UTF-8 encoding, as they would match the
+    equivalent byte string in a dictionary."""
+    def __init__(self, buffer, slots, size, count):
+        """
+        Instantiate the SharedDict class. Use `load` to open the tables in
+        a file.
+
+        Parameters
+        ----------
+
+        buffer : mmap
+                    Memory map of the file.
+
+        slots : Integer
+                Offset of the table's slots in the file.
+
+        size : Integer
+                Number of slots, a power of two.
+
+        count : Integer
+                Number of keys in the table.
+        """
+        self._buffer = buffer
+        self._slots = slots
+        self._mask = size - 1
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def get(self, key, default=None):
+        """Function to get the value for a key, or `default`."""
+        encoded = _encode_key(key)
+        digest = zlib.crc32(encoded) & 0xffffffff
+        buffer = self._buffer
+        i = digest & self._mask
+        while True:
+            slot_hash, key_at, key_len, value_at, value_len = \
+                _unpack_slot(buffer, self._slots + i * _SLOT_SIZE)
+            if not key_at:
+                return default
+            if slot_hash == digest and key_len == len(encoded) and \
+                    buffer[key_at:key_at + key_len] == encoded:
+                return marshal.loads(buffer[value_at:value_at + value_len])
+            i = (i + 1) & self._mask
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def iteritems(self):
+        buffer = self._buffer
+        for i in xrange(self._mask + 1):
+            slot_hash, key_at, key_len, value_at, value_len = \
+                _SLOT.unpack_from(buffer, self._slots + i * _SLOT.size)
+            if key_at:
+                yield (marshal.loads(buffer[key_at:key_at + key_len]),
+                       marshal.loads(buffer[value_at:value_at + value_len]))
+
+    def keys(self):
+        return [key for key, value in self.iteritems()]
+
+
+class SharedList():
+    """Class giving read-only list access to a list stored in a
+    memory-mapped file written by `write`. Items are found by their index
+    without hashing, so it's faster than a `SharedDict` keyed on the
+    index."""
+    def __init__(self, buffer, entries, count):
+        """
+        Instantiate the SharedList class. Use `load` to open the tables in a
+        file.
+
+        Parameters
+        ----------
+
+        buffer : mmap
+                    Memory map of the file.
+
+        entries : Integer
+                    Offset of the list's entries in the file.
+
+        count : Integer
+                Number of items in the list.
+        """
+        self._buffer = buffer
+        self._entries = entries
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('list index out of range')
+        value_at, value_len = _unpack_entry(self._buffer, self._entries +
+                                            index * _ENTRY_SIZE)
+        return marshal.loads(self._buffer[value_at:value_at + value_len])
+
+    def __iter__(self):
+        for index in xrange(self._count):
+            yield self[index]
+
+
+class SharedArray():
+    """Class giving read-only access to an `array` stored in a
+    memory-mapped file written by `write`. Items are read from the map
+    without unpickling, so it's the fastest of the shared tables for
+    integers."""
+    def __init__(self, buffer, items, typecode, count):
+        """
+        Instantiate the SharedArray class. Use `load` to open the tables in
+        a file.
+
+        Parameters
+        ----------
+
+        buffer : mmap
+                    Memory map of the file.
+
+        items : Integer
+                Offset of the array's items in the file.
+
+        typecode : String
+                    Type code of the array the items were written from.
+
+        count : Integer
+                Number of items in the array.
+        """
+        self._buffer = buffer
+        self._items = items
+        item = struct.Struct(typecode)
+        self._unpack = item.unpack_from
+        self._size = item.size
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('array index out of range')
+        return self._unpack(self._buffer, self._items +
+                            index * self._size)[0]
+
+    def __iter__(self):
+        for index in xrange(self._count):
+            yield self[index]
+
+
+#Marker for a missing key, since None can be a value
+_MISSING = object()
+
+
+def write(path, tables):
+    """
+    Function to write tables to a file that `load` can memory-map. The file
+    is written to a temporary file and renamed into place, so processes
+    never open a partially written file.
+
+    Parameters
+    ----------
+
+    path : String
+            Filepath to write to.
+
+    tables : Dictionary
+                Table names as keys with dictionaries, lists or arrays as
+                values. Keys and values can be anything `marshal` can
+                store. Arrays are written in the machine's byte order, so
+                the file is only meant to be read on the machine that wrote
+                it.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, 0))
+            layout = dict()
+            for name, table in tables.iteritems():
+                if isinstance(table, array):
+                    layout[name] = ('array', f.tell(), table.typecode,
+                                    len(table))
+                    table.tofile(f)
+                elif isinstance(table, list):
+                    layout[name] = ('list',) + _write_list(f, table)
+                else:
+                    layout[name] = ('dict',) + _write_table(f, table)
+            directory_at = f.tell()
+            f.write(marshal.dumps(layout))
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, directory_at))
+        os.rename(temp_path, path)
+    except:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load(path):
+    """
+    Function to open the tables in a file written by `write`.
+
+    Parameters
+    ----------
+
+    path : String
+            Filepath of the tables.
+
+    Returns
+    -------
+
+    tables : Dictionary
+                Table names as keys with `SharedDict` objects, or
+                `SharedList` and `SharedArray` objects for tables written
+                from lists and arrays, as values.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, directory_at = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or not directory_at:
+        raise ValueError('{} is not a shared dictionary file'.format(path))
+    layout = marshal.loads(buffer[directory_at:])
+    tables = dict()
+    for name, location in layout.iteritems():
+        if location[0] == 'list':
+            tables[name] = SharedList(buffer, *location[1:])
+        elif location[0] == 'array':
+            tables[name] = SharedArray(buffer, *location[1:])
+        else:
+            tables[name] = SharedDict(buffer, *location[1:])
+    return tables
+
+
+def _encode_key(key):
+    """Private function to get the bytes a key is stored under."""
+    kind = type(key)
+    if kind is unicode:
+        key = key.encode('utf-8')
+    elif kind is tuple and unicode in [type(part) for part in key]:
+        key = tuple([part.encode('utf-8') if type(part) is unicode else part
+                     for part in key])
+    #Version 0 writes interned and other strings alike, so equal keys always
+    #give the same bytes
+    return marshal.dumps(key, 0)
+
+
+def _write_table(f, table):
+    """Private function to write one hash table at the end of a file,
+    returning its slot offset, number of slots and number of keys."""
+    entries = [(_encode_key(key), marshal.dumps(value)) for key, value in
+               table.iteritems()]
+    size = 8
+    while size < 2 * len(entries):
+        size *= 2
+
+    #Keys and values go after the slots, which are filled in once the
+    #offsets are known
+    slots_at = f.tell()
+    data_at = slots_at + size * _SLOT.size
+    slots = [None] * size
+    mask = size - 1
+    data = _Data(data_at)
+    for key, value in entries:
+        digest = zlib.crc32(key) & 0xffffffff
+        i = digest & mask
+        while slots[i] is not None:
+            i = (i + 1) & mask
+        slots[i] = (digest, data.add(key, False), len(key), data.add(value),
+                    len(value))
+    empty = _SLOT.pack(0, 0, 0, 0, 0)
+    f.write(''.join([_SLOT.pack(*slot) if slot else empty for slot in
+                     slots]))
+    f.write(''.join(data.parts))
+    return slots_at, size, len(entries)
+
+
+def _write_list(f, table):
+    """Private function to write one list at the end of a file, returning
+    its entry offset and number of items."""
+    entries_at = f.tell()
+    data = _Data(entries_at + len(table) * _ENTRY.size)
+    entries = list()
+    for value in table:
+        value = marshal.dumps(value)
+        entries.append(_ENTRY.pack(data.add(value), len(value)))
+    f.write(''.join(entries))
+    f.write(''.join(data.parts))
+    return entries_at, len(table)
+
+
+class _Data():
+    """Private class collecting the keys and values written after a table.
+    Values that repeat, such as the flags of a trie's nodes, are only
+    written once."""
+    def __init__(self, offset):
+        self.offset = offset
+        self.parts = list()
+        self.written = dict()
+
+    def add(self, blob, share=True):
+        if share and blob in self.written:
+            return self.written[blob]
+        at = self.offset
+        self.parts.append(blob)
+        self.offset += len(blob)
+        if share:
+            self.written[blob] = at
+        return at
@@ -1,19 +1,30 @@
-from nltk.tree import Tree
-import copy
+import sys
+import compact_tree
+
+#Phrase types collected for each sentence by parse.parse_sents
+PHRASE_LABELS = ('NP', 'VP')
+
+#Keys under which each phrase type and its words are stored. Other labels
+#are stored under e.g. 'sbar_phrases' and 'sbar_words'.
+PHRASE_KEYS = {'NP': ('noun_phrases', 'np_words'),
+               'VP': ('verb_phrases', 'vp_words'),
+               'PP': ('prep_phrases', 'pp_words')}
 
 
 def coref_replace(event_dict, key):
     """
     Function to replace pronouns with the referenced noun phrase. Iterates
     over each sentence in a news story and pulls coreference information
-    from the applicable sentence, even if it is from another sentence. Also
-    keeps track of any changes in indexes made by replacing pronouns, i.e.,
-    the reference is longer than the reference so the tree index changes for
-    future references. Filters coreferences on various dimensions to ensure
-    only "good" coreferences are replaced. The default behavior is to do
-    no replacement rather than a bad replacement. The function does not
-    return a value, instead the event_dict is updated with the new parse tree
-    containing the coref information.
+    from the applicable sentence, even if it is from another sentence.
+    Every replacement for the story is planned first against the original
+    parse trees, where CoreNLP's word indexes are exact, and each
+    sentence's replacements are then applied in a single pass. Replacing
+    a node never moves any other node of the tree, so no index tracking or
+    searching is needed. Filters coreferences on various dimensions to
+    ensure only "good" coreferences are replaced. The default behavior is
+    to do no replacement rather than a bad replacement. The function does
+    not return a value, instead the event_dict is updated with the new parse
+    tree containing the coref information.
 
     Parameters
     ----------
@@ -26,152 +37,237 @@ def coref_replace(event_dict, key):
             ID of the event or news story being processed.
 
     """
-    #TODO: This could use some major refactoring.
-    if 'coref_info' in event_dict[key]['sent_info'].keys():
-        sent_info = event_dict[key]['sent_info']['sents']
-        coref_info = event_dict[key]['sent_info']['coref_info']
-        for sent in coref_info:
-            for coref in coref_info[sent]['corefs']:
-                pronoun = coref[0]
-                ref = coref[1]
-                if any([word in ref[0] for word in pronoun[0].split()]):
-                    pass
-                elif any([word in pronoun[0] for word in ref[0].split()]):
-                    pass
-                elif pronoun[4] - pronoun[3] > 1:
-                    pass
-                else:
-                    try:
-                        #Getting the stuff for pronouns
-                        if 'coref_tree' in sent_info[pronoun[1]].keys():
-                            pronoun_sent = copy.deepcopy(sent_info[pronoun[1]]
-                                                         ['coref_tree'])
-                        else:
-                            pronoun_sent = copy.deepcopy(sent_info[pronoun[1]]
-                                                         ['parse_tree'])
-                            pronoun_sent = Tree(pronoun_sent)
-                        pro_shift = coref_info[pronoun[1]]['shift']
-                        #Getting stuff for the reference
-                        if 'coref_tree' in sent_info[ref[1]].keys():
-                            coref_sent = sent_info[ref[1]]['coref_tree']
-                        else:
-                            coref_sent = Tree(sent_info[ref[1]]['parse_tree'])
-                        ref_shift = coref_info[ref[1]]['shift']
-
-                        #Actaully replacing the pronoun
-                        try:
-                            pronoun_pos = pronoun_sent.leaf_treeposition(pronoun[3]
-                                                                         + pro_shift)
-                            #Hunting for the right pronoun
-                            if pronoun_sent[pronoun_pos] != pronoun[0]:
-                                if pronoun_sent[pronoun_sent.leaf_treeposition(pronoun[3] + (pro_shift - 1))] == pronoun[0]:
-                                    pronoun_pos = pronoun_sent.leaf_treeposition(pronoun[3] + (pro_shift - 1))
-                                    coref_info[pronoun[1]]['shift'] -= 1
-                                elif pronoun_sent[pronoun_sent.leaf_treeposition(pronoun[3] + (pro_shift + 1))] == pronoun[0]:
-                                    pronoun_pos = pronoun_sent.leaf_treeposition(pronoun[3] + (pro_shift + 1))
-                                    coref_info[pronoun[1]]['shift'] += 1
-                                else:
-                                    break
-
-                            #Hunting for the right coref
-                            original_coref_index = coref_sent.leaf_treeposition(ref[3])[:-2]
-                            if ' '.join(coref_sent[original_coref_index].leaves()) == ref[0]:
-                                coref_pos = coref_sent.leaf_treeposition(ref[3])[:-2]
-                            elif ref[0] in ' '.join(coref_sent[original_coref_index].leaves()):
-                                coref_pos = coref_sent.leaf_treeposition(ref[3])[:-2]
-                            else:
-                                coref_pos = coref_sent.leaf_treeposition(ref[3] + ref_shift)[:-2]
-
-                            if ref[0] not in ' '.join(coref_sent[coref_pos].leaves()):
-                                pass
-
-                            #Found everything, now replace
-                            coref_tree = Tree('COREF', [coref_sent[coref_pos]])
-                            pronoun_sent[pronoun_pos[:-1]] = coref_tree
-                        except IndexError:
-                            #TODO: Should this use the original sentence rather
-                            #than possibly bad coreferences?
-                            print """Key {}, sentence {} has a problem with the corefencing. Breaking and moving on.\n""".format(key, sent)
-                            break
-
-                        #Recording the shift length for the pronoun replacement
-                        if len(coref_tree.leaves()) <= 2:
-                            coref_info[pronoun[1]]['shift'] += 0
-                        else:
-                            coref_info[pronoun[1]]['shift'] += coref_tree.height()
-
-                        coref_info[pronoun[1]]['errors'].append(False)
-
-                        if not any(coref_info[pronoun[1]]['errors']):
-                            if pronoun_sent != sent_info[sent]['parse_tree']:
-                                sent_info[sent]['coref_tree'] = pronoun_sent
-                    except RuntimeError, e:
-                        print 'There was an error. {}'.format(e)
-                        coref_info[pronoun[1]]['errors'].append(True)
-                        pass
-    else:
-        pass
+    if 'coref_info' not in event_dict[key]['sent_info'].keys():
+        return
+    sent_info = event_dict[key]['sent_info']['sents']
+    coref_info = event_dict[key]['sent_info']['coref_info']
+    #Leaf tables for the trees used so far, so each tree is indexed once
+    #rather than walked for every lookup
+    tables = dict()
+
+    plan = dict()
+    for sent in coref_info:
+        for coref in coref_info[sent]['corefs']:
+            pronoun = coref[0]
+            ref = coref[1]
+            if any([word in ref[0] for word in pronoun[0].split()]):
+                continue
+            elif any([word in pronoun[0] for word in ref[0].split()]):
+                continue
+            elif pronoun[4] - pronoun[3] > 1:
+                continue
+            try:
+                replacement = _plan_coref(sent_info, pronoun, ref, tables)
+            except (IndexError, KeyError):
+                replacement = None
+            if replacement is None:
+                print """Key {}, sentence {} has a problem with the corefencing. Skipping it.\n""".format(key, sent)
+                coref_info[sent]['errors'].append(True)
+                continue
+            position, referent = replacement
+            #The first referent found for a pronoun wins
+            plan.setdefault(sent, dict()).setdefault(position, referent)
+            coref_info[sent]['errors'].append(False)
 
+    for sent in plan:
+        _apply_corefs(sent_info, sent, coref_info[sent], plan[sent])
 
-def _get_np(parse_tree):
+
+def _plan_coref(sent_info, pronoun, ref, tables):
     """
-    Private function to pull noun phrases from a parse tree.
+    Private function to find where a coreference's pronoun is and what
+    replaces it.
 
     Parameters
     ----------
 
-    parse_tree : NLTK.tree object
-                Parse tree from which to pull noun phrases.
+    sent_info: Dictionary.
+                The story's sentences.
+
+    pronoun: Tuple.
+                CoreNLP mention of the pronoun, `(text, sentence, head,
+                start, end)`.
+
+    ref: Tuple.
+            CoreNLP mention the pronoun refers to.
+
+    tables: Dictionary.
+            Leaf tables of the story's trees.
 
     Returns
     -------
 
-    output : Dictionary
-            Dictionary with two keys: `noun_phrases` and `np_words`.
-            `noun_phrases` is a list of noun phrases in the parse tree, while
-            `np_words` is a list of words contained in the noun phrases.
+    replacement: Tuple.
+                    Tree position of the pronoun's part-of-speech node, and
+                    the `(sentence, position)` of the phrase to put in its
+                    place. None if the mentions don't match the trees.
     """
-    phrases = list()
-    words = list()
-    output = dict()
-    for node in parse_tree.subtrees(filter=lambda x: x.node == 'NP'):
-        phrases.append(node)
-        for word in node.leaves():
-            words.append(word)
+    table = _leaf_table(tables, sent_info[pronoun[1]]['parse_tree'])
+    if table.word(pronoun[3]) != pronoun[0]:
+        return None
 
-    output['noun_phrases'] = phrases
-    output['np_words'] = words
+    ref_table = _leaf_table(tables, sent_info[ref[1]]['parse_tree'])
+    first = ref_table.position(ref[3])
+    if ref[4] - ref[3] > 1:
+        #The lowest node covering every word of the mention
+        last = ref_table.position(ref[4] - 1)
+        depth = 0
+        while depth < min(len(first), len(last)) and \
+                first[depth] == last[depth]:
+            depth += 1
+        ref_pos = first[:depth]
+    else:
+        #The phrase above the word's part-of-speech node
+        ref_pos = first[:-2]
+    if ref[0] not in ref_table.text(ref_pos):
+        return None
 
-    return output
+    return table.position(pronoun[3])[:-1], (ref[1], ref_pos)
+
+
+def _apply_corefs(sent_info, sent, info, replacements):
+    """
+    Private function to build a sentence's `coref_tree` with all of its
+    planned replacements.
+
+    Parameters
+    ----------
+
+    sent_info: Dictionary.
+                The story's sentences.
+
+    sent: Integer.
+            Sentence whose pronouns are replaced.
+
+    info: Dictionary.
+            Coreference information for the sentence. Its `shift` is set to
+            the number of words the replacements added.
+
+    replacements: Dictionary.
+                    Tree positions of the pronouns as keys, with the
+                    `(sentence, position)` of their referents as values.
+    """
+    parse_tree = sent_info[sent]['parse_tree']
+    subtrees = list()
+    added = 0
+    #Right to left, so each replacement leaves the ones still to be made
+    #where they were
+    for position in sorted(replacements, reverse=True):
+        ref_sent, ref_pos = replacements[position]
+        referent = sent_info[ref_sent]['parse_tree']
+        #Works for both NLTK and compact trees
+        coref_tree = type(referent)('COREF', [referent[ref_pos]])
+        subtrees.append((position, coref_tree))
+        added += len(coref_tree.leaves()) - 1
+
+    if hasattr(parse_tree, 'replaced'):
+        coref_sent = parse_tree.replaced(subtrees)
+    else:
+        coref_sent = parse_tree.copy(deep=True)
+        for position, coref_tree in subtrees:
+            coref_sent[position] = coref_tree
+    info['shift'] = added
+    sent_info[sent]['coref_tree'] = coref_sent
 
 
-def _get_vp(parse_tree):
+def _leaf_table(tables, tree):
+    """Private function to get the leaf table for a tree from `tables`,
+    building it the first time the tree is used."""
+    table = tables.get(id(tree))
+    if table is None:
+        table = compact_tree.LeafTable(tree)
+        tables[id(tree)] = table
+    return table
+
+
+def tree_to_string(tree):
     """
-    Private function to pull verb phrases from a parse tree.
+    Function to serialise a parse tree back to the single-line bracketed
+    form produced by StanfordNLP. Trees are kept as objects while a story
+    is processed and only turned into strings when they are written out.
 
     Parameters
     ----------
 
-    parse_tree : NLTK.tree object
-                Parse tree from which to pull verb phrases.
+    tree : CompactTree or NLTK.tree object
+            Parse tree to serialise.
+
+    Returns
+    -------
+
+    output : String
+                Bracketed string form of the tree.
+    """
+    if isinstance(tree, basestring):
+        return tree
+    return tree.pprint(margin=sys.maxint)
+
+
+def _get_phrases(parse_tree, labels=None):
+    """
+    Private function to pull phrases from a parse tree. Every requested
+    phrase type is collected in a single pass over the tree.
+
+    Parameters
+    ----------
+
+    parse_tree : CompactTree or NLTK.tree object
+                Parse tree from which to pull phrases.
+
+    labels : Iterable
+                Phrase labels to collect, e.g. `('NP', 'VP', 'PP')`.
+                Defaults to `PHRASE_LABELS`.
 
     Returns
     -------
 
     output : Dictionary
-            Dictionary with two keys: `verb_phrases` and `vp_words`.
-            `verb_phrases` is a list of verb phrases in the parse tree, while
-            `vp_words` is a list of words contained in the verb phrases.
+            Two keys for each label, named as in `phrase_keys`. Noun
+            phrases are stored under `noun_phrases`, a list of the noun
+            phrases in the parse tree, and `np_words`, a list of the words
+            contained in the noun phrases. Verb phrases are stored under
+            `verb_phrases` and `vp_words`.
     """
-    phrases = list()
-    words = list()
-    output = dict()
-    for node in parse_tree.subtrees(filter=lambda x: x.node == 'NP'):
-        phrases.append(node)
-        for word in node.leaves():
-            words.append(word)
+    if labels is None:
+        labels = PHRASE_LABELS
+    labels = frozenset(labels)
+    phrases = dict([(label, list()) for label in labels])
+    words = dict([(label, list()) for label in labels])
+    if hasattr(parse_tree, 'subtrees_labelled'):
+        nodes = parse_tree.subtrees_labelled(labels)
+    else:
+        nodes = parse_tree.subtrees(filter=lambda x: x.node in labels)
+    for node in nodes:
+        phrases[node.node].append(node)
+        words[node.node].extend(node.leaves())
 
-    output['verb_phrases'] = phrases
-    output['vp_words'] = words
+    output = dict()
+    for label in labels:
+        phrase_key, word_key = phrase_keys(label)
+        output[phrase_key] = phrases[label]
+        output[word_key] = words[label]
 
     return output
+
+
+def phrase_keys(label):
+    """
+    Function to get the keys under which a phrase type is stored in a
+    sentence's information.
+
+    Parameters
+    ----------
+
+    label : String
+            Phrase label, e.g. 'NP'.
+
+    Returns
+    -------
+
+    keys : Tuple
+            Keys for the list of phrases and the list of their words, e.g.
+            `('noun_phrases', 'np_words')`.
+    """
+    if label in PHRASE_KEYS:
+        return PHRASE_KEYS[label]
+    return label.lower() + '_phrases', label.lower() + '_words'
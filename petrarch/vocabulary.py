@@ -0,0 +1,136 @@
+from array import array
+
+#Id given to strings that aren't in a vocabulary
+UNKNOWN = -1
+
+#Penn Treebank part-of-speech tags, which every vocabulary starts with so
+#that sentences can be encoded against a vocabulary that's read-only
+PENN_TAGS = ('CC', 'CD', 'DT', 'EX', 'FW', 'IN', 'JJ', 'JJR', 'JJS', 'LS',
+             'MD', 'NN', 'NNS', 'NNP', 'NNPS', 'PDT', 'POS', 'PRP', 'PRP$',
+             'RB', 'RBR', 'RBS', 'RP', 'SYM', 'TO', 'UH', 'VB', 'VBD', 'VBG',
+             'VBN', 'VBP', 'VBZ', 'WDT', 'WP', 'WP$', 'WRB', '.', ',', ':',
+             '``', "''", '-LRB-', '-RRB-', '#', '$')
+
+
+class Vocabulary():
+    """Class numbering the strings used by the dictionaries, i.e. words,
+    part-of-speech tags, and actor and verb codes, with small integers. The
+    matchers store their tries and codes as integers from a vocabulary, and
+    sentences are encoded with the same vocabulary, so matching compares
+    integers rather than strings and each string is held once however many
+    patterns use it.
+
+    Ids are given out in order from 0 and never change, so a vocabulary can
+    be shared by several matchers and grow as they're built."""
+    def __init__(self, ids=None, strings=None):
+        """
+        Instantiate the Vocabulary class.
+
+        Parameters
+        ----------
+
+        ids : Dictionary
+                Strings as keys with their ids as values, e.g. a
+                `shared_dict.SharedDict` written from another vocabulary.
+                Defaults to a new vocabulary holding `PENN_TAGS`.
+
+        strings : List
+                    Strings in id order, matching `ids`.
+        """
+        if ids is None:
+            self._ids = dict()
+            self._strings = list()
+            for tag in PENN_TAGS:
+                self.id(tag)
+        else:
+            self._ids = ids
+            self._strings = strings
+
+    def __len__(self):
+        return len(self._strings)
+
+    def __contains__(self, string):
+        return self.get(string) != UNKNOWN
+
+    def id(self, string):
+        """Function to get the id of a string, adding it if it's new."""
+        i = self._ids.get(string)
+        if i is None:
+            i = len(self._strings)
+            #The string goes in first, so any id that can be looked up
+            #already has a string
+            self._strings.append(string)
+            self._ids[string] = i
+        return i
+
+    def get(self, string):
+        """Function to get the id of a string, or `UNKNOWN`, without adding
+        it."""
+        return self._ids.get(string, UNKNOWN)
+
+    def string(self, i):
+        """Function to get the string with an id, or None for `UNKNOWN`."""
+        if i == UNKNOWN:
+            return None
+        return self._strings[i]
+
+    def encode(self, strings):
+        """
+        Function to get the ids of strings without adding any, e.g. to
+        encode the words of a sentence for matching.
+
+        Parameters
+        ----------
+
+        strings : List
+                    Strings to encode.
+
+        Returns
+        -------
+
+        ids : array
+                Integer array of the ids, with `UNKNOWN` for strings that
+                aren't in the vocabulary.
+        """
+        get = self._ids.get
+        return array('i', [get(string, UNKNOWN) for string in strings])
+
+    def decode(self, ids):
+        """Function to get the strings for a sequence of ids."""
+        return [self.string(i) for i in ids]
+
+    def tables(self):
+        """Function to get the vocabulary as the tables `shared_dict.write`
+        takes, which can be passed back in as `ids` and `strings` once
+        loaded."""
+        return {'vocabulary.ids': self._ids,
+                'vocabulary.strings': self._strings}
+
+
+def encode_sentence(tree, vocabulary):
+    """
+    Function to encode the words and part-of-speech tags of a parsed
+    sentence as integer arrays.
+
+    Parameters
+    ----------
+
+    tree : CompactTree
+            Parse tree of the sentence, or anything else with a `pos`
+            method, e.g. an NLTK tree.
+
+    vocabulary : Vocabulary
+                    Vocabulary to encode with. It isn't added to.
+
+    Returns
+    -------
+
+    words : array
+            Ids of the uppercased words.
+
+    tags : array
+            Ids of the part-of-speech tags.
+    """
+    pos = tree.pos()
+    return (vocabulary.encode([word.upper() for word, tag in pos]),
+            vocabulary.encode([tag for word, tag in pos]))
@@ -0,0 +1,32 @@
+import petrarch.coder
+import petrarch.dict_watch
+
+TREE = ('(ROOT (S (NP (NNP Arnor)) (VP (VBD attacked) (NP (NNP Gondor)))'
+        ' (. .)))')
+
+
+def _dictionaries():
+    return petrarch.dict_watch.Dictionaries(
+        {'ARNOR': [['ARN', ' ']], 'GONDOR': [['GON', ' ']]},
+        {'ATTACK ': [True, '190', [[' ', '$'], [' ', '+'], '190']],
+         'ATTACKED ': [False, 'ATTACK ']}, 'test')
+
+
+def test_code_batch():
+    dictionaries = _dictionaries()
+    assert list(petrarch.coder.code_batch([TREE], dictionaries)) == \
+        [(0, 'ARN', 'GON', '190', 'test')]
+    #The raw dictionaries are let go once compiled
+    assert dictionaries.actor_dict is None
+    assert dictionaries.verb_dict is None
+
+
+def test_encode():
+    dictionaries = _dictionaries()
+    matcher = dictionaries.actor_matcher()
+    string = dictionaries.vocabulary.string
+    sentence = petrarch.coder.Coder(TREE)
+    words, tags = sentence.encode(dictionaries.vocabulary)
+    assert len(words) == len(tags) == 4
+    assert [(start, end, string(code)) for start, end, code in
+            matcher.match_ids(words)] == matcher.match(sentence.words())
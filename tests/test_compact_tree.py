@@ -0,0 +1,55 @@
+from nltk.tree import Tree
+
+from petrarch.compact_tree import CompactTree, LeafTable
+
+PARSE = """(ROOT (S (NP (NNP Arnor)) (VP (VBZ is) (ADJP (JJ about) (S (VP (TO
+to) (VP (VB restore) (NP (JJ full) (JJ diplomatic) (NNS ties)) (PP (IN with)
+(NP (NNP Gondor))) (SBAR (ADVP (RB almost) (NP (CD five) (NNS years))) (IN
+after) (S (NP (NNS crowds)) (VP (VBD trashed) (NP (PRP$ its) (NN
+embassy)))))))))) (, ,) (NP (DT a) (JJ senior) (NN official)) (VP (VBD said)
+(PP (IN on) (NP (NNP Saturday)))) (. .)))"""
+
+
+def test_pprint():
+    compact = CompactTree(PARSE)
+    tree = Tree.parse(PARSE)
+    assert compact.pprint() == tree.pprint()
+    assert compact.pprint(margin=1000) == tree.pprint(margin=1000)
+    assert str(compact) == str(tree)
+
+
+def test_leaves():
+    compact = CompactTree(PARSE)
+    tree = Tree.parse(PARSE)
+    assert compact.leaves() == tree.leaves()
+    assert compact.pos() == tree.pos()
+    assert compact[0][1].leaves() == tree[0][1].leaves()
+
+
+def test_subtrees():
+    compact = CompactTree(PARSE)
+    tree = Tree.parse(PARSE)
+    assert [str(subtree) for subtree in compact.subtrees()] == \
+        [str(subtree) for subtree in tree.subtrees()]
+    assert [subtree.node for subtree in
+            compact.subtrees(lambda t: t.node == 'NP')] == \
+        [subtree.node for subtree in tree.subtrees(lambda t: t.node == 'NP')]
+    assert [subtree.leaves() for subtree in
+            compact.subtrees(lambda t: t.node == 'NP')] == \
+        [subtree.leaves() for subtree in tree.subtrees(lambda t: t.node ==
+                                                       'NP')]
+
+
+def test_leaf_table():
+    nltk_tree = Tree.parse(PARSE)
+    nodes = [position for position in nltk_tree.treepositions() if not
+             isinstance(nltk_tree[position], basestring)]
+    for tree in (CompactTree(PARSE), nltk_tree):
+        table = LeafTable(tree)
+        leaves = tree.leaves()
+        for index in xrange(len(leaves)):
+            assert table.position(index) == \
+                nltk_tree.leaf_treeposition(index)
+            assert table.word(index) == leaves[index]
+        for position in nodes:
+            assert table.text(position) == ' '.join(tree[position].leaves())
@@ -0,0 +1,77 @@
+from nltk.tree import Tree
+
+import petrarch.utilities
+from petrarch.compact_tree import CompactTree
+
+PARSE = """(ROOT (S (NP (NNP Arnor)) (VP (VBZ is) (ADJP (JJ about) (S (VP (TO
+to) (VP (VB restore) (NP (JJ full) (JJ diplomatic) (NNS ties)) (PP (IN with)
+(NP (NNP Gondor))) (SBAR (ADVP (RB almost) (NP (CD five) (NNS years))) (IN
+after) (S (NP (NNS crowds)) (VP (VBD trashed) (NP (PRP$ its) (NN
+embassy)))))))))) (, ,) (NP (DT a) (JJ senior) (NN official)) (VP (VBD said)
+(PP (IN on) (NP (NNP Saturday)))) (. .)))"""
+
+SECOND = """(ROOT (S (NP (PRP It)) (VP (VBD welcomed) (NP (DT the) (NN
+move))) (. .)))"""
+
+#CoreNLP mentions, `(text, sentence, head, start, end)`
+ITS = ['its', 0, 16, 16, 17]
+IT = ['It', 1, 0, 0, 1]
+ARNOR = ['Arnor', 0, 0, 0, 1]
+GONDOR = ['Gondor', 0, 9, 9, 10]
+
+
+def _story(tree_type):
+    sents = {0: {'parse_tree': tree_type(PARSE)},
+             1: {'parse_tree': tree_type(SECOND)}}
+    coref_info = {0: {'corefs': [[ITS, ARNOR]], 'errors': [], 'shift': 0},
+                  1: {'corefs': [[IT, GONDOR]], 'errors': [], 'shift': 0}}
+    return {'DEMO-01': {'sent_info': {'sents': sents,
+                                      'coref_info': coref_info}}}
+
+
+def test_plan_coref():
+    sents = _story(CompactTree)['DEMO-01']['sent_info']['sents']
+    tables = dict()
+    position, (ref_sent, ref_pos) = petrarch.utilities._plan_coref(
+        sents, ITS, ARNOR, tables)
+    tree = sents[0]['parse_tree']
+    assert tree[position].node == 'PRP$'
+    assert tree[position].leaves() == ['its']
+    assert ref_sent == 0
+    assert str(tree[ref_pos]) == '(NP (NNP Arnor))'
+
+    #A mention that doesn't match the tree is skipped
+    assert petrarch.utilities._plan_coref(sents, ['their', 0, 16, 16, 17],
+                                          ARNOR, tables) is None
+
+
+def test_apply_corefs():
+    sents = _story(CompactTree)['DEMO-01']['sent_info']['sents']
+    info = {'corefs': [[ITS, ARNOR]], 'errors': [], 'shift': 0}
+    position, referent = petrarch.utilities._plan_coref(sents, ITS, ARNOR,
+                                                        dict())
+    petrarch.utilities._apply_corefs(sents, 0, info, {position: referent})
+    coref_tree = sents[0]['coref_tree']
+    assert '(COREF (NP (NNP Arnor)))' in str(coref_tree)
+    assert '(PRP$ its)' not in str(coref_tree)
+    assert coref_tree.leaves()[16] == 'Arnor'
+    assert info['shift'] == 0
+    #The parse tree itself is left as it was
+    assert '(PRP$ its)' in str(sents[0]['parse_tree'])
+
+
+def test_coref_replace():
+    compact = _story(CompactTree)
+    nltk = _story(Tree.parse)
+    petrarch.utilities.coref_replace(compact, 'DEMO-01')
+    petrarch.utilities.coref_replace(nltk, 'DEMO-01')
+    compact_sents = compact['DEMO-01']['sent_info']['sents']
+    nltk_sents = nltk['DEMO-01']['sent_info']['sents']
+    for sent in (0, 1):
+        assert str(compact_sents[sent]['coref_tree']) == \
+            str(nltk_sents[sent]['coref_tree'])
+    assert compact_sents[1]['coref_tree'].leaves() == ['Gondor', 'welcomed',
+                                                       'the', 'move', '.']
+    coref_info = compact['DEMO-01']['sent_info']['coref_info']
+    assert coref_info[0]['errors'] == [False]
+    assert coref_info[1]['errors'] == [False]
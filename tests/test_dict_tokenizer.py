@@ -0,0 +1,86 @@
+import os
+
+import petrarch.coder
+import petrarch.dict_tokenizer
+
+DICTIONARIES = os.path.join(os.path.dirname(petrarch.coder.__file__),
+                            'dictionaries')
+
+VERBS = ['ABANDON  [345] ;pas 15 Jul 2003\n',
+         '- * EFFORT  [987] ;pas 15 Jul 2003\n',
+         '; a comment\n',
+         '\n',
+         'ACT_ [100]\n',
+         '{ ACTING_ ACTXD_ ACTUALITY  }\n',
+         '- SAID WOULD * NOW  [101]\n',
+         '- SO IN_AND_*_OUT_AGAIN NOW [074]\n']
+
+ACTORS = ['NORTH_KOREA [PRK]\n',
+          'UNITED NATIONS [IGOUNO] ; a comment\n',
+          '# another comment\n',
+          'ISRAEL [ISR]\n']
+
+
+def test_verb_tokens():
+    tokens = list(petrarch.dict_tokenizer.verb_tokens(VERBS))
+    assert tokens == [
+        ('verb', 1, 'ABANDON ', '345'),
+        ('pattern', 2, [], [' ', 'EFFORT'], '987'),
+        ('verb', 5, 'ACT_ ', '100'),
+        ('forms', 6, ['ACTING_ ', 'ACTXD_ ', 'ACTUALITY ']),
+        ('pattern', 7, [' ', 'WOULD', ' ', 'SAID'], [' ', 'NOW'], '101'),
+        ('pattern', 8, ['_', 'AND', '_', 'IN', ' ', 'SO'],
+         ['_', 'OUT', '_', 'AGAIN', ' ', 'NOW'], '074')]
+
+
+def test_actor_tokens():
+    tokens = list(petrarch.dict_tokenizer.actor_tokens(ACTORS))
+    assert tokens == [(1, 'NORTH', ['PRK', '_', ('KOREA', ' ')]),
+                      (2, 'UNITED', ['IGOUNO', ' ', ('NATIONS', ' ')]),
+                      (4, 'ISRAEL', ['ISR', ' '])]
+
+
+def test_errors():
+    for lines in (['- * EFFORT [987]\n'], ['ABANDON [345\n'],
+                  ['ABANDON [345]\n', '{ ABANDONS\n']):
+        try:
+            list(petrarch.dict_tokenizer.verb_tokens(lines, 'verbs.txt'))
+        except ValueError, e:
+            assert str(e).startswith('verbs.txt, line {}:'.format(
+                len(lines)))
+        else:
+            assert False, 'Bad lines were accepted: {}'.format(lines)
+
+
+def test_read_dictionaries():
+    reader = petrarch.coder.ReadDictionaries(None, None)
+    verb_dict = reader.read_verb_dictionary(VERBS)
+    assert verb_dict['ABANDON '] == [True, '345',
+                                     [[], [' ', 'EFFORT'], '987']]
+    assert verb_dict['ABANDONED '] == [False, 'ABANDON ']
+    assert verb_dict['ACTXD_ '] == [False, 'ACT_ ']
+    assert 'ACTED ' not in verb_dict
+    assert len(verb_dict['ACT_ ']) == 4
+    assert reader.read_actor_dictionary(ACTORS) == {
+        'NORTH': [['PRK', '_', ('KOREA', ' ')]],
+        'UNITED': [['IGOUNO', ' ', ('NATIONS', ' ')]],
+        'ISRAEL': [['ISR', ' ']]}
+
+
+def test_testbed():
+    #Every pattern line of the testbed verbs is read into its verb
+    reader = petrarch.coder.ReadDictionaries(None, None)
+    with open(os.path.join(DICTIONARIES, 'PETR.Testbed.verbs.txt')) as f:
+        lines = f.readlines()
+    verb_dict = reader.read_verb_dictionary(lines)
+    patterns = dict()
+    verb = None
+    for line in lines:
+        if petrarch.dict_tokenizer.starts_verb(line):
+            verb = line.partition('[')[0].strip() + ' '
+            patterns.setdefault(verb, 0)
+        elif line.strip().startswith('-'):
+            patterns[verb] += 1
+    for verb, count in patterns.iteritems():
+        assert verb_dict[verb][0]
+        assert len(verb_dict[verb]) - 2 == count, verb
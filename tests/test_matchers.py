@@ -0,0 +1,189 @@
+import os
+import random
+
+import petrarch.coder
+import petrarch.matchers
+
+DICTIONARIES = os.path.join(os.path.dirname(petrarch.coder.__file__),
+                            'dictionaries')
+
+#Actor dictionary in the form built by `read_actor_dictionary`, with
+#patterns sorted longest first. `NORTH KOREA` and `UNITED NATIONS` allow
+#other words between theirs
+ACTORS = {'KOREA': [['KOR', ' ']],
+          'NORTH': [['PRKGOV', ' ', ('KOREA', '_'), ('GOVERNMENT', ' ')],
+                    ['PRK', ' ', ('KOREA', ' ')]],
+          'SOUTH': [['KORGOV', '_', ('KOREAN', '_'), ('GOVERNMENT', ' ')],
+                    ['KOR', '_', ('KOREA', ' ')]],
+          'UNITED': [['IGOUNO', ' ', ('NATIONS', ' ')],
+                     ['USA', '_', ('STATES', ' ')]],
+          'STATES': [['STATES', ' ']]}
+
+
+def _scan(actor_dict, words):
+    """Brute-force actor matching, trying every pattern at every word."""
+    def ends(pattern, k, last, connector):
+        if k == len(pattern):
+            return [last + 1]
+        word, next_connector = pattern[k]
+        if connector == '_':
+            positions = [last + 1]
+        else:
+            positions = range(last + 1, len(words))
+        found = list()
+        for j in positions:
+            if j < len(words) and words[j] == word:
+                found.extend(ends(pattern, k + 1, j, next_connector))
+        return found
+
+    matches = list()
+    start = 0
+    while start < len(words):
+        found = None
+        for pattern in actor_dict.get(words[start], ()):
+            pattern_ends = ends(pattern, 2, start, pattern[1])
+            if not pattern_ends:
+                continue
+            candidate = (len(pattern), -min(pattern_ends), pattern[0])
+            if found is None or candidate[:2] > found[:2]:
+                found = candidate
+        if found:
+            matches.append((start, -found[1], found[2]))
+            start = -found[1]
+        else:
+            start += 1
+    return matches
+
+
+def test_actor_matches():
+    matcher = petrarch.matchers.ActorMatcher(ACTORS)
+    words = 'THE NORTH KOREA GOVERNMENT MET THE UNITED STATES'.split()
+    assert matcher.match(words) == [(1, 4, 'PRKGOV'), (6, 8, 'USA')]
+    #Words joined by a space can have others between them
+    words = 'NORTH AND SOUTH KOREA AT THE UNITED GENERAL NATIONS'.split()
+    assert matcher.match(words) == [(0, 4, 'PRK'), (6, 9, 'IGOUNO')]
+    #Words joined by `_` can't
+    words = 'SOUTH OF KOREA'.split()
+    assert matcher.match(words) == [(2, 3, 'KOR')]
+
+
+def test_actor_scan():
+    matcher = petrarch.matchers.ActorMatcher(ACTORS)
+    vocabulary = ['NORTH', 'SOUTH', 'KOREA', 'KOREAN', 'GOVERNMENT', 'UNITED',
+                  'STATES', 'NATIONS', 'THE', 'OF']
+    generator = random.Random(0)
+    for k in xrange(500):
+        words = [generator.choice(vocabulary) for i in
+                 xrange(generator.randint(1, 12))]
+        assert matcher.match(words) == _scan(ACTORS, words), words
+
+
+def _testbed_verbs():
+    actor_dict, verb_dict = petrarch.coder.load_dictionaries(
+        os.path.join(DICTIONARIES, 'PETR.Testbed.actors.txt'),
+        os.path.join(DICTIONARIES, 'PETR.Testbed.verbs.txt'), False)
+    return verb_dict
+
+
+def _side(pairs, words, anchor, step):
+    """Brute-force check of one side of a verb pattern."""
+    def rest(k, last):
+        if k == len(pairs):
+            return True
+        connector, word = pairs[k]
+        if connector == '_':
+            positions = [last + step]
+        else:
+            positions = range(last + step, len(words) if step > 0 else -1,
+                              step)
+        return any([0 <= j < len(words) and
+                    (word == words[j] or word in
+                     petrarch.matchers.WILDCARDS) and rest(k + 1, j)
+                    for j in positions])
+    return rest(0, anchor)
+
+
+def _best_code(verb_dict, verb, words, start, end):
+    """Brute-force choice of the longest of a verb's patterns matching a
+    sentence, the first in the dictionary winning a tie."""
+    best = None
+    code = verb_dict[verb][1]
+    for rank, (highpat, lowpat, pattern_code) in enumerate(
+            verb_dict[verb][2:]):
+        for high in petrarch.matchers._pattern_alternatives(highpat):
+            for low in petrarch.matchers._pattern_alternatives(lowpat):
+                if _side(high, words, start, -1) and \
+                        _side(low, words, end - 1, 1):
+                    value = (len(high) + len(low), -rank)
+                    if best is None or value > best:
+                        best = value
+                        code = pattern_code
+    return code
+
+
+def test_verb_patterns():
+    matcher = petrarch.matchers.VerbMatcher(_testbed_verbs())
+
+    def codes(sentence):
+        return [match[3] for match in matcher.match(sentence.split())]
+
+    #The longer pattern wins, and the first of two equal ones
+    assert codes('THEY WERE IN ACCORD') == ['075']
+    assert codes('IN THE ACCORD') == ['072']
+    assert codes('SUGGESTED ISRAEL ACCORD DEMAND INTERNATIONAL '
+                 'CONVENTIONS')[0] == '111'
+    #Alternatives
+    assert codes('THEY WERE INCHING NEARER ACCORD') == ['083']
+    assert codes('ISRAEL ASKED FOR ECONOMIC SANCTIONS') == ['172']
+    assert codes('ASK FOR TOTAL SUPPORT BOYCOTT')[0] == '090'
+    #Patterns with words both sides of the verb
+    assert codes('SO IN AND ACKNOWLEDGE OUT AGAIN NOW') == ['074']
+
+
+def test_verb_slots():
+    verb_dict = {'SHOOT ': [True, '180',
+                            [[' ', 'WAS', ' ', '+'], [' ', 'BY', ' ', '$'],
+                             '223'],
+                            [[' ', '$'], [' ', 'AT', ' ', '+'], '190']],
+                 'SHOT ': [False, 'SHOOT ']}
+    matcher = petrarch.matchers.VerbMatcher(verb_dict)
+    assert matcher.match('HAMAS WAS SHOT BY ISRAEL'.split()) == \
+        [(2, 3, 'SHOOT ', '223', 4, 0)]
+    assert matcher.match('ISRAEL SHOT AT HAMAS'.split()) == \
+        [(1, 2, 'SHOOT ', '190', 0, 3)]
+    assert matcher.match('THEY SHOT'.split()) == \
+        [(1, 2, 'SHOOT ', '180', None, None)]
+
+
+def test_verb_scan():
+    verb_dict = _testbed_verbs()
+    matcher = petrarch.matchers.VerbMatcher(verb_dict)
+    vocabulary = set(['THE', 'OF'])
+    for key, entry in verb_dict.iteritems():
+        vocabulary.update(key.replace('_', ' ').split())
+        if entry[0]:
+            for highpat, lowpat, code in entry[2:]:
+                vocabulary.update(highpat[1::2] + lowpat[1::2])
+    vocabulary = sorted(vocabulary - set(['', '{', '}', '|']))
+    generator = random.Random(0)
+    for k in xrange(300):
+        words = [generator.choice(vocabulary) for i in
+                 xrange(generator.randint(3, 12))]
+        for start, end, verb, code, source, target in matcher.match(words):
+            assert code == _best_code(verb_dict, verb, words, start, end), \
+                words
+
+
+def test_verb_alternatives():
+    pairs = petrarch.matchers._pattern_alternatives(
+        [' ', 'DEMAND', '_', '{', ' ', 'GENEVA', '_', '', ' ', '|', ' ',
+         'INTERNATIONAL', ' ', '}', '_', 'CONVENTIONS'])
+    assert pairs == [[(' ', 'DEMAND'), ('_', 'GENEVA'), ('_', 'CONVENTIONS')],
+                     [(' ', 'DEMAND'), ('_', 'INTERNATIONAL'),
+                      ('_', 'CONVENTIONS')]]
+    try:
+        petrarch.matchers._pattern_alternatives([' ', '{', ' ', 'GENEVA'])
+    except ValueError:
+        pass
+    else:
+        assert False, 'Unclosed alternatives were accepted.'
@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+
+import petrarch.coder
+import petrarch.compact_tree
+import petrarch.matchers
+import petrarch.parse
+import petrarch.vocabulary
+
+SEPARATOR = petrarch.parse.STORY_SEPARATOR
+
+
+def _word(text, begin):
+    return [text, {'CharacterOffsetBegin': str(begin),
+                   'CharacterOffsetEnd': str(begin + len(text))}]
+
+
+def _batch(coref):
+    """Batched CoreNLP result for the stories `Arnor won. It cheered.` and
+    `Gondor lost.`, joined by the separator sentence."""
+    second = 21 + len(SEPARATOR) + 3
+    sentences = [{'words': [_word('Arnor', 0), _word('won', 6),
+                            _word('.', 9)]},
+                 {'words': [_word('It', 11), _word('cheered', 14),
+                            _word('.', 21)]},
+                 {'words': [_word(SEPARATOR, 23),
+                            _word('.', 24 + len(SEPARATOR))]},
+                 {'words': [_word('Gondor', second), _word('lost', second + 7),
+                            _word('.', second + 11)]}]
+    spans = [(0, 22), (second, second + 12)]
+    return {'sentences': sentences, 'coref': coref}, spans
+
+
+def test_split_batch():
+    result, spans = _batch([[[['It', 1, 0, 0, 1], ['Arnor', 0, 0, 0, 1]]]])
+    split = petrarch.parse._split_batch(result, spans)
+    assert len(split) == 2
+    first, second = split
+    assert [len(sentence['words']) for sentence in first['sentences']] == \
+        [3, 3]
+    assert first['coref'] == [[[['It', 1, 0, 0, 1], ['Arnor', 0, 0, 0, 1]]]]
+    assert 'coref' not in second
+    #Offsets are relative to each story
+    words = second['sentences'][0]['words']
+    assert words[0][0] == 'Gondor'
+    assert words[0][1]['CharacterOffsetBegin'] == '0'
+    assert words[1][1]['CharacterOffsetBegin'] == '7'
+
+
+def test_split_batch_cross_story():
+    #A link between the stories can't be split, so both are left to be
+    #parsed on their own
+    result, spans = _batch([[[['It', 1, 0, 0, 1], ['Gondor', 3, 0, 0, 1]]]])
+    assert petrarch.parse._split_batch(result, spans) == [None, None]
+
+
+def test_split_batch_misaligned():
+    result, spans = _batch([])
+    assert petrarch.parse._split_batch(result, [(0, 15), spans[1]]) is None
+
+
+def test_code_story():
+    #Workers code with matchers opened from the shared files
+    directory = tempfile.mkdtemp()
+    try:
+        vocabulary = petrarch.vocabulary.Vocabulary()
+        actor_matcher = petrarch.matchers.ActorMatcher(
+            {'ARNOR': [['ARN', ' ']], 'GONDOR': [['GON', ' ']]}, vocabulary)
+        verb_matcher = petrarch.matchers.VerbMatcher(
+            {'ATTACK ': [True, '190', [[' ', '$'], [' ', '+'], '190']],
+             'ATTACKED ': [False, 'ATTACK ']}, vocabulary)
+        shared = [os.path.join(directory, 'actors.shared'),
+                  os.path.join(directory, 'verbs.shared')]
+        actor_matcher.write_shared(shared[0])
+        verb_matcher.write_shared(shared[1])
+        dictionaries = petrarch.coder.SharedDictionaries(*shared)
+        tree = petrarch.compact_tree.CompactTree(
+            '(ROOT (S (NP (NNP Arnor)) (VP (VBD attacked) (NP (NNP Gondor)))'
+            ' (. .)))')
+        event_info = {'sent_info': {'sents': {0: {'parse_tree': tree}}}}
+        petrarch.parse.code_story(event_info, dictionaries)
+        assert event_info['sent_info']['sents'][0]['events'] == \
+            [('ARN', 'GON', '190')]
+    finally:
+        shutil.rmtree(directory)